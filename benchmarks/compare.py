@@ -0,0 +1,73 @@
+"""Compare two benchmark results (from `benchmarks.pipeline --output`), e.g. between commits.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+
+def change(old: float, new: float) -> float:
+    """Percentage change from old to new."""
+    if not old:
+        return 0.0
+    return 100 * (new - old) / old
+
+
+def compare(old: dict, new: dict, threshold: float = 10, min_ms: float = 0.1) -> list[str]:
+    """Print how each stage and the throughput changed, returning the regressions: stages
+    slower (by more than `threshold` percent and `min_ms`, to ignore noise in tiny stages),
+    or fps or resource use worse, by more than `threshold` percent."""
+    regressions = []
+
+    print(f"{'stage':<20}{'p50 ms':>20}{'change':>10}{'p90 ms':>20}{'change':>10}")
+    for stage in sorted(set(old["stages"]) & set(new["stages"])):
+        o, n = old["stages"][stage], new["stages"][stage]
+        p50, p90 = change(o["p50_ms"], n["p50_ms"]), change(o["p90_ms"], n["p90_ms"])
+        print(
+            f"{stage:<20}{o['p50_ms']:>9.2f} -> {n['p50_ms']:>6.2f}{p50:>+9.1f}%"
+            f"{o['p90_ms']:>9.2f} -> {n['p90_ms']:>6.2f}{p90:>+9.1f}%"
+        )
+        if p50 > threshold and n["p50_ms"] - o["p50_ms"] > min_ms:
+            regressions.append(f"{stage} p50 {p50:+.1f}%")
+
+    fps = change(old["fps"]["processed"], new["fps"]["processed"])
+    cpu = change(old["cpu_percent"], new["cpu_percent"])
+    rss = change(old["rss_max_mb"], new["rss_max_mb"])
+    print(f"fps processed {old['fps']['processed']:.1f} -> {new['fps']['processed']:.1f} ({fps:+.1f}%)")
+    print(f"cpu {old['cpu_percent']:.0f}% -> {new['cpu_percent']:.0f}% ({cpu:+.1f}%)")
+    print(f"max rss {old['rss_max_mb']:.0f}MB -> {new['rss_max_mb']:.0f}MB ({rss:+.1f}%)")
+
+    if fps < -threshold:
+        regressions.append(f"fps processed {fps:+.1f}%")
+    if cpu > threshold:
+        regressions.append(f"cpu {cpu:+.1f}%")
+    if rss > threshold:
+        regressions.append(f"max rss {rss:+.1f}%")
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("old", help="baseline results JSON")
+    parser.add_argument("new", help="results JSON to compare against it")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold (%%)")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    regressions = compare(old, new, args.threshold)
+
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""End-to-end benchmark of the camera pipeline: frame source -> inference scheduler ->
+detector -> recorder -> annotation and encoding -> MJPEG viewers.
+
+Frames come from a replayable source, synthetic moving boxes or a video file, so runs are
+comparable between commits. Reports per-stage latency percentiles, fps, CPU and RSS, and
+can write them as JSON for `benchmarks.compare`.
+
+    python -m benchmarks.pipeline --model none --frames 300 --viewers 2 --output before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from threading import Event, Lock, Thread
+from typing import Any, Callable
+
+import numpy as np
+import psutil
+
+from src.camera.camera import Camera
+from src.camera.sources import FrameSource, SyntheticSource, VideoFileSource
+from src.detector.detected_object import DetectedObject
+from src.detector.detector import BaseDetector, create_detector
+from src.inference.scheduler import InferenceScheduler
+from src.recorder.recorder import Recorder
+
+
+class StageTimer:
+    """Collects latency samples per pipeline stage, from any thread."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._samples = defaultdict(list)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add a latency sample for a stage."""
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def wrap(self, obj: Any, method: str, stage: str) -> None:
+        """Time every call of an object's method as a stage."""
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Count, mean and percentiles (in ms) of each stage."""
+        with self._lock:
+            samples = {stage: np.array(s) * 1000 for stage, s in self._samples.items() if s}
+
+        return {
+            stage: {
+                "count": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+            }
+            for stage, ms in samples.items()
+        }
+
+
+class ResourceSampler:
+    """Samples the process' RSS in a background thread, and its CPU use over the run."""
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self._interval = interval
+        self._process = psutil.Process()
+        self._rss = []
+        self._stop = Event()
+        self._thread = None
+        self._start_cpu = None
+        self._start_time = None
+
+    def start(self) -> None:
+        self._start_cpu = self._process.cpu_times()
+        self._start_time = time.monotonic()
+        self._thread = Thread(target=self._run, name="benchmark-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._rss.append(self._process.memory_info().rss)
+
+    def stop(self) -> dict[str, float]:
+        """Stop sampling and return the CPU and memory use."""
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.monotonic() - self._start_time
+        cpu = self._process.cpu_times()
+        cpu_seconds = (cpu.user - self._start_cpu.user) + (cpu.system - self._start_cpu.system)
+        rss = np.array(self._rss or [self._process.memory_info().rss]) / 2**20
+
+        return {
+            # 100% is one core fully used
+            "cpu_percent": 100 * cpu_seconds / elapsed,
+            "rss_mean_mb": float(rss.mean()),
+            "rss_max_mb": float(rss.max()),
+        }
+
+
+class NullDetector(BaseDetector):
+    """Detector without a model, to measure the rest of the pipeline. It "detects" a
+    fixed box in every frame, so recording and annotation run as they would for a real
+    detection.
+    """
+
+    def __init__(self, recorder: Recorder) -> None:
+        self._recorder = recorder
+
+    def predict(self, imgs: list[np.ndarray]) -> list[Any]:
+        return [True] * len(imgs)
+
+    def handle_result(self, img_arr: np.ndarray, result: Any | None) -> list[DetectedObject]:
+        if not self._recorder.is_recording:
+            self._recorder.start_recording(img_arr.shape)
+        if self._recorder.is_recording:
+            self._recorder.write_frame(img_arr)
+
+        height, width = img_arr.shape[:2]
+        return [
+            DetectedObject(
+                label="person",
+                bbox=np.array([width / 4, height / 4, width / 2, height / 2]),
+                height=height,
+                width=width,
+                track_id=1,
+            )
+        ]
+
+
+class BenchmarkRecorder(Recorder):
+    """Recorder that finalises clips as usual, but doesn't save them to the db or email
+    them. When not `enabled` it never starts recording.
+    """
+
+    def __init__(self, output_dir: str, max_duration: int, enabled: bool = True) -> None:
+        super().__init__(output_dir, max_duration=max_duration)
+        self._enabled = enabled
+
+    def start_recording(self, frame_shape, tracked_objects=None) -> bool:
+        return self._enabled and super().start_recording(frame_shape, tracked_objects)
+
+    def save_data(self, descriptions: str | None, labels: list[str] | None = None) -> None:
+        return
+
+
+def create_benchmark_source(source: str, fps: float | None) -> FrameSource:
+    """A synthetic source, or a video file source if given a path."""
+    if source == "synthetic":
+        return SyntheticSource(fps=fps)
+    return VideoFileSource(source, fps=fps or 1000)
+
+
+def git_commit() -> str | None:
+    """The commit being benchmarked, if run from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    source: str = "synthetic",
+    model: str = "none",
+    frames: int = 300,
+    viewers: int = 1,
+    rendition: str = "full",
+    fps: float | None = None,
+    record: bool | None = None,
+    workers: int = 1,
+    max_batch: int = 4,
+    timeout: float = 300,
+) -> dict:
+    """Run the pipeline until `frames` frames are processed, then return the results."""
+    if record is None:
+        record = shutil.which("ffmpeg") is not None
+
+    timer = StageTimer()
+    output_dir = tempfile.mkdtemp(prefix="benchmark-")
+
+    recorder = BenchmarkRecorder(output_dir, max_duration=int(timeout), enabled=record)
+    if model == "none":
+        detector = NullDetector(recorder)
+    else:
+        detector = create_detector(model, recorder=recorder, labels=["person"])
+        if detector is None:
+            raise ValueError(f"Unknown model: {model}")
+
+    frame_source = create_benchmark_source(source, fps)
+    scheduler = InferenceScheduler(workers=workers, max_batch=max_batch)
+    # warm up as the app does at boot, so the first frames aren't measured cold
+    detector.warm_up()
+    camera = Camera("benchmark", frame_source, detector, scheduler, recorder=recorder)
+
+    # time each stage
+    timer.wrap(frame_source, "read", "read")
+    timer.wrap(detector, "predict", "predict_batch")
+    timer.wrap(detector, "handle_result", "handle_result")
+    timer.wrap(camera._annotator, "draw", "annotate")
+    for name, r in camera.renditions.items():
+        timer.wrap(r.encoder, "encode", f"encode_{name}")
+    if record:
+        timer.wrap(recorder, "write_frame", "record_write")
+        # finalising runs on its own thread, started by stop_recording
+        timer.wrap(recorder, "_finalise", "record_finalise")
+
+    # end to end latency, from a frame being read to it being published
+    read_times = OrderedDict()
+    read_lock = Lock()
+
+    def traced(method: Callable, on_call: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            result = method(*args, **kwargs)
+            on_call(args, result)
+            return result
+
+        return wrapper
+
+    def on_read(args, img_arr) -> None:
+        with read_lock:
+            read_times[id(img_arr)] = time.perf_counter()
+            # frames dropped by the scheduler are never published
+            while len(read_times) > 256:
+                read_times.popitem(last=False)
+
+    def on_publish(args, result) -> None:
+        with read_lock:
+            start = read_times.pop(id(args[0]), None)
+        if start is not None:
+            timer.record("end_to_end", time.perf_counter() - start)
+
+    frame_source.read = traced(frame_source.read, on_read)
+    camera.publish = traced(camera.publish, on_publish)
+
+    # viewers, like MJPEG clients, each counting the frames they're sent
+    stop = Event()
+    delivered = [0] * viewers
+
+    def view(index: int) -> None:
+        camera.subscribe(rendition)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                camera.get_frame(rendition)
+                timer.record("viewer_wait", time.perf_counter() - start)
+                delivered[index] += 1
+        finally:
+            camera.unsubscribe(rendition)
+
+    viewer_threads = [
+        Thread(target=view, args=(i,), name=f"benchmark-viewer-{i}", daemon=True)
+        for i in range(viewers)
+    ]
+
+    # run
+    sampler = ResourceSampler()
+    Camera.register(camera)
+    scheduler.start()
+    for thread in viewer_threads:
+        thread.start()
+    sampler.start()
+    start = time.monotonic()
+    camera.start()
+
+    deadline = start + timeout
+    while scheduler.stats()["benchmark"]["processed"] < frames and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.monotonic() - start
+
+    stop.set()
+    camera.stop(wait=True)
+    # wake any viewers still waiting for a frame
+    for r in camera.renditions.values():
+        r.event.set()
+    resources = sampler.stop()
+    stats = scheduler.stats()["benchmark"]
+    Camera.unregister(camera.name)
+    scheduler.stop()
+
+    # finalise the recording, if one is still going
+    recorder.stop_recording()
+    recorder.wait_finalised()
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "source": source,
+            "model": model,
+            "frames": frames,
+            "viewers": viewers,
+            "rendition": rendition,
+            "record": record,
+            "workers": workers,
+            "max_batch": max_batch,
+        },
+        "elapsed_s": elapsed,
+        "fps": {
+            "read": timer.summary().get("read", {}).get("count", 0) / elapsed,
+            "processed": stats["processed"] / elapsed,
+            "per_viewer": [n / elapsed for n in delivered],
+        },
+        "dropped": stats["dropped"],
+        "stages": timer.summary(),
+        **resources,
+    }
+
+
+def print_results(results: dict) -> None:
+    """Print the results as a table."""
+    print(
+        f"{results['meta']['model']} on {results['meta']['source']}, "
+        f"{results['elapsed_s']:.1f}s, {results['fps']['processed']:.1f} fps processed, "
+        f"{results['dropped']} dropped, {results['cpu_percent']:.0f}% cpu, "
+        f"{results['rss_max_mb']:.0f}MB max rss"
+    )
+    print(f"{'stage':<20}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, s in sorted(results["stages"].items()):
+        print(
+            f"{stage:<20}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}"
+            f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", default="synthetic", help='"synthetic" or a video file path')
+    parser.add_argument("--model", default="none", help='"none", "v8nano" or "v8world"')
+    parser.add_argument("--frames", type=int, default=300, help="frames to process")
+    parser.add_argument("--viewers", type=int, default=1, help="live stream viewers")
+    parser.add_argument("--rendition", default="full", help="rendition the viewers watch")
+    parser.add_argument("--fps", type=float, default=None, help="pace the source (default unpaced)")
+    parser.add_argument("--workers", type=int, default=1, help="inference workers")
+    parser.add_argument("--max-batch", type=int, default=4, help="inference batch size")
+    parser.add_argument(
+        "--record",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="record clips (default: if ffmpeg is installed)",
+    )
+    parser.add_argument("--timeout", type=float, default=300, help="give up after (seconds)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(
+        source=args.source,
+        model=args.model,
+        frames=args.frames,
+        viewers=args.viewers,
+        rendition=args.rendition,
+        fps=args.fps,
+        record=args.record,
+        workers=args.workers,
+        max_batch=args.max_batch,
+        timeout=args.timeout,
+    )
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,62 @@
+import json
 import os
 
 from flask import Flask, render_template, session
-import qrcode
-
-from .blueprints.servo_controls import servo_controls_blueprint
-from .blueprints.home import home_blueprint
-from .blueprints.saved import saved_blueprint
-from .blueprints.settings import settings_blueprint
-from .blueprints.utils import utils_blueprint
-from .camera.camera import Camera
-from .db.database import db_session, init_db
-from .db.models import Labels
-from .detector.detector import YoloWorldDetector, YoloV8NDetector
-from .recorder.recorder import Recorder
 
 
 def create_app():
     """creates, configures and returns the Flask app"""
 
+    # imported here rather than at the top, so importing the package (e.g. from the CLI or
+    # tests) stays fast, heavy dependencies (torch, cv2, picamera2...) load with the app
+    from .blueprints.servo_controls import servo_controls_blueprint
+    from .blueprints.admin import admin_blueprint
+    from .blueprints.api import api_blueprint
+    from .blueprints.health import health_blueprint
+    from .blueprints.home import home_blueprint
+    from .blueprints.media import media_blueprint
+    from .blueprints.metrics import metrics_blueprint
+    from .blueprints.saved import saved_blueprint
+    from .blueprints.settings import settings_blueprint
+    from .blueprints.utils import utils_blueprint
+    from .db.database import db_session, init_db
+
     # create and configure the app
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_mapping(SECRET_KEY="dev")
+    app.config.from_mapping(
+        SECRET_KEY="dev",
+        # internal nginx location recordings can be handed off to, e.g. "/protected_recordings"
+        MEDIA_X_ACCEL_PREFIX=os.environ.get("SB_MEDIA_X_ACCEL_PREFIX"),
+        # recording retention policy (None disables a limit)
+        RETENTION_MAX_AGE_DAYS=30,
+        RETENTION_MAX_TOTAL_BYTES=8 * 1024**3,
+        RETENTION_MAX_COUNT_PER_LABEL=500,
+        RETENTION_MIN_FREE_BYTES=1024**3,
+        # newest recordings never deleted to free disk space
+        RETENTION_MIN_KEEP=10,
+        RETENTION_INTERVAL=600,
+        # cameras to stream, e.g. [{"name": "yard", "type": "file", "uri": "rtsp://..."}]
+        CAMERA_SOURCES=json.loads(
+            os.environ.get("SB_CAMERA_SOURCES", '[{"name": "main", "type": "picamera"}]')
+        ),
+        # shared inference worker pool, and the default per camera inference rate limit
+        INFERENCE_WORKERS=1,
+        INFERENCE_MAX_FPS=None,
+        # batching: bigger batches raise throughput, a longer wait for them adds latency
+        INFERENCE_MAX_BATCH=4,
+        INFERENCE_MAX_WAIT=0.01,
+        MODEL="v8world",
+        # live stream bandwidth budget per viewer, JPEG quality adapts to stay within it
+        STREAM_BUDGET_BYTES_PER_SEC=500_000,
+        # token for the admin routes (e.g. the profiler), they're disabled without one
+        ADMIN_TOKEN=os.environ.get("SB_ADMIN_TOKEN"),
+        # "process" runs the cameras, detectors and recorders in their own process, shared
+        # by every web worker, "thread" runs them in this process (only one web worker)
+        ENGINE_MODE=os.environ.get("SB_ENGINE_MODE", "process"),
+        ENGINE_SOCKET=os.environ.get(
+            "SB_ENGINE_SOCKET", os.path.join(app.instance_path, "engine.sock")
+        ),
+    )
 
     # ensure the instance folder exists
     try:
@@ -35,23 +71,39 @@ def create_app():
     def shutdown_session(exception=None):
         db_session.remove()
 
-    # config recorder
+    # where recordings are saved
     output_dir = os.path.join(app.static_folder, "recordings")
-    recorder = Recorder(output_dir=output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # the engine captures, detects and records for every camera. Models are warmed up and
+    # cameras started in the background, so the app boots straight away, and detection
+    # runs whether or not anyone is watching (see /ready)
+    if app.config["ENGINE_MODE"] == "process":
+        from .engine.client import EngineClient
+        from .engine.engine import CONFIG_KEYS
+
+        engine = EngineClient(app.config["ENGINE_SOCKET"])
+        engine.ensure_running(
+            {key: app.config[key] for key in CONFIG_KEYS} | {"RECORDINGS_DIR": output_dir}
+        )
+    else:
+        from .engine.engine import build_engine
 
-    # config detector
-    labels_db = db_session.query(Labels).first()  # get labels from db
-    labels_dict = labels_db.labelsJson
-    labels = [k for k, v in labels_dict.items() if v]
-    detector = YoloWorldDetector(labels=labels, recorder=recorder)  # create detector
+        engine = build_engine(app.config, output_dir)
+        engine.start()
 
-    # add recorder and detector to app config for access later
-    app.config["RECORDER"] = recorder
-    app.config["DETECTOR"] = detector
+    # add recordings dir and engine to app config for access later
+    app.config["RECORDINGS_DIR"] = output_dir
+    app.config["ENGINE"] = engine
 
     # register blueprints to setup routes
+    app.register_blueprint(admin_blueprint)
+    app.register_blueprint(api_blueprint)
+    app.register_blueprint(health_blueprint)
     app.register_blueprint(home_blueprint)
     app.register_blueprint(saved_blueprint)
+    app.register_blueprint(media_blueprint)
+    app.register_blueprint(metrics_blueprint)
     app.register_blueprint(settings_blueprint)
     app.register_blueprint(servo_controls_blueprint)
     app.register_blueprint(utils_blueprint)
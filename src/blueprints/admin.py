@@ -0,0 +1,45 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+
+
+admin_blueprint = Blueprint("admin", __name__)
+
+
+def check_admin_token() -> None:
+    """Abort unless the request has the admin token (SB_ADMIN_TOKEN). Without a token set,
+    admin routes don't exist."""
+    token = current_app.config.get("ADMIN_TOKEN")
+    if not token:
+        abort(404)
+
+    given = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    given = given or request.args.get("token", "")
+    if not hmac.compare_digest(given.encode(), token.encode()):
+        abort(403)
+
+
+@admin_blueprint.route("/admin/profile")
+def profile() -> Response:
+    """Profile the camera and inference threads for ?seconds=N (default 10, max 60), and
+    return the collapsed stacks for a flamegraph."""
+    check_admin_token()
+
+    # validate args
+    try:
+        seconds = min(60.0, max(0.1, float(request.args.get("seconds", 10))))
+    except ValueError:
+        abort(400)
+
+    try:
+        # in the engine, which may be in another process
+        collapsed = current_app.config["ENGINE"].profile(seconds)
+    except RuntimeError:
+        # someone else is already profiling
+        abort(409)
+
+    return Response(
+        collapsed,
+        mimetype="text/plain",
+        headers={"Content-Disposition": "attachment; filename=profile.folded"},
+    )
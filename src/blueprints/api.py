@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+from src.db.database import db_session
+from src.db.rollup import BUCKETS, hour_of, series, totals
+
+api_blueprint = Blueprint("api", __name__)
+
+# most hours or days in one chart
+MAX_BUCKETS = 1000
+
+
+def parse_time(value: str) -> datetime:
+    """Parse an ISO time, in local time like the recordings' times."""
+    when = datetime.fromisoformat(value)
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+@api_blueprint.route("/api/stats")
+def stats() -> Response:
+    """Detection stats route: recordings with each label from ?start= up to ?end= (ISO
+    times, default the last ?days=7 up to the end of this hour), in total and per ?bucket=
+    (hour or day, default hour for up to 2 days)."""
+
+    # validate args
+    try:
+        end = request.args.get("end")
+        end = parse_time(end) if end else hour_of(datetime.now()) + timedelta(hours=1)
+        start = request.args.get("start")
+        if start:
+            start = parse_time(start)
+        else:
+            start = end - timedelta(days=float(request.args.get("days", 7)))
+    except (ValueError, OverflowError):
+        abort(400)
+
+    # counts are per hour, so the range is whole hours, from the hour `start` is in up to
+    # the end of the hour `end` is in
+    start = hour_of(start)
+    if end != hour_of(end):
+        end = hour_of(end) + timedelta(hours=1)
+
+    bucket = request.args.get("bucket") or ("hour" if end - start <= timedelta(days=2) else "day")
+    if bucket not in BUCKETS or start >= end or (end - start) / BUCKETS[bucket] > MAX_BUCKETS:
+        abort(400)
+
+    # from the hourly rollup, never the recordings themselves
+    return jsonify(
+        {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "bucket": bucket,
+            "totals": totals(db_session, start, end),
+            **series(db_session, start, end, bucket),
+        }
+    )
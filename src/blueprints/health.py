@@ -0,0 +1,11 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+health_blueprint = Blueprint("health", __name__)
+
+
+@health_blueprint.route("/ready")
+def ready() -> tuple[Response, int]:
+    """Readiness route, 200 once the models are warm and every camera is processing frames,
+    503 until then (e.g. for a load balancer or systemd to wait on)"""
+    status = current_app.config["ENGINE"].status()
+    return jsonify(status), 200 if status["ready"] else 503
@@ -1,19 +1,27 @@
-import os
 from typing import Any, Generator, NoReturn
-from flask import Blueprint, Response, current_app, render_template, session
+from flask import Blueprint, Response, abort, current_app, render_template, request, session
 
 from src.camera.camera import Camera
+from src.engine.client import RemoteCamera
 
 
 home_blueprint = Blueprint("home", __name__)
 
 
-def gen(camera: Camera) -> Generator[Any | bytes, Any, NoReturn]:
+def gen(camera: Camera | RemoteCamera, rendition: str = "full") -> Generator[Any | bytes, Any, NoReturn]:
     """Generator func for surveillance camera streaming."""
-    yield b"--frame\r\n"
-    while True:
-        frame = camera.get_frame()
-        yield b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n--frame\r\n"
+    # count this client as a viewer until it disconnects
+    camera.subscribe(rendition)
+    try:
+        yield b"--frame\r\n"
+        while True:
+            frame = camera.get_frame(rendition)
+            yield b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n--frame\r\n"
+    except TimeoutError:
+        # the engine process stopped sending frames, end the stream
+        pass
+    finally:
+        camera.unsubscribe(rendition)
 
 
 @home_blueprint.route("/")
@@ -22,18 +30,23 @@ def index() -> str:
 
     # get theme from session
     theme = session.get("theme", "light")
-    
-    return render_template("home.html", theme=theme)
+
+    # names of the cameras to show streams for
+    camera_names = current_app.config["ENGINE"].camera_names()
+
+    return render_template("home.html", theme=theme, camera_names=camera_names)
 
 
 @home_blueprint.route("/video_feed")
 def video_feed() -> Response:
-    """Surveillance camera streaming route"""
-
-    # get the current detector
-    detector = current_app.config["DETECTOR"]
+    """Surveillance camera streaming route, ?camera=<name> picks the camera (default main)
+    and ?rendition=<thumb|sd|full> the stream size (default full)"""
 
-    # create a new instance of a camera with the current detector (start with std camera (0))
-    camera = Camera(detector, 0)
+    # get the requested camera and rendition
+    camera = current_app.config["ENGINE"].camera(request.args.get("camera", "main"))
+    rendition = request.args.get("rendition", "full")
+    if camera is None or rendition not in camera.renditions:
+        abort(404)
 
-    return Response(gen(camera), mimetype="multipart/x-mixed-replace; boundary=frame")
+    # the camera is started at boot, if it's not ready yet the stream waits for its first frame
+    return Response(gen(camera, rendition), mimetype="multipart/x-mixed-replace; boundary=frame")
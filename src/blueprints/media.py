@@ -0,0 +1,50 @@
+import mimetypes
+import os
+
+from flask import Blueprint, Response, abort, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+media_blueprint = Blueprint("media", __name__)
+
+# recordings are never modified once they're listed, so they can be cached for a year
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+
+
+@media_blueprint.route("/media/recordings/<path:filename>")
+def recording(filename: str) -> Response:
+    """Serve a recorded clip or thumbnail.
+
+    Supports byte range requests (so seeking only fetches what's needed), strong ETag and
+    Last-Modified validation and long lived caching. If the app sits behind nginx with
+    `MEDIA_X_ACCEL_PREFIX` set, the transfer is handed to nginx with X-Accel-Redirect.
+    Setting Flask's `USE_X_SENDFILE` does the same for servers that support X-Sendfile.
+    """
+    recordings_dir = current_app.config["RECORDINGS_DIR"]
+
+    # make sure the file is inside the recordings dir and exists
+    file_path = safe_join(recordings_dir, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        abort(404)
+
+    accel_prefix = current_app.config.get("MEDIA_X_ACCEL_PREFIX")
+    if accel_prefix:
+        # let nginx serve the file (it handles ranges and validators itself)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{filename}"
+    else:
+        # conditional enables range requests, 304s and Last-Modified
+        response = send_from_directory(
+            recordings_dir,
+            filename,
+            conditional=True,
+            etag=True,
+            max_age=MEDIA_MAX_AGE,
+        )
+
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    response.cache_control.immutable = True
+    response.headers["Accept-Ranges"] = "bytes"
+
+    return response
@@ -0,0 +1,66 @@
+from flask import Blueprint, Response, current_app
+
+from src.metrics.metrics import format_metric
+
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+@metrics_blueprint.route("/metrics")
+def prometheus_metrics() -> Response:
+    """Prometheus metrics route: stage timings, queue depths, viewers and dropped frames."""
+
+    # per camera inference stats, from the engine (which may be in another process)
+    engine = current_app.config["ENGINE"]
+    stats = engine.stats()
+    cameras = stats["cameras"]
+
+    sections = [
+        engine.stage_metrics(),
+        format_metric(
+            "surveillance_frames_processed_total",
+            "counter",
+            "Frames processed by inference.",
+            [({"camera": name}, s.get("processed", 0)) for name, s in cameras.items()],
+        ),
+        format_metric(
+            "surveillance_frames_dropped_total",
+            "counter",
+            "Frames dropped before inference, because it was falling behind.",
+            [({"camera": name}, s.get("dropped", 0)) for name, s in cameras.items()],
+        ),
+        format_metric(
+            "surveillance_inference_queue_depth",
+            "gauge",
+            "Frames waiting for inference.",
+            [({"camera": name}, s.get("pending", 0)) for name, s in cameras.items()],
+        ),
+        format_metric(
+            "surveillance_viewers",
+            "gauge",
+            "Live stream viewers.",
+            [
+                ({"camera": name, "rendition": r}, viewers)
+                for name, s in cameras.items()
+                for r, viewers in s["viewers"].items()
+            ],
+        ),
+        format_metric(
+            "surveillance_stream_quality",
+            "gauge",
+            "Current JPEG quality of the live stream.",
+            [
+                ({"camera": name, "rendition": r}, quality)
+                for name, s in cameras.items()
+                for r, quality in s["quality"].items()
+            ],
+        ),
+        format_metric(
+            "surveillance_db_writer_queue_depth",
+            "gauge",
+            "Items waiting to be written to the db.",
+            [({}, stats["db_writer_pending"])],
+        ),
+    ]
+
+    return Response("\n".join(sections) + "\n", mimetype="text/plain; version=0.0.4")
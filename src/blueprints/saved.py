@@ -1,5 +1,5 @@
+import math
 import os
-from datetime import timezone
 
 from flask import (
     Blueprint,
@@ -10,6 +10,7 @@ from flask import (
     redirect,
     url_for,
     current_app,
+    jsonify,
 )
 
 from src.db.models import VideoSnippet
@@ -17,19 +18,36 @@ from src.db.database import db_session
 
 saved_blueprint = Blueprint("saved", __name__)
 
+# recordings per page of the saved grid
+PAGE_SIZE = 24
+
 
 @saved_blueprint.route("/saved", methods=["GET"])
 def saved() -> str:
-    """Saved page route"""
+    """Saved page route, a page (?page=N) of recordings at a time, newest first"""
 
     # get theme from session
     theme = session.get("theme", "light")
 
     if request.method == "GET":
 
-        # get recordings from db
-        recordings = db_session.query(VideoSnippet).order_by(VideoSnippet.created).all()
-        return render_template("saved.html", theme=theme, recordings=recordings)
+        page = max(1, request.args.get("page", 1, type=int))
+
+        # get a page of recordings from db, and one more to tell if there's a next page
+        recordings = (
+            db_session.query(VideoSnippet)
+            .order_by(VideoSnippet.created.desc(), VideoSnippet.id.desc())
+            .offset((page - 1) * PAGE_SIZE)
+            .limit(PAGE_SIZE + 1)
+            .all()
+        )
+        return render_template(
+            "saved.html",
+            theme=theme,
+            recordings=recordings[:PAGE_SIZE],
+            page=page,
+            has_next=len(recordings) > PAGE_SIZE,
+        )
 
     return render_template("saved.html", theme=theme)
 
@@ -48,6 +66,11 @@ def player(video_id: int) -> str:
     date = video_db.created.date()
     time = video_db.created.time().strftime("%H:%M:%S")
 
+    # scrubbing previews, if they were made for this recording
+    previews = VideoSnippet.preview_titles(video_db.snippetTitle)[0]
+    if not os.path.isfile(os.path.join(current_app.config["RECORDINGS_DIR"], previews)):
+        previews = None
+
     return render_template(
         "player.html",
         theme=theme,
@@ -56,35 +79,41 @@ def player(video_id: int) -> str:
         description=video_db.description,
         date=date,
         time=time,
+        previews=previews,
     )
 
 
+@saved_blueprint.route("/saved/player/<video_id>/ttff", methods=["POST"])
+def player_ttff(video_id: int) -> Response:
+    """Record the time-to-first-frame the player measured for a video, in the player_ttff
+    stage histogram on /metrics."""
+
+    # time in ms from page load to the first frame being shown
+    ttff_ms = (request.get_json(silent=True) or {}).get("ttffMs")
+    if (
+        not isinstance(ttff_ms, (int, float))
+        or isinstance(ttff_ms, bool)
+        or not math.isfinite(ttff_ms)
+        or ttff_ms < 0
+    ):
+        return jsonify({"error": "ttffMs must be a number of ms, 0 or more"}), 400
+
+    # in the engine, which may be in another process, as that's where /metrics comes from
+    current_app.config["ENGINE"].record_player_ttff(ttff_ms / 1000)
+    return jsonify({"recorded": True})
+
+
 @saved_blueprint.route("/saved/player/delete/<video_id>")
 def delete_recording(video_id: int) -> Response:
     """delete video"""
 
-    # get theme from session
-    theme = session.get("theme", "light")
-
-    # get entry
-    entry = db_session.query(VideoSnippet).where(VideoSnippet.id == video_id)
-    vid_db = entry.first()
-    snippetTitle = vid_db.snippetTitle
-    thumbnailTitle = vid_db.thumbnailTitle
-
     try:
-        # delete db entry
-        entry.delete()
-        db_session.commit()
-
-        # delete file(s)
-        os.remove(os.path.join(current_app.static_folder, f"recordings/{snippetTitle}"))
-        os.remove(
-            os.path.join(current_app.static_folder, f"recordings/{thumbnailTitle}")
-        )
+        # delete db entry and file(s), by the engine's retention manager, returning once
+        # they're gone so the redirected page is up to date
+        current_app.config["ENGINE"].delete_recordings([int(video_id)])
 
     except Exception as e:
-        print("Error deleting video: {e}")
+        print(f"Error deleting video: {e}")
 
     # redirect to saved
     return redirect(url_for("saved.saved"))
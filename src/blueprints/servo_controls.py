@@ -1,47 +1,60 @@
-from flask import Blueprint, Response, jsonify
-import atexit
-from src.logger.systemd_logger import SystemdLogger
-from src.servos.servos import Servos
+from threading import Lock
+from typing import TYPE_CHECKING
 
-# setup systemd logger
-systemd_logger = SystemdLogger()
+from flask import Blueprint, Response, jsonify
 
-# setup servos
-servos = Servos(logger=systemd_logger, delta_angle=10)
+if TYPE_CHECKING:
+    from src.servos.servos import Servos
 
 servo_controls_blueprint = Blueprint("servos", __name__)
 
+# the servos, created on first use, so importing (and testing) the app never touches hardware
+_servos = None
+_servos_lock = Lock()
+
+
+def get_servos() -> "Servos":
+    """Get the servos, setting them up (and the systemd logger) on the first call."""
+    global _servos
+    with _servos_lock:
+        if _servos is None:
+            from src.logger.systemd_logger import SystemdLogger
+            from src.servos.servos import Servos
+
+            _servos = Servos(logger=SystemdLogger(), delta_angle=10)
+        return _servos
+
 
 @servo_controls_blueprint.route("/left")
 def move_left() -> Response:
     """Move servo left"""
-    servos.decr_pan()
+    get_servos().decr_pan()
     return jsonify({"moved": "left"})
 
 
 @servo_controls_blueprint.route("/right")
 def move_right() -> Response:
     """Move servo right"""
-    servos.incr_pan()
+    get_servos().incr_pan()
     return jsonify({"moved": "right"})
 
 
 @servo_controls_blueprint.route("/up")
 def move_up() -> Response:
     """Move servo up"""
-    servos.decr_tilt()
+    get_servos().decr_tilt()
     return jsonify({"moved": "up"})
 
 
 @servo_controls_blueprint.route("/down")
 def move_down() -> Response:
     """Move servo down"""
-    servos.incr_tilt()
+    get_servos().incr_tilt()
     return jsonify({"moved": "down"})
 
 
 @servo_controls_blueprint.route("/home")
 def home() -> Response:
     """Move the servos to the homed position"""
-    servos.home()
+    get_servos().home()
     return jsonify({"moved": "home"})
@@ -1,5 +1,6 @@
 import json
 import os
+from dataclasses import asdict
 from typing import Dict
 
 from flask import (
@@ -11,11 +12,8 @@ from flask import (
     redirect,
     current_app,
 )
-from src.camera.camera import Camera
-from src.db.models import EmailRecipient, Labels
+from src.db.cache import CachedInferenceSettings, config_cache
 from src.detector.coco_names import coco_names
-from src.db.database import db_session
-from src.detector.detector import YoloWorldDetector, YoloV8NDetector
 
 
 settings_blueprint = Blueprint("settings", __name__)
@@ -26,6 +24,39 @@ def get_empty_labels_dict() -> Dict[str, bool]:
     return {l: False for l in coco_names}
 
 
+def parse_inference_settings(form: Dict[str, str]) -> CachedInferenceSettings:
+    """Read inference settings from a form, keeping the current value of any that are
+    missing or invalid. Sizes are rounded to the model stride of 32."""
+    current = asdict(config_cache.get_inference_settings())
+    settings = {}
+    for name, value in current.items():
+        try:
+            settings[name] = max(1, int(form.get(name, value)))
+        except ValueError:
+            settings[name] = value
+
+    for name in ("idle_imgsz", "active_imgsz"):
+        settings[name] = min(640, max(64, round(settings[name] / 32) * 32))
+
+    return CachedInferenceSettings(**settings)
+
+
+def parse_regions(regions_json: str) -> list[list[tuple[float, float]]] | None:
+    """Read region of interest polygons from JSON, a list of polygons each a list of at
+    least 3 [x, y] points normalised to 0-1. None if it isn't valid."""
+    try:
+        polygons = [
+            [(min(1.0, max(0.0, float(x))), min(1.0, max(0.0, float(y)))) for x, y in polygon]
+            for polygon in json.loads(regions_json)
+        ]
+    except (TypeError, ValueError):
+        return None
+
+    if any(len(polygon) < 3 for polygon in polygons):
+        return None
+    return polygons
+
+
 # ml models dict
 models_dict = {
     "v8world": {
@@ -46,21 +77,25 @@ def settings() -> str | Response:
     # get theme from session
     theme = session.get("theme", "light")
 
+    # the engine runs the cameras (maybe in another process), changes are applied through it
+    engine = current_app.config["ENGINE"]
+
+    # the config may have been changed through another web worker since it was cached
+    config_cache.refresh()
+
     if request.method == "GET":
 
-        # get labels from db
-        labels_db = db_session.query(Labels).where(Labels.id == 1).all()
-        labels_dict = labels_db[0].labelsJson
+        # get labels from cache
+        labels_dict = config_cache.get_labels()
 
-        # get email recipients from db
-        recipients = db_session.query(EmailRecipient).all()
+        # get email recipients from cache
+        recipients = config_cache.get_email_recipients()
 
-        # get model from config
-        selected_model=""
-        if isinstance(current_app.config["DETECTOR"], YoloWorldDetector):
-            selected_model = "v8world"
-        elif isinstance(current_app.config["DETECTOR"], YoloV8NDetector):
-            selected_model = "v8nano"
+        # get model from the engine, as it may have been changed through another web worker
+        selected_model = engine.get_model() or current_app.config["MODEL"]
+
+        # get inference settings from cache
+        inference_settings = config_cache.get_inference_settings()
 
         # render
         return render_template(
@@ -69,7 +104,9 @@ def settings() -> str | Response:
             coco_names=labels_dict,
             recipients=recipients,
             models_dict=models_dict,
-            selected_model=selected_model
+            selected_model=selected_model,
+            inference_settings=inference_settings,
+            regions={name: config_cache.get_regions(name) for name in engine.camera_names()},
         )
 
     elif request.method == "POST":
@@ -80,29 +117,18 @@ def settings() -> str | Response:
             # get new label values
             new_labels = [l for l in request.form.keys()]
 
-            # set new labels in db
+            # set new labels in db (and cache)
             labels_dict = get_empty_labels_dict()
             for l in new_labels:
                 if l in labels_dict:
                     labels_dict[l] = True
-            db_session.query(Labels).where(Labels.id == 1).update(
-                {"labelsJson": labels_dict}
-            )
-            db_session.commit()
-
-            # stop camera bg thread so new detector can be used
-            Camera.stop()
-
-            # get rid of old detector
-            del current_app.config["DETECTOR"]
-
-            # create new detector withe the new labels
-            recorder = current_app.config["RECORDER"]
-            new_detector = YoloWorldDetector(labels=new_labels, recorder=recorder)
-            current_app.config["DETECTOR"] = new_detector
+            config_cache.set_labels(labels_dict)
 
-            # restart camera background thread
-            Camera.start(new_detector)
+            # give each camera a new detector with the new labels
+            engine.set_detectors(
+                engine.get_model() or current_app.config["MODEL"],
+                config_cache.get_enabled_labels(),
+            )
 
         # if the email form was triggered
         elif "emails_form" in request.form:
@@ -110,9 +136,10 @@ def settings() -> str | Response:
             # validate form
             new_email = request.form["email"]
 
-            # add to db
-            db_session.add(EmailRecipient(email_address=new_email))
-            db_session.commit()
+            # add to db (and invalidate cache)
+            config_cache.add_email_recipient(new_email)
+            # the engine sends the emails, so it needs to re-read them
+            engine.reload_config()
 
         # if the ml model change form was triggered
         elif "models_form" in request.form:
@@ -120,31 +147,31 @@ def settings() -> str | Response:
             # get the new selection from the form
             new_selection = request.form["ml_selector"]
 
-            # create new detector with current recorder, if one matches
-            new_detector = None
-            recorder = current_app.config["RECORDER"]
+            # if the selection matches a model, give each camera a new detector with it
+            if new_selection in models_dict:
+                engine.set_detectors(new_selection, config_cache.get_enabled_labels())
+
+        # if the inference settings form was triggered
+        elif "inference_form" in request.form:
 
-            if new_selection == "v8nano":
-                # switch to nano
-                new_detector = YoloV8NDetector(recorder=recorder)
+            # set new settings in db (and cache)
+            inference_settings = parse_inference_settings(request.form)
+            config_cache.set_inference_settings(inference_settings)
 
-            elif new_selection == "v8world":
-                # switch to world
-                labels_db = db_session.query(Labels).first()  # get labels from db
-                labels_dict = labels_db.labelsJson
-                labels = [k for k, v in labels_dict.items() if v]
+            # apply them to each camera's detector, no restart needed
+            engine.configure_inference(inference_settings)
 
-                new_detector = YoloWorldDetector(labels=labels, recorder=recorder)
+        # if a camera's regions of interest form was triggered
+        elif "roi_form" in request.form:
+
+            # validate form
+            name = request.form.get("camera", "")
+            polygons = parse_regions(request.form.get("regions", ""))
 
-            # if there is a new detector, reset the camera
-            if new_detector:
-                # stop camera bg thread so new detector can be used
-                Camera.stop()
-                # get rid of old detector
-                del current_app.config["DETECTOR"]
-                current_app.config["DETECTOR"] = new_detector
-                # restart camera background thread
-                Camera.start(new_detector)
+            if name in engine.camera_names() and polygons is not None:
+                # set new regions in db (and invalidate cache), then apply them
+                config_cache.set_regions(name, polygons)
+                engine.set_regions(name, polygons)
 
         # redirect (to re-load)
         return redirect("/settings")
@@ -162,9 +189,9 @@ def settings() -> str | Response:
 def settings_delete(id: int) -> Response:
     """Delete a specified video then reroute to saved."""
 
-    # delete the record with the passed id
-    db_session.query(EmailRecipient).where(EmailRecipient.id == id).delete()
-    db_session.commit()
+    # delete the record with the passed id (and invalidate cache)
+    config_cache.delete_email_recipient(id)
+    current_app.config["ENGINE"].reload_config()
 
     # redirect to settings
     return redirect("/settings")
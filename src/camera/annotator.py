@@ -0,0 +1,104 @@
+import zlib
+
+import cv2
+import numpy as np
+
+from src.detector.detected_object import DetectedObject
+
+
+# box colours (BGR), picked per label so a label keeps its colour
+PALETTE = [
+    (56, 56, 255),
+    (151, 157, 255),
+    (31, 112, 255),
+    (29, 178, 255),
+    (49, 210, 207),
+    (10, 249, 72),
+    (23, 204, 146),
+    (134, 219, 61),
+    (211, 188, 0),
+    (209, 85, 0),
+    (255, 115, 100),
+    (142, 0, 82),
+    (255, 56, 203),
+    (200, 149, 255),
+]
+
+
+class Annotator:
+    """Draws detection boxes and labels onto frames in place, with OpenCV. Label text is
+    rendered once per label into a small image and cached, so drawing a frame is just
+    rectangles and array copies. Track ids aren't drawn, they'd make every new object a
+    new label to render.
+    """
+
+    def __init__(
+        self,
+        font_scale: float = 0.5,
+        thickness: int = 1,
+        line_width: int = 2,
+        max_cached_labels: int = 256,
+    ) -> None:
+        self._font_scale = font_scale
+        self._thickness = thickness
+        self._line_width = line_width
+        self._max_cached_labels = max_cached_labels
+        self._label_cache = {}
+
+    @staticmethod
+    def colour(label: str) -> tuple[int, int, int]:
+        """The box colour for a label."""
+        return PALETTE[zlib.crc32(label.encode()) % len(PALETTE)]
+
+    def draw(self, img_arr: np.ndarray, detections: list[DetectedObject]) -> np.ndarray:
+        """Draw boxes and labels for the detections onto the image, returning it."""
+        height, width = img_arr.shape[:2]
+
+        for detection in detections:
+            colour = self.colour(detection.label)
+            x1, y1, x2, y2 = (int(v) for v in detection.bbox[:4])
+            cv2.rectangle(img_arr, (x1, y1), (x2, y2), colour, self._line_width)
+
+            # label above the box, or inside it if there's no room above
+            label_img = self._label_image(detection.label, colour)
+            label_h, label_w = label_img.shape[:2]
+            top = y1 - label_h if y1 - label_h >= 0 else max(y1, 0)
+
+            # clip to the frame
+            left = min(max(x1, 0), width)
+            rows = min(label_h, height - top)
+            cols = min(label_w, width - left)
+            if rows > 0 and cols > 0:
+                img_arr[top : top + rows, left : left + cols] = label_img[:rows, :cols]
+
+        return img_arr
+
+    def _label_image(self, text: str, colour: tuple[int, int, int]) -> np.ndarray:
+        """Get the rendered image of a label, from the cache if possible."""
+        key = (text, colour)
+        label_img = self._label_cache.get(key)
+        if label_img is not None:
+            return label_img
+
+        (text_w, text_h), baseline = cv2.getTextSize(
+            text, cv2.FONT_HERSHEY_SIMPLEX, self._font_scale, self._thickness
+        )
+        pad = 2
+        label_img = np.empty((text_h + baseline + 2 * pad, text_w + 2 * pad, 3), dtype=np.uint8)
+        label_img[:] = colour
+        cv2.putText(
+            label_img,
+            text,
+            (pad, pad + text_h),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            self._font_scale,
+            (255, 255, 255),
+            self._thickness,
+            cv2.LINE_AA,
+        )
+
+        # keep the cache bounded, in case a model has a huge number of labels
+        if len(self._label_cache) >= self._max_cached_labels:
+            self._label_cache.clear()
+        self._label_cache[key] = label_img
+        return label_img
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+
+class BrightnessMonitor:
+    """Decides when to switch between the standard (0) and noir (1) cameras.
+
+    Brightness is only checked every `check_every` frames, using either the sensor's lux
+    estimate from the frame metadata or the mean of a strided subsample of the frame.
+    A switch needs the brightness to stay past the threshold for `dwell_seconds`, and the
+    pending switch is only cancelled once brightness moves back past the threshold by
+    `margin` (hysteresis), so cameras don't thrash at dusk.
+    """
+
+    # rec. 601 luma weights, in the BGR channel order of picamera2 RGB888 frames
+    _LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+    def __init__(
+        self,
+        std_threshold: float = 30,
+        noir_threshold: float = 250,
+        margin: float = 10,
+        std_lux_threshold: float | None = None,
+        noir_lux_threshold: float | None = None,
+        lux_margin: float = 5,
+        dwell_seconds: float = 10.0,
+        check_every: int = 15,
+        stride: int = 8,
+    ) -> None:
+        # pixel brightness (0-255) thresholds
+        self._std_threshold = std_threshold
+        self._noir_threshold = noir_threshold
+        self._margin = margin
+        # optional lux thresholds, used instead when frames come with lux metadata
+        self._std_lux_threshold = std_lux_threshold
+        self._noir_lux_threshold = noir_lux_threshold
+        self._lux_margin = lux_margin
+
+        self._dwell_seconds = dwell_seconds
+        self._check_every = check_every
+        self._stride = stride
+
+        self._frame_count = 0
+        # when the current run of past-threshold readings started
+        self._pending_since = None
+
+    def estimate_brightness(self, image: np.ndarray) -> float:
+        """Estimate the average brightness (0-255) from every `stride`th pixel."""
+        sample = image[:: self._stride, :: self._stride]
+        if sample.ndim == 2:
+            return float(sample.mean())
+        # weighted mean of the per channel means, no greyscale conversion needed
+        channel_means = sample.reshape(-1, sample.shape[-1])[:, :3].mean(axis=0)
+        return float(channel_means @ self._LUMA_WEIGHTS)
+
+    def should_switch(
+        self,
+        camera_num: int,
+        image: np.ndarray | None = None,
+        lux: float | None = None,
+        now: float | None = None,
+    ) -> bool:
+        """Returns whether the camera input should be switched, given the latest frame
+        and/or its lux metadata. Cheap to call on every frame.
+        """
+        self._frame_count += 1
+        if self._frame_count % self._check_every != 0:
+            return False
+
+        now = time.monotonic() if now is None else now
+
+        # prefer the sensor's lux estimate if there are thresholds for it
+        if lux is not None and self._lux_thresholds_set():
+            value = lux
+            std_threshold, noir_threshold = self._std_lux_threshold, self._noir_lux_threshold
+            margin = self._lux_margin
+        elif image is not None:
+            value = self.estimate_brightness(image)
+            std_threshold, noir_threshold = self._std_threshold, self._noir_threshold
+            margin = self._margin
+        else:
+            return False
+
+        # noir camera: switch once it's light, std camera: switch once it's dark
+        if camera_num == 1:
+            past_threshold = value > noir_threshold
+            back_within = value < noir_threshold - margin
+        else:
+            past_threshold = value < std_threshold
+            back_within = value > std_threshold + margin
+
+        if past_threshold:
+            if self._pending_since is None:
+                self._pending_since = now
+            if now - self._pending_since >= self._dwell_seconds:
+                self.reset()
+                return True
+        elif back_within:
+            # only cancel a pending switch once clearly back on the other side
+            self._pending_since = None
+
+        return False
+
+    def reset(self) -> None:
+        """Forget any pending switch, e.g. after the camera has been switched."""
+        self._pending_since = None
+
+    def _lux_thresholds_set(self) -> bool:
+        """Whether both lux thresholds have been configured."""
+        return self._std_lux_threshold is not None and self._noir_lux_threshold is not None
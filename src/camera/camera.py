@@ -1,45 +1,86 @@
 import time
-from threading import get_ident, Event, Thread
-from typing import Any, Generator, NoReturn, Self
+from threading import get_ident, Event, Lock, Thread
+from typing import TYPE_CHECKING
 
-from picamera2 import Picamera2
 import cv2
 import numpy as np
 
-from src.detector.detector import BaseDetector
+from src.camera.annotator import Annotator
+from src.camera.encoder import QualityGovernor, StreamEncoder
+from src.camera.sources import FrameSource
+from src.detector.detected_object import DetectedObject
+from src.inference.scheduler import InferenceScheduler
+from src.metrics.metrics import metrics
+
+# only for type hints, the detector pulls in torch and ultralytics, too slow for web workers
+if TYPE_CHECKING:
+    from src.detector.detector import BaseDetector
+    from src.recorder.recorder import Recorder
 
 
 # elements of this page: https://blog.miguelgrinberg.com/post/flask-video-streaming-revisited
 # were used in the following camera classes, albeit heavily modified
 
 
+# live stream renditions, name -> frame size (None streams the full frame)
+RENDITIONS = {
+    "thumb": (160, 120),
+    "sd": (320, 240),
+    "full": None,
+}
+
+
 class CameraEvent:
     """An Event-like class that signals all active clients when a new frame is
-    available.
+    available. Clients subscribe when they connect and unsubscribe when they go, so
+    the camera knows when nobody is watching.
     """
 
     def __init__(self):
         self._events = {}
+        self._lock = Lock()
 
-    def wait(self) -> bool:
-        """Invoked from each client's thread to wait for the next frame."""
+    @property
+    def subscribers(self) -> int:
+        """Number of clients currently subscribed."""
+        return len(self._events)
+
+    def subscribe(self) -> list:
+        """Invoked from a client's thread when it starts watching. Returns the client's
+        [event, last set time] entry."""
         ident = get_ident()
-        if ident not in self._events:
-            # Add a new event for this client
-            self._events[ident] = [Event(), time.time()]
-        return self._events[ident][0].wait()
+        with self._lock:
+            if ident not in self._events:
+                # Add a new event for this client
+                self._events[ident] = [Event(), time.time()]
+            return self._events[ident]
+
+    def unsubscribe(self) -> None:
+        """Invoked from a client's thread when it stops watching."""
+        with self._lock:
+            self._events.pop(get_ident(), None)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Invoked from each client's thread to wait for the next frame."""
+        # the entry itself, as the client may be unsubscribed from another thread
+        return self.subscribe()[0].wait(timeout)
 
     def set(self) -> None:
         """Invoked by the camera thread when a new frame is available."""
         now = time.time()
         to_remove = []
 
-        for ident, (event, timestamp) in self._events.items():
+        with self._lock:
+            events = list(self._events.items())
+
+        for ident, entry in events:
+            event, timestamp = entry
             if not event.is_set():
                 # if this client's event is not set, then set it
-                # also update the last set timestamp to now
+                # also update the last set timestamp to now. on the copied entry, as the
+                # client may have unsubscribed since the copy
                 event.set()
-                self._events[ident][1] = now
+                entry[1] = now
 
             # if the client's event is already set, it means the client
             # did not process a previous frame
@@ -48,146 +89,212 @@ class CameraEvent:
             elif now - timestamp > 5:
                 to_remove.append(ident)
 
-        for ident in to_remove:
-            del self._events[ident]
+        with self._lock:
+            for ident in to_remove:
+                self._events.pop(ident, None)
 
     def clear(self) -> None:
         """Invoked from each client's thread after a frame was processed."""
-        ident = get_ident()
-        if ident in self._events:
-            self._events[ident][0].clear()
+        event = self._events.get(get_ident())
+        if event:
+            event[0].clear()
 
 
-class Camera:
-    # class-level attributes (shared between camera instances)
-    _thread = None  # background thread that reads frames from camera
-    _frame = None  # current frame is stored here by background thread
-    _detector = None
-    _event = CameraEvent()
-    _should_stop = False
-    _camera_num = 0
-
-    def __init__(self, detector: BaseDetector, camera_num: int):
-        Camera._camera_num = camera_num
-        self.start(detector)
-
-    def get_frame(self):
-        """Return the current camera frame."""
-        # wait for a signal from the camera thread
-        Camera._event.wait()
-        Camera._event.clear()
-
-        return Camera._frame
-
-    @staticmethod
-    def frames(
-        detector: BaseDetector, camera_num: int
-    ) -> Generator[bytes, Any, NoReturn]:
-        """"""
-        with Picamera2(camera_num=camera_num) as picam:
-            # setup picam
-            picam.configure(
-                picam.create_preview_configuration(
-                    main={"format": "RGB888", "size": (640, 480)}
+class Rendition:
+    """One size of a camera's live stream. Frames are only scaled and encoded for it
+    while it has clients.
+    """
+
+    def __init__(self, size: tuple[int, int] | None, encoder: StreamEncoder) -> None:
+        self.size = size
+        self.encoder = encoder
+        self.frame = None  # current encoded frame
+        self.event = CameraEvent()
+        # clients in other processes (see src.engine), and where to send their frames
+        self.sinks = []
+        self._remote_viewers = 0
+        self._remote_lock = Lock()
+
+    @property
+    def viewers(self) -> int:
+        """Number of clients watching, in this process or others."""
+        return self.event.subscribers + self._remote_viewers
+
+    def add_remote_viewers(self, count: int) -> None:
+        """Count (or, if negative, stop counting) clients in other processes."""
+        with self._remote_lock:
+            self._remote_viewers = max(0, self._remote_viewers + count)
+
+    def publish(self, annotated_frame: np.ndarray) -> None:
+        """Scale and encode a frame, if anyone is watching, then signal the clients."""
+        if self.viewers:
+            if self.size is not None:
+                annotated_frame = cv2.resize(
+                    annotated_frame, self.size, interpolation=cv2.INTER_AREA
                 )
+            self.frame = self.encoder.encode(annotated_frame)
+            for sink in self.sinks:
+                sink(self.frame)
+        self.event.set()
+
+
+class Camera:
+    """A camera stream. Frames are read from its source in a background thread and handed
+    to the shared inference scheduler, which publishes the annotated frames back to it.
+    Any number of cameras can be registered and streamed at once.
+    """
+
+    # registered cameras, by name
+    _cameras = {}
+
+    def __init__(
+        self,
+        name: str,
+        source: FrameSource,
+        detector: "BaseDetector",
+        scheduler: InferenceScheduler,
+        recorder: "Recorder | None" = None,
+        max_fps: float | None = None,
+        stream_budget_bytes_per_sec: float = 500_000,
+    ) -> None:
+        self.name = name
+        self.detector = detector
+        self.recorder = recorder
+        self.max_fps = max_fps
+        self._source = source
+        self._scheduler = scheduler
+        self._thread = None  # background thread that reads frames from the source
+        self._thread_lock = Lock()  # so concurrent starts don't start two threads
+        self._should_stop = False
+        self._first_frame = Event()  # set once the first frame is processed
+        self._annotator = Annotator()
+
+        # live stream renditions, each encoded to its own bandwidth budget per viewer
+        self.renditions = {
+            name: Rendition(
+                size,
+                StreamEncoder(
+                    governor=QualityGovernor(budget_bytes_per_sec=stream_budget_bytes_per_sec)
+                ),
             )
+            for name, size in RENDITIONS.items()
+        }
 
-            picam.start()
-            # let picam warm up
-            time.sleep(1)
-
-            try:
-                while True:
-                    # get the current frame as an array
-                    img_arr = picam.capture_array()
-                    # process frame and annotate it with detector
-                    annotated_frame = detector.process_img(img_arr)
-                    # yield tuple of img_arr and annotated frame as bytes
-                    yield img_arr, cv2.imencode(".jpg", annotated_frame)[1].tobytes()
-            finally:
-                picam.stop()
-
-    @staticmethod
-    def should_switch(image: np.ndarray, std_threshold=30, noir_threshold=250) -> bool:
-        """Returns whether the camera input should be switched due to percieved brightness, based on the image passed."""
-
-        # get greyscale of img array
-        grey_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-
-        # Calculate the average 'brightness'
-        avg_brightness = np.mean(grey_image)
-        
-        # if noir camera
-        if Camera._camera_num == 1:
-            if avg_brightness > noir_threshold:
-                # it's light
-                return True
-        # normal camera
-        else:
-            if avg_brightness < std_threshold:
-                # it's dark
-                return True
-        return False
-
-    @staticmethod
-    def switch_camera_num():
-        """Helper function to switch the camera_num between 0 and 1."""
-        if Camera._camera_num == 1:
-            Camera._camera_num = 0
-        else:
-            Camera._camera_num = 1
+    @classmethod
+    def register(cls, camera: "Camera") -> "Camera":
+        """Register a camera, so it can be looked up by name and gets inference time."""
+        cls._cameras[camera.name] = camera
+        camera._scheduler.register(camera, max_fps=camera.max_fps)
+        return camera
 
     @classmethod
-    def _run(cls: Self) -> None:
-        """Camera background thread."""
-        print("Starting camera thread.")
-
-        # get the class frames iterator
-        frames_iterator = cls.frames(Camera._detector, Camera._camera_num)
-
-        # for each frame yielded
-        for img_arr, frame in frames_iterator:
-            # set class frame
-            Camera._frame = frame
-            # send signal to clients
-            Camera._event.set()
-
-            time.sleep(0)
-            
-            # flag has been set to stop the bg thread. deal with this
-            if Camera._should_stop:
-                frames_iterator.close()
-                print("Stopping camera thread.")
-                break
-            
-            # check if conditions require camera switching.
-            if Camera.should_switch(img_arr):
-                # switch camera num
-                Camera.switch_camera_num()
-                # stop generating
-                frames_iterator.close()
-                Camera._thread = None
-                print("Switching camera.")
-                # restart thread now the camera_num has been switched
-                Camera.start(Camera._detector)
-                return
+    def unregister(cls, name: str) -> None:
+        """Stop and remove a registered camera."""
+        camera = cls._cameras.pop(name, None)
+        if camera:
+            camera.stop()
+            camera._scheduler.unregister(camera)
 
-        # reset flags
-        Camera._thread = None
-        Camera._should_stop = False
+    @classmethod
+    def get(cls, name: str) -> "Camera | None":
+        """Get a registered camera by name."""
+        return cls._cameras.get(name)
 
     @classmethod
-    def start(cls: Self, detector: BaseDetector) -> None:
+    def all(cls) -> list["Camera"]:
+        """Get all registered cameras."""
+        return list(cls._cameras.values())
+
+    @property
+    def ready(self) -> bool:
+        """Whether frames are being captured and processed."""
+        return self._first_frame.is_set()
+
+    @property
+    def viewers(self) -> int:
+        """Number of clients watching any rendition of the live stream."""
+        return sum(rendition.viewers for rendition in self.renditions.values())
+
+    def subscribe(self, rendition: str = "full") -> None:
+        """Start watching a rendition, from the client's thread."""
+        self.renditions[rendition].event.subscribe()
+
+    def unsubscribe(self, rendition: str = "full") -> None:
+        """Stop watching a rendition, from the client's thread."""
+        self.renditions[rendition].event.unsubscribe()
+
+    def get_frame(self, rendition: str = "full") -> bytes:
+        """Return the current camera frame, in the given rendition."""
+        rendition = self.renditions[rendition]
+
+        # wait for a signal from the inference worker
+        rendition.event.wait()
+        rendition.event.clear()
+
+        return rendition.frame
+
+    def publish(self, img_arr: np.ndarray, detections: list[DetectedObject]) -> None:
+        """Invoked by the inference worker with each processed frame, and what was detected
+        in it. The frame has already been recorded, so it's annotated in place.
+        """
+        self._first_frame.set()
+
+        # nobody watching, skip annotating and encoding altogether
+        if not self.viewers:
+            return
+
+        with metrics.span("annotate", camera=self.name):
+            self._annotator.draw(img_arr, detections)
+
+        # encode each watched rendition and send signal to its clients
+        for name, rendition in self.renditions.items():
+            if rendition.viewers:
+                with metrics.span("encode", camera=self.name, rendition=name):
+                    rendition.publish(img_arr)
+            else:
+                rendition.publish(img_arr)
+
+    def set_detector(self, detector: "BaseDetector") -> None:
+        """Swap the detector, used from the next batch of frames. The frame source and
+        background thread keep running, so sensors aren't re-initialised and the current
+        recording carries on."""
+        self.detector = detector
+
+    def _run(self) -> None:
+        """Camera background thread."""
+        print(f"Starting camera thread {self.name}.")
+
+        try:
+            with self._source as source:
+                # flag has been set to stop the bg thread. deal with this
+                while not self._should_stop:
+                    with metrics.span("capture", camera=self.name):
+                        img_arr = source.read()
+
+                    # hand the frame to the inference workers
+                    self._scheduler.submit(self, img_arr)
+                    time.sleep(0)
+        except Exception as e:
+            print(f"Camera {self.name} failed: {e}")
+
+        print(f"Stopping camera thread {self.name}.")
+
+    def start(self) -> None:
         """Start the background camera image processing thread."""
-        Camera._detector = detector
-        if Camera._thread is None or not Camera._thread.is_alive():
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._should_stop = False
             # start background frame thread
-            Camera._thread = Thread(target=cls._run)
-            Camera._thread.start()
-            # wait until first frame is available
-            Camera._event.wait()
+            self._thread = Thread(target=self._run, name=f"camera-{self.name}", daemon=True)
+            self._thread.start()
 
-    @classmethod
-    def stop(cls: Self) -> None:
+        # wait until first frame is available (or give up, if the source is broken)
+        self._first_frame.wait(timeout=30)
+
+    def stop(self, wait: bool = False) -> None:
         """Schedule stopping of the background camera image processing thread."""
-        Camera._should_stop = True
+        self._should_stop = True
+        self._first_frame.clear()
+        if wait and self._thread is not None:
+            self._thread.join()
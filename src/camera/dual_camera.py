@@ -0,0 +1,112 @@
+import time
+from typing import Self
+
+from picamera2 import Picamera2
+import numpy as np
+
+
+class DualCamera:
+    """Keeps both the standard (0) and noir (1) sensors open, configured and running.
+
+    Only the active sensor runs at the full frame rate, the inactive one idles at a low
+    rate. Both keep their latest frame queued, so switching is just a change of which
+    sensor frames are taken from, with no close/re-open or warm-up gap in recording.
+    If only one sensor is attached, switching does nothing.
+    """
+
+    def __init__(
+        self,
+        active_num: int = 0,
+        size: tuple[int, int] = (640, 480),
+        fps: float = 30,
+        idle_fps: float = 2,
+        warm_up: float = 1.0,
+    ) -> None:
+        self._active_num = active_num
+        self._size = size
+        # frame durations in microseconds
+        self._active_duration = int(1_000_000 / fps)
+        self._idle_duration = int(1_000_000 / idle_fps)
+        self._warm_up = warm_up
+        self._cams = {}
+
+    @property
+    def active_num(self) -> int:
+        """The camera num frames are currently taken from."""
+        return self._active_num
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """Open, configure and start both sensors."""
+        for camera_num in (0, 1):
+            try:
+                picam = Picamera2(camera_num=camera_num)
+            except Exception as e:
+                print(f"Camera {camera_num} unavailable: {e}")
+                continue
+
+            # setup picam
+            picam.configure(
+                picam.create_preview_configuration(
+                    main={"format": "RGB888", "size": self._size}
+                )
+            )
+            picam.set_controls({"FrameDurationLimits": self._durations(camera_num)})
+            picam.start()
+            self._cams[camera_num] = picam
+
+        if not self._cams:
+            raise RuntimeError("No cameras available")
+
+        # fall back to whichever sensor is available
+        if self._active_num not in self._cams:
+            self._active_num = next(iter(self._cams))
+
+        # let both picams warm up, once
+        time.sleep(self._warm_up)
+
+    def close(self) -> None:
+        """Stop and close both sensors."""
+        for picam in self._cams.values():
+            try:
+                picam.stop()
+                picam.close()
+            except Exception as e:
+                print(f"Failed to close camera: {e}")
+        self._cams = {}
+
+    def capture(self) -> tuple[np.ndarray, float | None]:
+        """Capture a frame from the active sensor, returning it with its lux estimate."""
+        request = self._cams[self._active_num].capture_request()
+        try:
+            img_arr = request.make_array("main")
+            lux = request.get_metadata().get("Lux")
+        finally:
+            request.release()
+        return img_arr, lux
+
+    def switch(self) -> None:
+        """Make the other sensor the active one."""
+        other_num = 1 - self._active_num
+        if other_num not in self._cams:
+            return
+
+        old_num, self._active_num = self._active_num, other_num
+
+        # bring the new sensor up to the full rate and idle the old one
+        for camera_num in (self._active_num, old_num):
+            self._cams[camera_num].set_controls(
+                {"FrameDurationLimits": self._durations(camera_num)}
+            )
+
+    def _durations(self, camera_num: int) -> tuple[int, int]:
+        """Frame duration limits for a sensor, depending on if it's active."""
+        if camera_num == self._active_num:
+            return (self._active_duration, self._active_duration)
+        return (self._idle_duration, self._idle_duration)
@@ -0,0 +1,145 @@
+import time
+from abc import ABCMeta, abstractmethod
+
+import cv2
+import numpy as np
+
+# simplejpeg (libjpeg-turbo) is much faster, but fall back to OpenCV if it's missing
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+
+class JpegEncoder(metaclass=ABCMeta):
+    """Base class used for all JPEG encoders."""
+
+    @abstractmethod
+    def encode(self, img_arr: np.ndarray, quality: int) -> bytes:
+        """Encode a BGR image array (picamera2's RGB888 layout) as a JPEG."""
+        return
+
+
+class SimpleJpegEncoder(JpegEncoder):
+    """JPEG encoder using simplejpeg/libjpeg-turbo, straight from the BGR frame with no
+    colour conversion, and with 4:2:0 subsampling and the fast DCT."""
+
+    def encode(self, img_arr: np.ndarray, quality: int) -> bytes:
+        return simplejpeg.encode_jpeg(
+            np.ascontiguousarray(img_arr),
+            quality=quality,
+            colorspace="BGR",
+            colorsubsampling="420",
+            fastdct=True,
+        )
+
+
+class OpenCvEncoder(JpegEncoder):
+    """JPEG encoder using OpenCV."""
+
+    def encode(self, img_arr: np.ndarray, quality: int) -> bytes:
+        return cv2.imencode(".jpg", img_arr, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def create_encoder() -> JpegEncoder:
+    """Create the fastest JPEG encoder available."""
+    if simplejpeg is not None:
+        return SimpleJpegEncoder()
+    return OpenCvEncoder()
+
+
+class QualityGovernor:
+    """Adapts JPEG quality so the stream each viewer gets stays within a bandwidth budget.
+    Tracks the average frame size and frame rate, then steps the quality down when over
+    budget, and back up when comfortably under it.
+    """
+
+    def __init__(
+        self,
+        budget_bytes_per_sec: float = 500_000,
+        initial_quality: int = 75,
+        min_quality: int = 30,
+        max_quality: int = 90,
+        step: int = 5,
+        smoothing: float = 0.1,
+    ) -> None:
+        self._budget = budget_bytes_per_sec
+        self._min_quality = min_quality
+        self._max_quality = max_quality
+        self._step = step
+        self._smoothing = smoothing
+        self.quality = initial_quality
+
+        # moving averages of frame size and rate
+        self._avg_bytes = None
+        self._avg_fps = None
+        self._last_time = None
+
+    @property
+    def bytes_per_sec(self) -> float | None:
+        """Estimated stream bandwidth, per viewer."""
+        if self._avg_bytes is None or self._avg_fps is None:
+            return None
+        return self._avg_bytes * self._avg_fps
+
+    def update(self, frame_bytes: int, now: float | None = None) -> int:
+        """Account for an encoded frame, returning the quality to use for the next one."""
+        now = time.monotonic() if now is None else now
+
+        self._avg_bytes = self._average(self._avg_bytes, frame_bytes)
+        if self._last_time is not None and now > self._last_time:
+            self._avg_fps = self._average(self._avg_fps, 1 / (now - self._last_time))
+        self._last_time = now
+
+        bytes_per_sec = self.bytes_per_sec
+        if bytes_per_sec is not None:
+            if bytes_per_sec > self._budget:
+                self.quality = max(self._min_quality, self.quality - self._step)
+            elif bytes_per_sec < self._budget * 0.7:
+                self.quality = min(self._max_quality, self.quality + self._step)
+
+        return self.quality
+
+    def _average(self, average: float | None, value: float) -> float:
+        """Exponential moving average."""
+        if average is None:
+            return value
+        return average + self._smoothing * (value - average)
+
+
+class StreamEncoder:
+    """Encodes the live stream frames, with adaptive quality and encode time metrics."""
+
+    def __init__(
+        self,
+        encoder: JpegEncoder | None = None,
+        governor: QualityGovernor | None = None,
+    ) -> None:
+        self._encoder = encoder or create_encoder()
+        self._governor = governor or QualityGovernor()
+        self._frames = 0
+        self._total_encode_time = 0.0
+        self._total_bytes = 0
+
+    def encode(self, img_arr: np.ndarray) -> bytes:
+        """Encode a frame at the governor's current quality."""
+        start = time.perf_counter()
+        data = self._encoder.encode(img_arr, self._governor.quality)
+        self._total_encode_time += time.perf_counter() - start
+
+        self._frames += 1
+        self._total_bytes += len(data)
+        self._governor.update(len(data))
+        return data
+
+    def stats(self) -> dict:
+        """Encode metrics since the encoder was created."""
+        frames = max(self._frames, 1)
+        return {
+            "encoder": type(self._encoder).__name__,
+            "frames": self._frames,
+            "quality": self._governor.quality,
+            "avg_encode_ms": 1000 * self._total_encode_time / frames,
+            "avg_frame_bytes": self._total_bytes / frames,
+            "bytes_per_sec": self._governor.bytes_per_sec,
+        }
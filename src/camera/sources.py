@@ -0,0 +1,232 @@
+import time
+from abc import ABCMeta, abstractmethod
+from typing import Self
+
+import cv2
+import numpy as np
+
+from src.camera.brightness import BrightnessMonitor
+
+
+class FrameSource(metaclass=ABCMeta):
+    """Base class used for all sources of camera frames."""
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @abstractmethod
+    def open(self) -> None:
+        """Open the source so frames can be read."""
+        return
+
+    @abstractmethod
+    def read(self) -> np.ndarray:
+        """Block until the next frame is available and return it."""
+        return
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release the source."""
+        return
+
+
+class PicameraSource(FrameSource):
+    """Frames from the Pi's standard and noir cameras, switching between them on brightness."""
+
+    def __init__(
+        self,
+        camera_num: int = 0,
+        size: tuple[int, int] = (640, 480),
+        brightness: BrightnessMonitor | None = None,
+    ) -> None:
+        self._camera_num = camera_num
+        self._size = size
+        self._brightness = brightness or BrightnessMonitor()
+        self._cams = None
+
+    @property
+    def camera_num(self) -> int:
+        """The camera num currently in use."""
+        return self._cams.active_num if self._cams else self._camera_num
+
+    def open(self) -> None:
+        # imported here, so picamera2 is only needed when a picamera source is used
+        from src.camera.dual_camera import DualCamera
+
+        self._cams = DualCamera(active_num=self._camera_num, size=self._size)
+        self._cams.open()
+
+    def read(self) -> np.ndarray:
+        # get the current frame as an array, along with its lux estimate
+        img_arr, lux = self._cams.capture()
+
+        # check if conditions require camera switching (sampled every few frames,
+        # and only once it has stayed light/dark for a while)
+        if self._brightness.should_switch(self._cams.active_num, img_arr, lux):
+            self._cams.switch()
+            # remember it, so a restart opens on the right camera
+            self._camera_num = self._cams.active_num
+            print(f"Switched to camera {self._camera_num}.")
+
+        return img_arr
+
+    def close(self) -> None:
+        if self._cams:
+            self._cams.close()
+            self._cams = None
+
+
+class VideoFileSource(FrameSource):
+    """Frames from a video file or network stream (e.g. rtsp://) via OpenCV.
+
+    Files are played back in real time and looped, so they stand in for a live camera
+    when testing without Pi hardware.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        loop: bool = True,
+        fps: float | None = None,
+        size: tuple[int, int] | None = (640, 480),
+    ) -> None:
+        self._uri = uri
+        self._loop = loop
+        self._fps = fps
+        self._size = size
+        self._capture = None
+        self._next_frame_time = None
+        # streams are already live, only pace files
+        self._is_stream = "://" in uri
+
+    def open(self) -> None:
+        self._capture = cv2.VideoCapture(self._uri)
+        if not self._capture.isOpened():
+            raise RuntimeError(f"Could not open video source {self._uri}")
+
+        if self._fps is None:
+            self._fps = self._capture.get(cv2.CAP_PROP_FPS) or 15
+        self._next_frame_time = time.monotonic()
+
+    def read(self) -> np.ndarray:
+        ok, img_arr = self._capture.read()
+
+        # loop files back to the start
+        if not ok and self._loop and not self._is_stream:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, img_arr = self._capture.read()
+        if not ok:
+            raise EOFError(f"No more frames from {self._uri}")
+
+        if self._size and (img_arr.shape[1], img_arr.shape[0]) != self._size:
+            img_arr = cv2.resize(img_arr, self._size)
+
+        # wait until this frame is due, to play files back in real time
+        if not self._is_stream:
+            self._next_frame_time += 1 / self._fps
+            delay = self._next_frame_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # fallen behind, don't try to catch up
+                self._next_frame_time = time.monotonic()
+
+        return img_arr
+
+    def close(self) -> None:
+        if self._capture:
+            self._capture.release()
+            self._capture = None
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames of boxes moving over a noisy background. The same seed always
+    gives the same frames, so it's a replayable source for benchmarks and testing.
+    """
+
+    def __init__(
+        self,
+        size: tuple[int, int] = (640, 480),
+        fps: float | None = None,
+        objects: int = 2,
+        seed: int = 0,
+    ) -> None:
+        self._size = size
+        self._fps = fps
+        self._objects = objects
+        self._seed = seed
+        self._rng = None
+        self._background = None
+        self._frame = 0
+        self._next_frame_time = None
+
+    def open(self) -> None:
+        self._rng = np.random.default_rng(self._seed)
+        width, height = self._size
+        self._background = self._rng.integers(60, 100, (height, width, 3), dtype=np.uint8)
+        # each object's start position, velocity (px per frame) and colour
+        self._tracks = [
+            (
+                self._rng.uniform(0, (width, height)),
+                self._rng.uniform(-6, 6, 2),
+                tuple(int(c) for c in self._rng.integers(0, 255, 3)),
+            )
+            for _ in range(self._objects)
+        ]
+        self._frame = 0
+        self._next_frame_time = time.monotonic()
+
+    def read(self) -> np.ndarray:
+        width, height = self._size
+        img_arr = self._background.copy()
+
+        for start, velocity, colour in self._tracks:
+            x, y = start + velocity * self._frame
+            x, y = self._bounce(x, width), self._bounce(y, height)
+            cv2.rectangle(
+                img_arr, (int(x) - 30, int(y) - 60), (int(x) + 30, int(y) + 60), colour, -1
+            )
+        self._frame += 1
+
+        # pace frames if asked to, otherwise as fast as they can be used
+        if self._fps:
+            self._next_frame_time += 1 / self._fps
+            delay = self._next_frame_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next_frame_time = time.monotonic()
+
+        return img_arr
+
+    def close(self) -> None:
+        self._background = None
+
+    @staticmethod
+    def _bounce(position: float, limit: float) -> float:
+        """Fold a position back and forth between 0 and limit, as if bouncing off the edges."""
+        position %= 2 * limit
+        return 2 * limit - position if position > limit else position
+
+
+def create_source(config: dict) -> FrameSource:
+    """Create a frame source from its config, e.g. {"type": "file", "uri": "clip.mp4"}."""
+    source_type = config.get("type", "picamera")
+
+    if source_type == "picamera":
+        return PicameraSource(camera_num=config.get("camera_num", 0))
+    elif source_type == "file":
+        return VideoFileSource(
+            uri=config["uri"], loop=config.get("loop", True), fps=config.get("fps")
+        )
+
+    elif source_type == "synthetic":
+        return SyntheticSource(
+            fps=config.get("fps"), objects=config.get("objects", 2), seed=config.get("seed", 0)
+        )
+
+    raise ValueError(f"Unknown camera source type: {source_type}")
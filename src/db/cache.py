@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from threading import RLock
+
+from sqlalchemy.orm import scoped_session
+
+from src.db.database import db_session
+from src.db.models import (
+    ConfigVersion,
+    EmailRecipient,
+    InferenceSettings,
+    Labels,
+    RegionOfInterest,
+)
+
+
+@dataclass(frozen=True)
+class CachedRecipient:
+    """Plain copy of an EmailRecipient row, safe to share between threads."""
+
+    id: int
+    emailAddress: str
+
+
+@dataclass(frozen=True)
+class CachedInferenceSettings:
+    """Plain copy of the InferenceSettings row, field names match AdaptiveRate's arguments."""
+
+    idle_imgsz: int = 96
+    idle_every: int = 3
+    active_imgsz: int = 256
+    active_every: int = 1
+    target_latency_ms: int = 250
+
+
+class ConfigCache:
+    """In-process, write-through cache of the rarely changing config tables (labels, email
+    recipients, inference settings and regions of interest). Reads are served from memory, writes go to the db and then
+    update or invalidate this process's cached copy.
+
+    Each process (web worker, engine) has its own cache, so every write also bumps the
+    config version in the db. Another process only sees the change after `refresh`, which
+    drops its cached copy if the version has moved on, or `invalidate`.
+    """
+
+    def __init__(self, session: scoped_session = db_session) -> None:
+        self._session = session
+        self._lock = RLock()
+        self._labels = None
+        self._recipients = None
+        self._inference_settings = None
+        self._regions = None
+        # config version the cached copies were read at, None before the first refresh
+        self._version = None
+
+    def _bump_version(self) -> None:
+        """Bump the config version, in the same transaction as the change to the config."""
+        updated = self._session.query(ConfigVersion).update(
+            {ConfigVersion.version: ConfigVersion.version + 1}
+        )
+        if not updated:
+            self._session.add(ConfigVersion(version=1))
+
+    def refresh(self) -> None:
+        """Drop everything cached if the config was changed since it was read, e.g. by
+        another web worker. One small query, so it's done before using the config to
+        serve a request."""
+        with self._lock:
+            version = self._session.query(ConfigVersion.version).scalar() or 0
+            if version != self._version:
+                self.invalidate()
+                self._version = version
+
+    def get_labels(self) -> dict[str, bool]:
+        """Get a copy of the labels dict, loading it from the db on a cache miss."""
+        with self._lock:
+            if self._labels is None:
+                labels_db = self._session.query(Labels).first()
+                self._labels = dict(labels_db.labelsJson) if labels_db else {}
+            return dict(self._labels)
+
+    def get_enabled_labels(self) -> list[str]:
+        """Get the list of labels that are set to be detected."""
+        return [k for k, v in self.get_labels().items() if v]
+
+    def set_labels(self, labels_dict: dict[str, bool]) -> None:
+        """Write the labels to the db and the cache."""
+        with self._lock:
+            self._session.query(Labels).where(Labels.id == 1).update(
+                {"labelsJson": labels_dict}
+            )
+            self._bump_version()
+            self._session.commit()
+            self._labels = dict(labels_dict)
+
+    def get_email_recipients(self) -> list[CachedRecipient]:
+        """Get the email recipients, loading them from the db on a cache miss."""
+        with self._lock:
+            if self._recipients is None:
+                self._recipients = [
+                    CachedRecipient(id=r.id, emailAddress=r.emailAddress)
+                    for r in self._session.query(EmailRecipient).all()
+                ]
+            return list(self._recipients)
+
+    def add_email_recipient(self, email_address: str) -> None:
+        """Add an email recipient to the db and invalidate the cached recipients."""
+        with self._lock:
+            try:
+                self._session.add(EmailRecipient(email_address=email_address))
+                self._bump_version()
+                self._session.commit()
+            finally:
+                self._recipients = None
+
+    def delete_email_recipient(self, id: int) -> None:
+        """Delete an email recipient from the db and invalidate the cached recipients."""
+        with self._lock:
+            try:
+                self._session.query(EmailRecipient).where(
+                    EmailRecipient.id == id
+                ).delete()
+                self._bump_version()
+                self._session.commit()
+            finally:
+                self._recipients = None
+
+    def get_inference_settings(self) -> CachedInferenceSettings:
+        """Get the inference settings, loading them from the db on a cache miss."""
+        with self._lock:
+            if self._inference_settings is None:
+                row = self._session.query(InferenceSettings).first()
+                self._inference_settings = (
+                    CachedInferenceSettings(
+                        idle_imgsz=row.idleImgsz,
+                        idle_every=row.idleEvery,
+                        active_imgsz=row.activeImgsz,
+                        active_every=row.activeEvery,
+                        target_latency_ms=row.targetLatencyMs,
+                    )
+                    if row
+                    else CachedInferenceSettings()
+                )
+            return self._inference_settings
+
+    def set_inference_settings(self, settings: CachedInferenceSettings) -> None:
+        """Write the inference settings to the db and the cache."""
+        with self._lock:
+            row = self._session.query(InferenceSettings).first()
+            if row is None:
+                row = InferenceSettings()
+                self._session.add(row)
+            row.idleImgsz = settings.idle_imgsz
+            row.idleEvery = settings.idle_every
+            row.activeImgsz = settings.active_imgsz
+            row.activeEvery = settings.active_every
+            row.targetLatencyMs = settings.target_latency_ms
+            self._bump_version()
+            self._session.commit()
+            self._inference_settings = settings
+
+    def get_regions(self, camera_name: str) -> list[list[tuple[float, float]]]:
+        """Get a camera's region of interest polygons, loading every camera's from the db
+        on a cache miss."""
+        with self._lock:
+            if self._regions is None:
+                self._regions = {}
+                for r in self._session.query(RegionOfInterest).order_by(RegionOfInterest.id):
+                    self._regions.setdefault(r.cameraName, []).append(
+                        [tuple(p) for p in r.pointsJson]
+                    )
+            return list(self._regions.get(camera_name, []))
+
+    def set_regions(self, camera_name: str, polygons: list[list[tuple[float, float]]]) -> None:
+        """Replace a camera's region of interest polygons in the db and invalidate the cache."""
+        with self._lock:
+            try:
+                self._session.query(RegionOfInterest).where(
+                    RegionOfInterest.cameraName == camera_name
+                ).delete()
+                for polygon in polygons:
+                    self._session.add(
+                        RegionOfInterest(camera_name=camera_name, points=[list(p) for p in polygon])
+                    )
+                self._bump_version()
+                self._session.commit()
+            finally:
+                self._regions = None
+
+    def invalidate(self) -> None:
+        """Drop everything cached, so the next read comes from the db."""
+        with self._lock:
+            self._labels = None
+            self._recipients = None
+            self._inference_settings = None
+            self._regions = None
+
+
+# shared cache, used by the web routes and the camera thread alike
+config_cache = ConfigCache()
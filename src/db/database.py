@@ -1,9 +1,33 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
 
 from src.detector.coco_names import coco_names
 
-engine = create_engine("sqlite:///instance/surveillance.db")
+engine = create_engine(
+    "sqlite:///instance/surveillance.db",
+    # the camera thread, the db writer thread and request threads all share the engine,
+    # so wait on a locked db rather than failing straight away
+    connect_args={"check_same_thread": False, "timeout": 15},
+)
+
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tune each new SQLite connection. WAL journaling lets readers (the web UI) carry on
+    while the recorder writes, instead of hitting "database is locked" stalls.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is safe in WAL mode, only the last transactions may be lost on power loss
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # ~8MB page cache (negative values are KiB)
+    cursor.execute("PRAGMA cache_size=-8000")
+    # memory map the first 64MB of the db file
+    cursor.execute("PRAGMA mmap_size=67108864")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA busy_timeout=15000")
+    cursor.close()
+
 
 # create a scoped session, so can be referenced from outside flask app context
 db_session = scoped_session(
@@ -12,13 +36,39 @@ db_session = scoped_session(
 Base = declarative_base()
 Base.query = db_session.query_property()
 
+# columns added to existing tables since they were first created. create_all() only
+# creates missing tables, so these are added to older dbs by init_db()
+added_columns = {
+    "video_snippet": {
+        "labels": "VARCHAR(200)",
+        "sizeBytes": "INTEGER",
+        "placeholder": "TEXT",
+    },
+}
+
 
 def init_db():
     """Initialise the SQLite DB with SQLAlchemy ORM"""
     # import all SQLAlchemy modules so they are set up correctly
-    from .models import VideoSnippet, Labels, EmailRecipient
+    from .models import (
+        VideoSnippet,
+        Labels,
+        EmailRecipient,
+        InferenceSettings,
+        RegionOfInterest,
+        DetectionRollup,
+        ConfigVersion,
+    )
+    from .rollup import rebuild
 
+    had_rollup = inspect(engine).has_table(DetectionRollup.__tablename__)
     Base.metadata.create_all(bind=engine)
+    migrate_db()
+
+    # count the recordings saved before the rollup table was added
+    if not had_rollup:
+        rebuild(db_session)
+        db_session.commit()
 
     # ensure necessary data is set beforehand
     if db_session.query(Labels).first() is None:
@@ -27,3 +77,23 @@ def init_db():
         starting_labels['person'] = True
         db_session.add(Labels(labels_dict=starting_labels))
         db_session.commit()
+
+    if db_session.query(InferenceSettings).first() is None:
+        db_session.add(InferenceSettings())
+        db_session.commit()
+
+    if db_session.query(ConfigVersion).first() is None:
+        db_session.add(ConfigVersion())
+        db_session.commit()
+
+
+def migrate_db():
+    """Add any new columns that are missing from an existing db."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in added_columns.items():
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, column_type in columns.items():
+                if name not in existing:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "{name}" {column_type}'))
+                    print(f"Added column {table}.{name}")
@@ -1,5 +1,6 @@
 import json
-from sqlalchemy import String, Integer, Column, DateTime, JSON
+import os
+from sqlalchemy import String, Integer, Column, DateTime, JSON, Text, UniqueConstraint
 from datetime import datetime, timezone
 from .database import Base
 
@@ -14,6 +15,12 @@ class VideoSnippet(Base):
     thumbnailTitle = Column(String(40), nullable=False)
     created = Column(DateTime, default=datetime.now(timezone.utc))
     description = Column(String(150), nullable=True)
+    # comma separated labels of the objects detected in the video
+    labels = Column(String(200), nullable=True)
+    # combined size of the video and thumbnail files
+    sizeBytes = Column(Integer, nullable=True)
+    # a tiny copy of the thumbnail as a data URI, shown inline while the thumbnail loads
+    placeholder = Column(Text, nullable=True)
 
     def __init__(
         self,
@@ -21,11 +28,24 @@ class VideoSnippet(Base):
         thumbnail_title: str,
         description: str,
         created: datetime = datetime.now(),
+        labels: list[str] | None = None,
+        size_bytes: int | None = None,
+        placeholder: str | None = None,
     ):
         self.snippetTitle = snippet_title
         self.thumbnailTitle = thumbnail_title
         self.created = created
         self.description = description
+        self.labels = ",".join(labels) if labels else None
+        self.sizeBytes = size_bytes
+        self.placeholder = placeholder
+
+    @staticmethod
+    def preview_titles(snippet_title: str) -> tuple[str, str]:
+        """File names of a recording's scrubbing previews: the WebVTT track and the sprite
+        image it points into."""
+        title = os.path.splitext(snippet_title)[0]
+        return f"{title}.vtt", f"{title}_previews.jpg"
 
     def __repr__(self) -> str:
         return f"<VideoSnippet {self.snippetTitle!r}>"
@@ -59,3 +79,98 @@ class EmailRecipient(Base):
 
     def __repr__(self) -> str:
         return f"<EmailRecipient {self.emailAddress!r}>"
+
+
+class InferenceSettings(Base):
+    """SQLAlchemy ORM class that represents a inference_settings table in the SQLite DB"""
+
+    __tablename__ = "inference_settings"
+
+    id = Column(Integer, primary_key=True)
+    # inference size and every-Nth-frame rate while nothing is tracked
+    idleImgsz = Column(Integer, nullable=False, default=96)
+    idleEvery = Column(Integer, nullable=False, default=3)
+    # inference size and every-Nth-frame rate while something is tracked
+    activeImgsz = Column(Integer, nullable=False, default=256)
+    activeEvery = Column(Integer, nullable=False, default=1)
+    # inference size is stepped down while latency is over this
+    targetLatencyMs = Column(Integer, nullable=False, default=250)
+
+    def __init__(
+        self,
+        idle_imgsz: int = 96,
+        idle_every: int = 3,
+        active_imgsz: int = 256,
+        active_every: int = 1,
+        target_latency_ms: int = 250,
+    ) -> None:
+        self.idleImgsz = idle_imgsz
+        self.idleEvery = idle_every
+        self.activeImgsz = active_imgsz
+        self.activeEvery = active_every
+        self.targetLatencyMs = target_latency_ms
+
+    def __repr__(self) -> str:
+        return f"<InferenceSettings {self.id!r}>"
+
+
+class RegionOfInterest(Base):
+    """SQLAlchemy ORM class that represents a region_of_interest table in the SQLite DB"""
+
+    __tablename__ = "region_of_interest"
+
+    id = Column(Integer, primary_key=True)
+    cameraName = Column(String(40), nullable=False, index=True)
+    # polygon as a list of [x, y] points, normalised to 0-1 of the frame size
+    pointsJson = Column(JSON, nullable=False, default=[])
+
+    def __init__(self, camera_name: str, points: list[list[float]]) -> None:
+        self.cameraName = camera_name
+        self.pointsJson = points
+
+    def __repr__(self) -> str:
+        return f"<RegionOfInterest {self.cameraName!r} {self.id!r}>"
+
+
+class DetectionRollup(Base):
+    """SQLAlchemy ORM class that represents a detection_rollup table in the SQLite DB.
+    One row per label per hour with any detections, see rollup.py"""
+
+    __tablename__ = "detection_rollup"
+    # label first, so a label's rows are looked up in hour order from the index
+    __table_args__ = (UniqueConstraint("label", "hour"),)
+
+    id = Column(Integer, primary_key=True)
+    label = Column(String(40), nullable=False)
+    # start of the hour
+    hour = Column(DateTime, nullable=False)
+    # recordings with the label in this hour
+    count = Column(Integer, nullable=False, default=0)
+    # recordings with the label up to the end of this hour, so a range's count is the
+    # difference of two totals
+    total = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, label: str, hour: datetime, count: int = 0, total: int = 0) -> None:
+        self.label = label
+        self.hour = hour
+        self.count = count
+        self.total = total
+
+    def __repr__(self) -> str:
+        return f"<DetectionRollup {self.label!r} {self.hour!r}>"
+
+
+class ConfigVersion(Base):
+    """SQLAlchemy ORM class that represents a config_version table in the SQLite DB.
+    One row, bumped on every config change so other processes know to re-read it"""
+
+    __tablename__ = "config_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, version: int = 0) -> None:
+        self.version = version
+
+    def __repr__(self) -> str:
+        return f"<ConfigVersion {self.version!r}>"
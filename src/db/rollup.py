@@ -0,0 +1,116 @@
+"""Hourly detection counts per label, kept up to date as recordings are saved, so the
+stats api answers range queries from a handful of rows rather than scanning every
+recording.
+
+Each row also has a running total of the label's recordings up to the end of its hour,
+so the count over any range is the difference of two totals, two index lookups per
+label however long the range. Counts are of detections, so they're kept when the
+recordings themselves are deleted.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from src.db.models import DetectionRollup, VideoSnippet
+
+BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def hour_of(when: datetime) -> datetime:
+    """The start of the hour a time is in."""
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_of(when: datetime, bucket: str) -> datetime:
+    """The start of the hour or day a time is in."""
+    if bucket == "day":
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return hour_of(when)
+
+
+def total_before(session: Session, label: str, when: datetime) -> int:
+    """Recordings with a label in the hours before `when`."""
+    total = (
+        session.query(DetectionRollup.total)
+        .filter(DetectionRollup.label == label, DetectionRollup.hour < when)
+        .order_by(DetectionRollup.hour.desc())
+        .limit(1)
+        .scalar()
+    )
+    return total or 0
+
+
+def record_detections(session: Session, when: datetime, labels: list[str]) -> None:
+    """Count a recording made at `when` with objects of each label in it."""
+    hour = hour_of(when)
+    for label in labels:
+        row = session.query(DetectionRollup).filter_by(label=label, hour=hour).first()
+        if row is None:
+            row = DetectionRollup(label, hour, total=total_before(session, label, hour))
+            session.add(row)
+        row.count += 1
+        row.total += 1
+
+        # recordings are normally saved in order so there are no later rows, but one
+        # finalised late still has to be counted in the totals after it
+        session.query(DetectionRollup).filter(
+            DetectionRollup.label == label, DetectionRollup.hour > hour
+        ).update({DetectionRollup.total: DetectionRollup.total + 1}, synchronize_session=False)
+
+        # the session doesn't autoflush, and the next recording may be in the same hour
+        session.flush()
+
+
+def totals(session: Session, start: datetime, end: datetime) -> dict[str, int]:
+    """Recordings with each label, in the hours from the one `start` is in up to `end`,
+    the same hours as `series`."""
+    labels = [label for (label,) in session.query(DetectionRollup.label).distinct()]
+    counts = {
+        label: total_before(session, label, end) - total_before(session, label, hour_of(start))
+        for label in labels
+    }
+    return {label: count for label, count in sorted(counts.items()) if count}
+
+
+def series(session: Session, start: datetime, end: datetime, bucket: str = "hour") -> dict:
+    """Recordings with each label per hour or day from `start` up to `end`, for a chart:
+    the start of each bucket, and each label's count in each bucket."""
+    step = BUCKETS[bucket]
+    buckets = []
+    when = bucket_of(start, bucket)
+    while when < end:
+        buckets.append(when)
+        when += step
+    index = {b: i for i, b in enumerate(buckets)}
+
+    counts = {}
+    rows = session.query(DetectionRollup).filter(
+        DetectionRollup.hour >= hour_of(start), DetectionRollup.hour < end
+    )
+    for row in rows:
+        label_counts = counts.setdefault(row.label, [0] * len(buckets))
+        label_counts[index[bucket_of(row.hour, bucket)]] += row.count
+
+    return {
+        "buckets": [b.isoformat() for b in buckets],
+        "counts": dict(sorted(counts.items())),
+    }
+
+
+def rebuild(session: Session) -> None:
+    """Recount everything from the recordings in the db, e.g. to fill in the counts for
+    recordings saved before there was a rollup."""
+    counts = defaultdict(int)
+    for created, labels in session.query(VideoSnippet.created, VideoSnippet.labels):
+        if created is None or not labels:
+            continue
+        for label in labels.split(","):
+            counts[(label, hour_of(created))] += 1
+
+    session.query(DetectionRollup).delete()
+    running = defaultdict(int)
+    for (label, hour), count in sorted(counts.items()):
+        running[label] += count
+        session.add(DetectionRollup(label, hour, count=count, total=running[label]))
@@ -0,0 +1,123 @@
+import atexit
+import queue
+from threading import Lock, Thread
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session, scoped_session
+
+from src.db.database import db_session
+
+
+class DbWriter:
+    """Single-writer, write-behind queue for the DB.
+
+    Callers (e.g. the camera thread via the recorder) put work on the queue and carry on
+    straight away. A single background thread drains the queue and commits in batches, so
+    the recording path never waits on SQLite locks held by other connections.
+    """
+
+    def __init__(
+        self,
+        session_factory: scoped_session | Callable[[], Session] = db_session,
+        max_batch: int = 50,
+    ) -> None:
+        self._session_factory = session_factory
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = Lock()
+
+    def add(self, obj: Any, on_commit: Callable[[], None] | None = None) -> None:
+        """Queue an ORM object to be inserted. `on_commit` is called once it is committed."""
+        self.submit(lambda session: session.add(obj), on_commit)
+
+    def submit(
+        self,
+        work: Callable[[Session], None],
+        on_commit: Callable[[], None] | None = None,
+    ) -> None:
+        """Queue a callable taking the writer's session. It is committed with its batch."""
+        self._ensure_started()
+        self._queue.put((work, on_commit))
+
+    @property
+    def pending(self) -> int:
+        """Number of items waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until everything queued so far has been committed."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_started(self) -> None:
+        """Start the background writer thread, if it isn't running already."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Writer background thread."""
+        while True:
+            # block for the first item, then take whatever else is waiting up to the batch size
+            batch = [self._queue.get()]
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # e.g. the rollback failed, drop the batch but keep the thread running
+                print(f"DB writer dropped batch of {len(batch)}: {e}")
+            finally:
+                # every item taken off the queue is done, or flush() would wait forever
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list) -> None:
+        """Apply and commit a batch of work in one transaction."""
+        session = self._session_factory()
+        try:
+            for work, _ in batch:
+                work(session)
+            session.commit()
+        except Exception as e:
+            print(f"DB writer failed to commit batch: {e}")
+            session.rollback()
+            # retry items one at a time so a single bad item doesn't lose the whole batch
+            batch = self._write_individually(session, batch)
+        finally:
+            if isinstance(self._session_factory, scoped_session):
+                self._session_factory.remove()
+
+        # run callbacks outside of the transaction
+        for _, on_commit in batch:
+            if on_commit:
+                try:
+                    on_commit()
+                except Exception as e:
+                    print(f"DB writer on_commit callback failed: {e}")
+
+    def _write_individually(self, session: Session, batch: list) -> list:
+        """Commit each item on its own, returning the items that succeeded."""
+        committed = []
+        for work, on_commit in batch:
+            try:
+                work(session)
+                session.commit()
+                committed.append((work, on_commit))
+            except Exception as e:
+                print(f"DB writer dropped item: {e}")
+                session.rollback()
+        return committed
+
+
+# shared writer, so there is only ever one writing thread
+db_writer = DbWriter()
+
+# make sure queued writes land before the process exits
+atexit.register(db_writer.flush)
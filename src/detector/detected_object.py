@@ -9,6 +9,7 @@ class DetectedObject:
     bbox: np.ndarray
     height: int
     width: int
+    track_id: int | None = None
 
     @staticmethod
     def parse_objects(objects_detected: Dict[int, list[Self]]) -> str:
@@ -1,108 +1,151 @@
 from abc import ABCMeta, abstractmethod
+from threading import Lock
+from typing import Any, Hashable
+
 from ultralytics import YOLO
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
 import numpy as np
+import torch
 
 from src.detector.detected_object import DetectedObject
+from src.detector.roi import RegionMask
+from src.inference.adaptive import AdaptiveRate
+from src.metrics.metrics import metrics
 from src.recorder.recorder import Recorder
 
 
-class BaseDetector(metaclass=ABCMeta):
-    """Base class used for all detector classes."""
-    @abstractmethod
-    def process_img(self, img_arr: np.ndarray) -> np.ndarray:
-        """Processes an image np.ndarray argument and then returns it."""
-        return
+# ByteTrack settings, as in ultralytics' default bytetrack.yaml
+TRACKER_CONFIG = {
+    "tracker_type": "bytetrack",
+    "track_high_thresh": 0.5,
+    "track_low_thresh": 0.1,
+    "new_track_thresh": 0.6,
+    "track_buffer": 30,
+    "match_thresh": 0.8,
+    "fuse_score": True,
+}
 
 
-class YoloWorldDetector(BaseDetector):
-    """ML detector class based on the Yolo World algorithm."""
-    def __init__(
-        self,
-        recorder: Recorder,
-        labels: list[str] = ["person"],
-        buffer_frames: int = 10,
-    ) -> None:
-        # Load the YOLO model
-        self._model = YOLO("yolov8s-world.pt").cpu()
+class ModelCache:
+    """Loads each YOLO model once, so the detectors of every camera share it. Frames
+    for detectors sharing a model can then go through one batched forward pass.
+    """
 
-        # set labels
-        self._labels = labels
-        self._model.set_classes(self._labels)
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._models = {}
+        # a model can only run one forward pass at a time
+        self._model_locks = {}
 
-        # Dictionary to hold tracking information
-        self._tracked_objects = {}
+    def get(self, weights: str, labels: list[str] | None = None) -> YOLO:
+        """Get the model for some weights (and, for open vocab models, labels)."""
+        key = (weights, tuple(labels) if labels is not None else None)
 
-        # Recorder instance
-        self._recorder = recorder
+        with self._lock:
+            if key not in self._models:
+                # drop models for the same weights with old labels
+                for old_key in [k for k in self._models if k[0] == weights]:
+                    old_model = self._models.pop(old_key)
+                    self._model_locks.pop(id(old_model), None)
 
-        # Tracking and recording control
-        self._frames_without_tracking = 0
+                # Load the YOLO model
+                model = YOLO(weights).cpu()
+                if labels is not None:
+                    model.set_classes(labels)
 
-        # Buffer period to avoid premature stopping
-        self._buffer_frames = buffer_frames
+                self._models[key] = model
+                self._model_locks[id(model)] = Lock()
 
-    def process_img(self, img_arr: np.ndarray) -> np.ndarray:
-        # get results from model
-        results = self._model.track(img_arr, imgsz=96, persist=True, verbose=False)
-        # set flag
-        tracking_detected = False
+            return self._models[key]
 
-        # iterate results
-        for result in results:
-            # get dims and boxes
-            height, width = result.orig_shape
-            boxes = result.boxes
-
-            # if tracking (and therefore motion)
-            if boxes.is_track:
-                # set flag
-                tracking_detected = True
-
-                for i, box in enumerate(boxes):
-                    # create DetectedObject with box info
-                    track_id = int(box.id)
-                    d_o = DetectedObject(
-                        label=self._labels[int(box.cls)],  # Get label using class index
-                        bbox=box.xyxy[0].cpu().numpy(),  # Get bounding box coordinates
-                        height=height,
-                        width=width,
-                    )
-
-                    # store data
-                    if track_id not in self._tracked_objects:
-                        self._tracked_objects[track_id] = []
-                    self._tracked_objects[track_id].append(d_o)
+    def lock_for(self, model: YOLO) -> Lock:
+        """Get the lock to hold while running a model."""
+        with self._lock:
+            return self._model_locks.setdefault(id(model), Lock())
 
-        if tracking_detected:
-            # start recording if not already
-            self._frames_without_tracking = 0
-            if not self._recorder._is_recording:
-                self._recorder.start_recording(img_arr.shape)
-        else:
-            self._frames_without_tracking += 1
+    def clear(self) -> None:
+        """Forget all loaded models."""
+        with self._lock:
+            self._models = {}
+            self._model_locks = {}
 
-        if self._recorder._is_recording:
-            # write frame
-            self._recorder.write_frame(img_arr)
-            # if buffer limit reached for non-activity, stop recording
-            if self._frames_without_tracking >= self._buffer_frames:
-                self._recorder.stop_recording(self._tracked_objects)
 
-        # annotate frame and return it
-        annotated_frame = results[0].plot()
-        return annotated_frame
+# shared between all detectors
+model_cache = ModelCache()
 
 
+class BaseDetector(metaclass=ABCMeta):
+    """Base class used for all detector classes.
+
+    Inference is split in two, so frames can be batched: `predict` runs a batched
+    forward pass (and may be shared by every detector with the same `batch_key`),
+    `handle_result` then applies one frame's result to this detector's own state.
+    """
+
+    @property
+    def batch_key(self) -> Hashable:
+        """Detectors with equal keys can have their frames predicted in one batch."""
+        return id(self)
+
+    def should_predict(self) -> bool:
+        """Invoked once per frame, in order, whether to run inference on it. Frames that
+        skip it are passed to `handle_result` with a None result."""
+        return True
+
+    def prepare(self, img_arr: np.ndarray) -> np.ndarray:
+        """Invoked per frame before batching, returns the image to run inference on."""
+        return img_arr
+
+    def warm_up(self, shape: tuple[int, int, int] = (480, 640, 3), runs: int = 2) -> None:
+        """Run inference on blank frames, so the first real frames don't pay for loading
+        and setting up the model. Detection state (tracking, recording) is untouched."""
+        return
+
+    @abstractmethod
+    def predict(self, imgs: list[np.ndarray]) -> list[Any]:
+        """Run inference on a batch of images, returning one result per image."""
+        return
+
+    @abstractmethod
+    def handle_result(self, img_arr: np.ndarray, result: Any | None) -> list[DetectedObject]:
+        """Apply an image's inference result (None if it was skipped), then return the
+        objects detected in it."""
+        return
+
+    def process_img(self, img_arr: np.ndarray) -> list[DetectedObject]:
+        """Processes an image np.ndarray argument and returns the objects detected in it."""
+        with metrics.span("process"):
+            return self.handle_result(img_arr, self.predict([self.prepare(img_arr)])[0])
+
+
+class YoloDetector(BaseDetector):
+    """Base class for the YOLO based detectors. Each detector tracks objects with its own
+    tracker, so it can share its model with detectors for other cameras.
+    """
 
-class YoloV8NDetector(BaseDetector):
-    """ML detector class based on the Yolo v8 nano algorithm."""
     def __init__(
         self,
+        model: YOLO,
         recorder: Recorder,
-        buffer_frames: int = 10,
+        buffer_frames: int,
+        rate: AdaptiveRate | None = None,
+        regions: RegionMask | None = None,
     ) -> None:
-        # Load the YOLO model
-        self._model = YOLO("yolov8n.pt").cpu()
+        self._model = model
+        self._model_lock = model_cache.lock_for(model)
+
+        # picks the inference size and how often inference runs
+        self.rate = rate or AdaptiveRate()
+
+        # regions of the frame to detect objects in
+        self.regions = regions or RegionMask()
+
+        # objects detected in the last frame inference ran on
+        self._last_detections = []
+
+        # object tracker for this detector's camera
+        self._tracker = BYTETracker(args=IterableSimpleNamespace(**TRACKER_CONFIG))
 
         # Dictionary to hold tracking information
         self._tracked_objects = {}
@@ -116,55 +159,196 @@ class YoloV8NDetector(BaseDetector):
         # Buffer period to avoid premature stopping
         self._buffer_frames = buffer_frames
 
-    def process_img(self, img_arr: np.ndarray) -> np.ndarray:
-        # get results from model
-        results = self._model.track(img_arr, imgsz=96, persist=True, verbose=False)
-        
+    @property
+    def batch_key(self) -> Hashable:
+        # frames can only be batched at the same size
+        return (id(self._model), self.rate.imgsz)
+
+    def should_predict(self) -> bool:
+        return self.rate.should_infer()
+
+    def prepare(self, img_arr: np.ndarray) -> np.ndarray:
+        # only run inference on the area around the regions of interest
+        return self.regions.crop(img_arr)
+
+    def set_regions(self, regions: RegionMask) -> None:
+        """Change the regions of interest. The crop changes, so tracking starts afresh."""
+        self.regions = regions
+        self._tracker = BYTETracker(args=IterableSimpleNamespace(**TRACKER_CONFIG))
+
+    def _get_label(self, result: Any, cls: int) -> str:
+        """Get the label of a detected class index."""
+        return result.names[cls]
+
+    def predict(self, imgs: list[np.ndarray]) -> list[Any]:
+        # get results from model, one forward pass for the whole batch
+        with self._model_lock:
+            return self._model.predict(imgs, imgsz=self.rate.imgsz, verbose=False)
+
+    def warm_up(self, shape: tuple[int, int, int] = (480, 640, 3), runs: int = 2) -> None:
+        # the model sets itself up (fusing layers, the predictor...) on its first call, and
+        # each inference size allocates its own buffers, so run every size the rate uses
+        img_arr = self.prepare(np.zeros(shape, dtype=np.uint8))
+        with metrics.span("warm_up"), self._model_lock:
+            for imgsz in self.rate.sizes:
+                for _ in range(runs):
+                    self._model.predict([img_arr], imgsz=imgsz, verbose=False)
+
+    def _filter_regions(self, img_arr: np.ndarray, result: Any) -> Any:
+        """Drop detections whose centre is outside the regions of interest."""
+        if not self.regions or len(result.boxes) == 0:
+            return result
+
+        # boxes are relative to the crop
+        x1, y1, _, _ = self.regions.crop_box(img_arr.shape)
+        keep = [
+            i
+            for i, (x, y, _, _) in enumerate(result.boxes.xywh.cpu().numpy())
+            if self.regions.contains(x + x1, y + y1, img_arr.shape)
+        ]
+        return result[np.array(keep, dtype=int)]
+
+    def _track(self, result: Any) -> Any:
+        """Update this detector's tracker with a result, returning it with track ids."""
+        tracks = self._tracker.update(result.boxes.cpu().numpy(), result.orig_img)
+        if len(tracks) == 0:
+            return result
+
+        # keep the tracked boxes, with their track ids
+        result = result[tracks[:, -1].astype(int)]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return result
+
+    def handle_result(self, img_arr: np.ndarray, result: Any | None) -> list[DetectedObject]:
+        # inference skipped for this frame, keep recording and reuse the last detections
+        if result is None:
+            # counted towards the buffer too if the last inference tracked nothing, so the
+            # buffer is in real frames whatever the inference rate
+            if self._frames_without_tracking:
+                self._frames_without_tracking += 1
+            self._record(img_arr)
+            return self._last_detections
+
+        result = self._track(self._filter_regions(img_arr, result))
+
         # set flag
         tracking_detected = False
 
-        # iterate results
-        for result in results:
-            # get dims and boxes
-            height, width = result.orig_shape
-            boxes = result.boxes
-
-            # if tracking (and therefore motion)
-            if boxes.is_track:
-                # set flag
-                tracking_detected = True
-
-                for i, box in enumerate(boxes):
-                    # create DetectedObject with box info
-                    track_id = int(box.id)
-                    d_o = DetectedObject(
-                        label=result.names[int(box.cls)],
-                        bbox=box.xyxy[0].cpu().numpy(),  # Get bounding box coordinates
-                        height=height,
-                        width=width,
-                    )
-
-                    # store data
-                    if track_id not in self._tracked_objects:
-                        self._tracked_objects[track_id] = []
-                    self._tracked_objects[track_id].append(d_o)
+        # get dims and boxes, and where the inference crop sits in the frame
+        height, width = img_arr.shape[:2]
+        x1, y1, _, _ = self.regions.crop_box(img_arr.shape)
+        offset = np.array([x1, y1, x1, y1], dtype=np.float32)
+        boxes = result.boxes
+
+        # if tracking (and therefore motion)
+        if boxes.is_track:
+            # set flag
+            tracking_detected = True
+
+        detections = []
+        for box in boxes:
+            # create DetectedObject with box info
+            track_id = int(box.id) if boxes.is_track else None
+            d_o = DetectedObject(
+                label=self._get_label(result, int(box.cls)),
+                bbox=box.xyxy[0].cpu().numpy() + offset,  # Get bounding box coordinates
+                height=height,
+                width=width,
+                track_id=track_id,
+            )
+            detections.append(d_o)
 
         if tracking_detected:
-            # start recording if not already
+            # start recording if not already, with its own tracked objects from this frame on
             self._frames_without_tracking = 0
-            if not self._recorder._is_recording:
-                self._recorder.start_recording(img_arr.shape)
+            if not self._recorder.is_recording:
+                self._tracked_objects = {}
+                self._recorder.start_recording(img_arr.shape, self._tracked_objects)
         else:
             self._frames_without_tracking += 1
 
-        if self._recorder._is_recording:
+        # store data, for the recording's description and labels
+        for d_o in detections:
+            if d_o.track_id is not None:
+                self._tracked_objects.setdefault(d_o.track_id, []).append(d_o)
+
+        self._record(img_arr)
+
+        # adapt inference size and rate to tracking and latency
+        speed = getattr(result, "speed", None) or {}
+        latency = sum(v for v in speed.values() if v is not None) if speed else None
+        self.rate.update(tracking_detected, latency)
+
+        # the camera annotates the frame, only if anyone is watching
+        self._last_detections = detections
+        return detections
+
+    def _record(self, img_arr: np.ndarray) -> None:
+        """Write a frame to the recording, if recording, and stop once there have been
+        `buffer_frames` frames without anything tracked."""
+        if self._recorder.is_recording:
             # write frame
             self._recorder.write_frame(img_arr)
             # if buffer limit reached for non-activity, stop recording
             if self._frames_without_tracking >= self._buffer_frames:
                 self._recorder.stop_recording(self._tracked_objects)
 
-        # annotate frame and return it
-        annotated_frame = results[0].plot()
-        return annotated_frame
 
+class YoloWorldDetector(YoloDetector):
+    """ML detector class based on the Yolo World algorithm."""
+    def __init__(
+        self,
+        recorder: Recorder,
+        labels: list[str] = ["person"],
+        buffer_frames: int = 10,
+        rate: AdaptiveRate | None = None,
+        regions: RegionMask | None = None,
+    ) -> None:
+        # set labels
+        self._labels = labels
+
+        # Load the YOLO model (shared with other detectors using the same labels)
+        super().__init__(
+            model=model_cache.get("yolov8s-world.pt", labels=self._labels),
+            recorder=recorder,
+            buffer_frames=buffer_frames,
+            rate=rate,
+            regions=regions,
+        )
+
+    def _get_label(self, result: Any, cls: int) -> str:
+        return self._labels[cls]  # Get label using class index
+
+
+class YoloV8NDetector(YoloDetector):
+    """ML detector class based on the Yolo v8 nano algorithm."""
+    def __init__(
+        self,
+        recorder: Recorder,
+        buffer_frames: int = 10,
+        rate: AdaptiveRate | None = None,
+        regions: RegionMask | None = None,
+    ) -> None:
+        # Load the YOLO model (shared with other detectors)
+        super().__init__(
+            model=model_cache.get("yolov8n.pt"),
+            recorder=recorder,
+            buffer_frames=buffer_frames,
+            rate=rate,
+            regions=regions,
+        )
+
+
+def create_detector(
+    model: str,
+    recorder: Recorder,
+    labels: list[str] = ["person"],
+    rate: AdaptiveRate | None = None,
+    regions: RegionMask | None = None,
+) -> BaseDetector | None:
+    """Create a detector from its model key ("v8world" or "v8nano"), None if there's no match."""
+    if model == "v8world":
+        return YoloWorldDetector(labels=labels, recorder=recorder, rate=rate, regions=regions)
+    elif model == "v8nano":
+        return YoloV8NDetector(recorder=recorder, rate=rate, regions=regions)
+    return None
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+
+class RegionMask:
+    """A camera's regions of interest, as polygons of normalised (0 to 1) points. Inference
+    is cropped to the area bounding every region, and detections whose centre is outside
+    all of them are ignored. With no regions, the whole frame is of interest.
+    """
+
+    def __init__(self, polygons: list[list[tuple[float, float]]] | None = None, pad: int = 8) -> None:
+        self.polygons = [p for p in polygons or [] if len(p) >= 3]
+        self._pad = pad
+        # pixel polygons and crop box, by frame shape
+        self._scaled = {}
+
+    def __bool__(self) -> bool:
+        return len(self.polygons) > 0
+
+    def _for_shape(self, shape: tuple[int, ...]) -> tuple[list[np.ndarray], tuple[int, int, int, int]]:
+        """Get the regions in pixels, and the box bounding them, for a frame shape."""
+        height, width = shape[:2]
+        if (height, width) not in self._scaled:
+            contours = [
+                (np.array(p, dtype=np.float32) * (width, height)).astype(np.int32)
+                for p in self.polygons
+            ]
+            if contours:
+                x, y, w, h = cv2.boundingRect(np.concatenate(contours))
+                box = (
+                    max(0, x - self._pad),
+                    max(0, y - self._pad),
+                    min(width, x + w + self._pad),
+                    min(height, y + h + self._pad),
+                )
+            else:
+                box = (0, 0, width, height)
+            self._scaled[(height, width)] = (contours, box)
+        return self._scaled[(height, width)]
+
+    def crop_box(self, shape: tuple[int, ...]) -> tuple[int, int, int, int]:
+        """The (x1, y1, x2, y2) box to crop a frame of this shape to before inference."""
+        return self._for_shape(shape)[1]
+
+    def crop(self, img_arr: np.ndarray) -> np.ndarray:
+        """Crop a frame to the area bounding the regions (a view, not a copy)."""
+        x1, y1, x2, y2 = self.crop_box(img_arr.shape)
+        return img_arr[y1:y2, x1:x2]
+
+    def contains(self, x: float, y: float, shape: tuple[int, ...]) -> bool:
+        """Whether a point, in frame pixels, is inside any of the regions."""
+        contours, _ = self._for_shape(shape)
+        if not contours:
+            return True
+        return any(cv2.pointPolygonTest(c, (float(x), float(y)), False) >= 0 for c in contours)
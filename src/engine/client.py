@@ -0,0 +1,251 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from threading import Lock, get_ident
+from typing import Any
+
+from src.db.cache import CachedInferenceSettings
+from src.engine.frames import FrameRing
+
+# the directory src is in, for running the engine with python -m
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class EngineError(Exception):
+    """An engine command failed in the engine process."""
+
+
+class EngineConnection:
+    """A connection to the engine's control socket, sending one request at a time."""
+
+    def __init__(self, socket_path: str, timeout: float | None = 120) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(socket_path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rb")
+
+    def call(self, command: str, **args: Any) -> Any:
+        """Run an engine command, returning its result. Raises EngineError (or RuntimeError,
+        for a busy engine) if it failed, or ConnectionError if the engine went away."""
+        self._socket.sendall(json.dumps({"command": command, "args": args}).encode() + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Engine closed the connection")
+
+        response = json.loads(line)
+        if response["ok"]:
+            return response["result"]
+        if response["type"] == "RuntimeError":
+            raise RuntimeError(response["error"])
+        raise EngineError(f"{response['type']}: {response['error']}")
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+
+class RemoteCamera:
+    """A camera running in the engine process, streamed from its frame rings in shared
+    memory. It has the streaming part of `Camera`'s interface, so the same routes serve
+    either.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        name: str,
+        ring_names: dict[str, str],
+        poll_interval: float = 0.01,
+        frame_timeout: float = 10,
+    ) -> None:
+        self.name = name
+        self.renditions = {r: FrameRing(ring_name) for r, ring_name in ring_names.items()}
+        self._socket_path = socket_path
+        self._poll_interval = poll_interval
+        self._frame_timeout = frame_timeout
+        # each client's connection (open while it watches) and the last frame it got
+        self._clients = {}
+        self._lock = Lock()
+
+    def subscribe(self, rendition: str = "full") -> None:
+        """Start watching a rendition, from the client's thread. The engine counts the
+        client as a viewer for as long as its connection is open."""
+        connection = EngineConnection(self._socket_path, timeout=5)
+        try:
+            connection.call("subscribe", camera=self.name, rendition=rendition)
+        except Exception:
+            connection.close()
+            raise
+        with self._lock:
+            self._clients[(get_ident(), rendition)] = [connection, 0]
+
+    def unsubscribe(self, rendition: str = "full") -> None:
+        """Stop watching a rendition, from the client's thread."""
+        with self._lock:
+            client = self._clients.pop((get_ident(), rendition), None)
+        if client:
+            client[0].close()
+
+    def get_frame(self, rendition: str = "full") -> bytes:
+        """Return the next camera frame, in the given rendition. Raises TimeoutError if no
+        frame comes, e.g. if the engine stopped."""
+        key = (get_ident(), rendition)
+        if key not in self._clients:
+            self.subscribe(rendition)
+        client = self._clients[key]
+        ring = self.renditions[rendition]
+
+        # wait for a newer frame than this client last got
+        deadline = time.monotonic() + self._frame_timeout
+        while (frame := ring.read(after=client[1])) is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No frames from camera {self.name}")
+            time.sleep(self._poll_interval)
+
+        client[1], data = frame
+        return data
+
+    def close(self) -> None:
+        """Detach from the frame rings."""
+        for ring in self.renditions.values():
+            ring.close()
+
+
+class EngineClient:
+    """The engine, running in its own process (see server.py), used through its control
+    socket. It has the same interface as `Engine`, so the web app uses either.
+    """
+
+    def __init__(self, socket_path: str) -> None:
+        self._socket_path = socket_path
+        self._cameras = {}
+        self._ring_names = None
+        self._lock = Lock()
+
+    def _call(self, command: str, timeout: float | None = 120, **args: Any) -> Any:
+        """Run an engine command on a new connection."""
+        connection = EngineConnection(self._socket_path, timeout=timeout)
+        try:
+            return connection.call(command, **args)
+        finally:
+            connection.close()
+
+    def ensure_running(self, config: dict, stop_timeout: float = 60) -> None:
+        """Start the engine process with the app's config, unless it's running already. It
+        outlives the app, so one running with different config (e.g. cameras or model
+        changed since it was started) is stopped and started again with this config."""
+        # as the engine gets it, through JSON
+        config = json.loads(json.dumps(config))
+        try:
+            if self._call("config", timeout=2) == config:
+                return
+            print("Engine running with different config, restarting it.")
+            self._call("shutdown", timeout=2)
+            self._wait_stopped(stop_timeout)
+        except OSError:
+            pass
+
+        # it exits straight away if another web process started one first
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "src.engine.server",
+                "--socket",
+                self._socket_path,
+                "--config",
+                json.dumps(config),
+            ],
+            cwd=PROJECT_DIR,
+            start_new_session=True,
+        )
+
+    def _wait_stopped(self, timeout: float) -> None:
+        """Wait for the engine process to exit, i.e. release the socket's lock, so the one
+        started next doesn't find it still running."""
+        # imported here, as the server module pulls in the engine
+        from src.engine.server import acquire_lock
+
+        deadline = time.monotonic() + timeout
+        while (lock_file := acquire_lock(self._socket_path)) is None:
+            if time.monotonic() > deadline:
+                print("Timed out waiting for the engine to stop.")
+                return
+            time.sleep(0.1)
+        lock_file.close()
+
+    def status(self) -> dict:
+        try:
+            return self._call("status", timeout=2)
+        except OSError:
+            return {"ready": False, "state": "unreachable", "cameras": {}}
+
+    def _rings(self) -> dict[str, dict[str, str]]:
+        """The frame ring names of each camera, fetched again if the engine restarted."""
+        ring_names = self._call("cameras", timeout=5)
+        with self._lock:
+            if ring_names != self._ring_names:
+                # rings are named per engine process, so these are from an old one
+                self._cameras = {}
+                self._ring_names = ring_names
+        return ring_names
+
+    def camera_names(self) -> list[str]:
+        try:
+            return list(self._rings())
+        except OSError:
+            return []
+
+    def camera(self, name: str) -> RemoteCamera | None:
+        try:
+            ring_names = self._rings()
+        except OSError:
+            return None
+        if name not in ring_names:
+            return None
+
+        with self._lock:
+            if name not in self._cameras:
+                self._cameras[name] = RemoteCamera(self._socket_path, name, ring_names[name])
+            return self._cameras[name]
+
+    def stats(self) -> dict:
+        return self._call("stats")
+
+    def stage_metrics(self) -> str:
+        return self._call("stage_metrics")
+
+    def record_player_ttff(self, seconds: float) -> None:
+        self._call("record_player_ttff", seconds=seconds)
+
+    def profile(self, seconds: float) -> str:
+        return self._call("profile", seconds=seconds)
+
+    def get_model(self) -> str | None:
+        try:
+            return self._call("get_model", timeout=5)
+        except OSError:
+            return None
+
+    def set_detectors(self, model: str, labels: list[str]) -> None:
+        self._call("set_detectors", model=model, labels=labels)
+
+    def configure_inference(self, settings: CachedInferenceSettings) -> None:
+        self._call("configure_inference", settings=asdict(settings))
+
+    def set_regions(self, name: str, polygons: list[list[tuple[float, float]]]) -> None:
+        self._call("set_regions", name=name, polygons=polygons)
+
+    def delete_recordings(self, ids: list[int]) -> None:
+        self._call("delete_recordings", ids=ids)
+
+    def reload_config(self) -> None:
+        self._call("reload_config")
@@ -0,0 +1,284 @@
+import os
+import time
+from dataclasses import asdict
+from threading import Thread
+from typing import TYPE_CHECKING, Any, Mapping
+
+from src.camera.camera import Camera
+from src.db.cache import CachedInferenceSettings, config_cache
+from src.db.writer import db_writer
+from src.detector.roi import RegionMask
+from src.metrics.metrics import metrics
+from src.profiler.profiler import profiler
+
+if TYPE_CHECKING:
+    from src.inference.scheduler import InferenceScheduler
+    from src.retention.retention import RetentionManager
+
+
+# app config the engine is built from
+CONFIG_KEYS = (
+    "RETENTION_MAX_AGE_DAYS",
+    "RETENTION_MAX_TOTAL_BYTES",
+    "RETENTION_MAX_COUNT_PER_LABEL",
+    "RETENTION_MIN_FREE_BYTES",
+    "RETENTION_MIN_KEEP",
+    "RETENTION_INTERVAL",
+    "CAMERA_SOURCES",
+    "INFERENCE_WORKERS",
+    "INFERENCE_MAX_FPS",
+    "INFERENCE_MAX_BATCH",
+    "INFERENCE_MAX_WAIT",
+    "MODEL",
+    "STREAM_BUDGET_BYTES_PER_SEC",
+)
+
+
+class Engine:
+    """Starts capture and detection for every camera at boot, in a background thread, so
+    objects are detected and recorded whether or not anyone is watching. Each model is
+    warmed up with a few inferences on blank frames first, so neither the first frames
+    nor the first viewer pay for it.
+
+    The web app only uses the engine through its public methods, which `EngineClient`
+    (see client.py) mirrors, so the engine can run in this process or in its own.
+    """
+
+    def __init__(
+        self,
+        cameras: list[Camera],
+        scheduler: "InferenceScheduler | None" = None,
+        retention: "RetentionManager | None" = None,
+        warm_up_runs: int = 2,
+        model: str | None = None,
+    ) -> None:
+        self._cameras = {camera.name: camera for camera in cameras}
+        # the model the detectors use, the engine's so every web worker sees the same one
+        self._model = model
+        self._scheduler = scheduler
+        self._retention = retention
+        self._warm_up_runs = warm_up_runs
+        self._thread = None
+        # "stopped", "warming_up", "starting_cameras" or "running"
+        self.state = "stopped"
+
+    @property
+    def ready(self) -> bool:
+        """Whether warm up is done and every camera is processing frames."""
+        return self.state == "running" and all(c.ready for c in self._cameras.values())
+
+    def status(self) -> dict:
+        """The engine's state, and whether each camera is ready."""
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "cameras": {name: camera.ready for name, camera in self._cameras.items()},
+        }
+
+    def start(self) -> None:
+        """Start the engine in a background thread, returning straight away."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name="engine-boot", daemon=True)
+            self._thread.start()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait for the engine to finish starting."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self) -> None:
+        """Stop the cameras and the threads the engine was built with."""
+        for name in list(self._cameras):
+            Camera.unregister(name)
+        if self._scheduler:
+            self._scheduler.stop()
+        # let recordings being finalised in the background be saved
+        for camera in self._cameras.values():
+            if camera.recorder is not None:
+                camera.recorder.wait_finalised(timeout=30)
+        if self._retention:
+            self._retention.stop()
+        self.state = "stopped"
+
+    def _run(self) -> None:
+        """Engine boot thread."""
+        self.state = "warming_up"
+        self.warm_up()
+
+        # start the cameras, each returns once its first frame is processed
+        self.state = "starting_cameras"
+        for camera in self._cameras.values():
+            camera.start()
+
+        self.state = "running"
+        print("Engine running.")
+
+    def warm_up(self) -> None:
+        """Warm up the detector of each camera, once for detectors sharing a model."""
+        warmed = set()
+        for camera in self._cameras.values():
+            detector = camera.detector
+            if detector.batch_key in warmed:
+                continue
+            warmed.add(detector.batch_key)
+
+            start = time.perf_counter()
+            try:
+                detector.warm_up(runs=self._warm_up_runs)
+            except Exception as e:
+                # not fatal, the first real frames will just be slow
+                print(f"Warm up of {camera.name} detector failed: {e}")
+                continue
+            print(f"Warmed up {camera.name} detector in {time.perf_counter() - start:.2f}s.")
+
+    def camera_names(self) -> list[str]:
+        """Names of the cameras, in the order they were configured."""
+        return list(self._cameras)
+
+    def camera(self, name: str) -> Camera | None:
+        """Get a camera to stream, by name."""
+        return self._cameras.get(name)
+
+    def stats(self) -> dict:
+        """Per camera inference counts, viewers and stream quality, and the db queue depth."""
+        scheduler_stats = self._scheduler.stats() if self._scheduler else {}
+        return {
+            "cameras": {
+                name: {
+                    **scheduler_stats.get(name, {}),
+                    "viewers": {r: rendition.viewers for r, rendition in camera.renditions.items()},
+                    "quality": {
+                        r: rendition.encoder.stats()["quality"]
+                        for r, rendition in camera.renditions.items()
+                    },
+                }
+                for name, camera in self._cameras.items()
+            },
+            "db_writer_pending": db_writer.pending,
+        }
+
+    def stage_metrics(self) -> str:
+        """The pipeline stage timing histograms, as Prometheus text."""
+        return metrics.render()
+
+    def record_player_ttff(self, seconds: float) -> None:
+        """Record a player's time-to-first-frame, as reported by the browser."""
+        metrics.observe("player_ttff", seconds)
+
+    def profile(self, seconds: float) -> str:
+        """Profile the camera and inference threads, returning collapsed stacks. Raises
+        RuntimeError if a profile is already being taken."""
+        return profiler.collapse(profiler.profile(seconds))
+
+    def get_model(self) -> str | None:
+        """The model the detectors use."""
+        return self._model
+
+    def set_detectors(self, model: str, labels: list[str]) -> None:
+        """Give each camera a new detector, for a model and labels."""
+        # imported here, as it pulls in torch and ultralytics
+        from src.detector.detector import create_detector
+
+        for camera in self._cameras.values():
+            new_detector = create_detector(
+                model,
+                recorder=camera.recorder,
+                labels=labels,
+                rate=camera.detector.rate,
+                regions=camera.detector.regions,
+            )
+            # warm it up while the old detector keeps running, then swap it in
+            new_detector.warm_up(runs=self._warm_up_runs)
+            camera.set_detector(new_detector)
+        self._model = model
+
+    def configure_inference(self, settings: CachedInferenceSettings) -> None:
+        """Apply new inference settings to each camera's detector, no restart needed."""
+        for camera in self._cameras.values():
+            camera.detector.rate.configure(**asdict(settings))
+
+    def set_regions(self, name: str, polygons: list[list[tuple[float, float]]]) -> None:
+        """Apply new regions of interest to a camera's detector."""
+        camera = self._cameras.get(name)
+        if camera is not None:
+            camera.detector.set_regions(RegionMask(polygons))
+
+    def delete_recordings(self, ids: list[int]) -> None:
+        """Delete recordings (db entries and files), returning once they're gone."""
+        self._retention.delete_recordings(ids, wait=True)
+
+    def reload_config(self) -> None:
+        """Re-read config from the db on next use, after it was changed elsewhere."""
+        config_cache.invalidate()
+
+
+def build_engine(config: Mapping[str, Any], output_dir: str) -> Engine:
+    """Build the engine from the app's config: the retention manager, the inference
+    scheduler, and a camera with its own recorder and detector for each camera source.
+    Threads are started, except the engine's, which `Engine.start` starts."""
+    # imported here, as they pull in torch, ultralytics and the camera libraries
+    from src.camera.sources import create_source
+    from src.detector.detector import create_detector
+    from src.inference.adaptive import AdaptiveRate
+    from src.inference.scheduler import InferenceScheduler
+    from src.recorder.recorder import Recorder
+    from src.retention.retention import RetentionManager
+
+    # config retention of old recordings
+    os.makedirs(output_dir, exist_ok=True)
+    retention = RetentionManager(
+        output_dir=output_dir,
+        max_age_days=config["RETENTION_MAX_AGE_DAYS"],
+        max_total_bytes=config["RETENTION_MAX_TOTAL_BYTES"],
+        max_count_per_label=config["RETENTION_MAX_COUNT_PER_LABEL"],
+        min_free_bytes=config["RETENTION_MIN_FREE_BYTES"],
+        min_keep=config["RETENTION_MIN_KEEP"],
+        interval=config["RETENTION_INTERVAL"],
+    )
+    retention.start()
+
+    # warm the config cache, so the camera thread never has to read config from the db
+    config_cache.get_email_recipients()
+
+    # config the inference workers shared by all cameras
+    scheduler = InferenceScheduler(
+        workers=config["INFERENCE_WORKERS"],
+        max_fps_per_camera=config["INFERENCE_MAX_FPS"],
+        max_batch=config["INFERENCE_MAX_BATCH"],
+        max_wait=config["INFERENCE_MAX_WAIT"],
+    )
+    scheduler.start()
+
+    # config cameras, each with its own recorder and detector
+    labels = config_cache.get_enabled_labels()  # get labels from cache
+    inference_settings = config_cache.get_inference_settings()
+    cameras = []
+    for source_config in config["CAMERA_SOURCES"]:
+        name = source_config["name"]
+        recorder = Recorder(
+            output_dir=output_dir,
+            retention=retention,
+            title_prefix="" if name == "main" else f"{name}_",
+        )
+        detector = create_detector(
+            config["MODEL"],
+            recorder=recorder,
+            labels=labels,
+            rate=AdaptiveRate(**asdict(inference_settings)),
+            regions=RegionMask(config_cache.get_regions(name)),
+        )
+        cameras.append(
+            Camera.register(
+                Camera(
+                    name=name,
+                    source=create_source(source_config),
+                    detector=detector,
+                    scheduler=scheduler,
+                    recorder=recorder,
+                    max_fps=source_config.get("max_fps"),
+                    stream_budget_bytes_per_sec=config["STREAM_BUDGET_BYTES_PER_SEC"],
+                )
+            )
+        )
+
+    return Engine(cameras, scheduler=scheduler, retention=retention, model=config["MODEL"])
@@ -0,0 +1,114 @@
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+# the sequence number of the latest frame, then the number and size of the slots
+HEADER = struct.Struct("QII")
+# each slot starts with the sequence number and length of the frame in it
+SLOT_HEADER = struct.Struct("QI")
+
+# rings created by this process
+_created = set()
+
+
+class FrameRing:
+    """A ring of slots in shared memory that the engine process writes encoded frames to,
+    and any number of web processes read the latest frame from, without locks or copies
+    through a pipe.
+
+    Frames are numbered from 1. A slot's number is zeroed while it's being written, so
+    a reader that sees the same number before and after copying a frame knows it wasn't
+    overwritten part way through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        create: bool = False,
+        slots: int = 4,
+        slot_bytes: int = 1024**2,
+    ) -> None:
+        self.name = name
+        if create:
+            self._unlink_stale(name)
+            size = HEADER.size + slots * (SLOT_HEADER.size + slot_bytes)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self._shm.buf, 0, 0, slots, slot_bytes)
+            _created.add(name)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # only the creator should unlink it, but attaching registers it to be unlinked
+            # when this process exits (fixed in Python 3.13, with track=False)
+            if name not in _created:
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+            _, slots, slot_bytes = HEADER.unpack_from(self._shm.buf, 0)
+
+        self._owner = create
+        self._slots = slots
+        self._slot_bytes = slot_bytes
+        self._seq = 0
+
+    @staticmethod
+    def _unlink_stale(name: str) -> None:
+        """Remove a ring left behind by an engine that didn't exit cleanly."""
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        stale.close()
+        stale.unlink()
+
+    def _offset(self, seq: int) -> int:
+        """Where the slot for a frame starts."""
+        return HEADER.size + (seq % self._slots) * (SLOT_HEADER.size + self._slot_bytes)
+
+    @property
+    def latest(self) -> int:
+        """The number of the latest frame, 0 if there's none yet."""
+        return struct.unpack_from("Q", self._shm.buf, 0)[0]
+
+    def write(self, frame: bytes) -> bool:
+        """Write a frame to the next slot, returning False if it's too big to fit."""
+        if len(frame) > self._slot_bytes:
+            return False
+
+        buf = self._shm.buf
+        seq = self._seq + 1
+        offset = self._offset(seq)
+        start = offset + SLOT_HEADER.size
+
+        SLOT_HEADER.pack_into(buf, offset, 0, 0)
+        buf[start : start + len(frame)] = frame
+        SLOT_HEADER.pack_into(buf, offset, seq, len(frame))
+        struct.pack_into("Q", buf, 0, seq)
+
+        self._seq = seq
+        return True
+
+    def read(self, after: int = 0) -> tuple[int, bytes] | None:
+        """Read the latest frame, if it isn't frame `after` (e.g. the last one read),
+        returning its number and the frame, or None if there's no new frame."""
+        buf = self._shm.buf
+        seq = self.latest
+        # a lower number than `after` means the engine restarted
+        if seq == 0 or seq == after:
+            return None
+
+        offset = self._offset(seq)
+        slot_seq, length = SLOT_HEADER.unpack_from(buf, offset)
+        if slot_seq != seq:
+            return None
+
+        start = offset + SLOT_HEADER.size
+        frame = bytes(buf[start : start + length])
+
+        # overwritten while it was copied, the next read will get a newer frame
+        if SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+            return None
+        return seq, frame
+
+    def close(self) -> None:
+        """Detach from the ring, and remove it if this process created it."""
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            _created.discard(self.name)
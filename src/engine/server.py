@@ -0,0 +1,210 @@
+"""Run the engine (cameras, detectors and recorders) in its own process, serving the web
+processes over a unix socket, with live stream frames in shared memory.
+
+    python -m src.engine.server --socket instance/engine.sock --config '{...}'
+
+Web processes start it themselves if it isn't running, or restart it if it was started
+with different config (see client.py). Only one engine runs per socket, the others exit
+straight away.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import signal
+import socketserver
+from threading import Event, Thread
+from typing import Any
+
+from src.db.cache import CachedInferenceSettings
+from src.engine.engine import Engine
+from src.engine.frames import FrameRing
+
+# shared memory per rendition: a 4 slot ring, big enough for a full size frame
+RING_SLOTS = 4
+FULL_SLOT_BYTES = 4 * 1024**2
+SCALED_SLOT_BYTES = 1024**2
+
+# engine methods web processes can call
+COMMANDS = {
+    "status",
+    "stats",
+    "stage_metrics",
+    "record_player_ttff",
+    "profile",
+    "get_model",
+    "set_detectors",
+    "configure_inference",
+    "set_regions",
+    "delete_recordings",
+    "reload_config",
+}
+
+# commands that change config the web process saved to the db
+CONFIG_COMMANDS = {"set_detectors", "configure_inference", "set_regions"}
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """Handles one web process connection: JSON requests, one per line, each answered
+    with {"ok": true, "result": ...} or {"ok": false, "error": ..., "type": ...}."""
+
+    def handle(self) -> None:
+        # renditions this connection is watching, until it closes
+        watching = []
+        try:
+            for line in self.rfile:
+                try:
+                    result = self.server.control.dispatch(json.loads(line), watching)
+                    response = {"ok": True, "result": result}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e), "type": type(e).__name__}
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # a closed connection is a viewer gone, even if its web process crashed
+            for rendition in watching:
+                rendition.add_remote_viewers(-1)
+
+
+class EngineServer:
+    """Serves an engine to web processes. Each camera rendition's encoded frames are written
+    to a ring in shared memory, and everything else goes through the control socket.
+    """
+
+    def __init__(self, engine: Engine, socket_path: str, config: dict | None = None) -> None:
+        self._engine = engine
+        self._socket_path = socket_path
+        # the app config the engine was built from, for web processes to check
+        self._config = config
+        self._server = None
+        self._thread = None
+        # set once asked to stop, by a signal or a web process
+        self.stopped = Event()
+
+        # a frame ring for each rendition of each camera, named uniquely for this engine
+        self.rings = {}
+        for index, name in enumerate(engine.camera_names()):
+            self.rings[name] = {}
+            for rendition_name, rendition in engine.camera(name).renditions.items():
+                ring = FrameRing(
+                    f"sb{os.getpid()}_{index}_{rendition_name}",
+                    create=True,
+                    slots=RING_SLOTS,
+                    slot_bytes=FULL_SLOT_BYTES if rendition.size is None else SCALED_SLOT_BYTES,
+                )
+                rendition.sinks.append(ring.write)
+                self.rings[name][rendition_name] = ring
+
+    def dispatch(self, request: dict, watching: list) -> Any:
+        """Run a request from a web process, returning the result."""
+        command, args = request["command"], request.get("args", {})
+
+        if command == "cameras":
+            # where to read each camera's frames from
+            return {
+                name: {r: ring.name for r, ring in rings.items()}
+                for name, rings in self.rings.items()
+            }
+
+        if command == "config":
+            return self._config
+
+        if command == "shutdown":
+            # e.g. a web process started with different config, it starts a new engine
+            self.stopped.set()
+            return None
+
+        if command == "subscribe":
+            camera = self._engine.camera(args["camera"])
+            if camera is None or args["rendition"] not in camera.renditions:
+                raise KeyError(f"No such stream: {args['camera']} {args['rendition']}")
+            rendition = camera.renditions[args["rendition"]]
+            rendition.add_remote_viewers(1)
+            watching.append(rendition)
+            return None
+
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command: {command}")
+
+        # the web process saved it to the db, so this process's cache is stale
+        if command in CONFIG_COMMANDS:
+            self._engine.reload_config()
+        if command == "configure_inference":
+            args = {"settings": CachedInferenceSettings(**args["settings"])}
+        return getattr(self._engine, command)(**args)
+
+    def start(self) -> None:
+        """Start serving, in a background thread."""
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self._socket_path, ControlHandler)
+        self._server.daemon_threads = True
+        self._server.control = self
+        self._thread = Thread(target=self._server.serve_forever, name="engine-control", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving, and remove the socket and frame rings."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+        for rings in self.rings.values():
+            for ring in rings.values():
+                ring.close()
+
+
+def acquire_lock(socket_path: str) -> Any | None:
+    """Lock the socket for this process, returning the lock file to hold on to, or None if
+    another engine has it."""
+    lock_file = open(socket_path + ".lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--socket", required=True, help="control socket path")
+    parser.add_argument("--config", required=True, help="the app's engine config, as JSON")
+    args = parser.parse_args(argv)
+
+    # only one engine per socket, held until this process exits
+    lock_file = acquire_lock(args.socket)
+    if lock_file is None:
+        print("Engine already running.")
+        return
+
+    # imported here, to skip them if another engine is running
+    from src.db.database import init_db
+    from src.engine.engine import build_engine
+
+    config = json.loads(args.config)
+    init_db()
+    engine = build_engine(config, config["RECORDINGS_DIR"])
+    server = EngineServer(engine, args.socket, config)
+    server.start()
+    engine.start()
+    print(f"Engine serving on {args.socket}.")
+
+    # run until stopped
+    signal.signal(signal.SIGTERM, lambda *_: server.stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: server.stopped.set())
+    server.stopped.wait()
+
+    print("Stopping engine.")
+    server.stop()
+    engine.stop()
+    lock_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+class AdaptiveRate:
+    """Picks the inference size, and how often to run inference, for one camera.
+
+    While nothing is tracked inference runs small and sparse (`idle_imgsz`, every
+    `idle_every` frames), and while something is it runs bigger and denser (`active_imgsz`,
+    every `active_every` frames). The size is then stepped down while the measured
+    inference latency is over `target_latency_ms`, and back up once it's comfortably under.
+    """
+
+    def __init__(
+        self,
+        idle_imgsz: int = 96,
+        active_imgsz: int = 256,
+        idle_every: int = 3,
+        active_every: int = 1,
+        target_latency_ms: float = 250,
+        min_imgsz: int = 64,
+        step: int = 32,
+        smoothing: float = 0.2,
+    ) -> None:
+        self._min_imgsz = min_imgsz
+        self._step = step
+        self._smoothing = smoothing
+        self.configure(idle_imgsz, active_imgsz, idle_every, active_every, target_latency_ms)
+
+        self._tracking = False
+        self._frame = 0
+        self._avg_latency = None
+
+    def configure(
+        self,
+        idle_imgsz: int,
+        active_imgsz: int,
+        idle_every: int,
+        active_every: int,
+        target_latency_ms: float,
+    ) -> None:
+        """Set new targets, e.g. after they are changed in settings."""
+        self.idle_imgsz = idle_imgsz
+        self.active_imgsz = active_imgsz
+        self.idle_every = max(1, idle_every)
+        self.active_every = max(1, active_every)
+        self.target_latency_ms = target_latency_ms
+        # largest size the latency allows, stepped down when inference is too slow
+        self._latency_cap = max(idle_imgsz, active_imgsz)
+
+    @property
+    def imgsz(self) -> int:
+        """Inference size to use for the next frame."""
+        imgsz = self.active_imgsz if self._tracking else self.idle_imgsz
+        return max(self._min_imgsz, min(imgsz, self._latency_cap))
+
+    @property
+    def sizes(self) -> list[int]:
+        """Inference sizes used while idle and active (before latency steps them down)."""
+        return sorted({max(self._min_imgsz, self.idle_imgsz), max(self._min_imgsz, self.active_imgsz)})
+
+    @property
+    def every(self) -> int:
+        """Inference runs on every Nth frame."""
+        return self.active_every if self._tracking else self.idle_every
+
+    def should_infer(self) -> bool:
+        """Invoked once per frame, whether inference should run on it."""
+        infer = self._frame % self.every == 0
+        self._frame += 1
+        return infer
+
+    def update(self, tracking: bool, latency_ms: float | None = None) -> None:
+        """Invoked with each inference result, whether anything is tracked and how long
+        inference took."""
+        if tracking != self._tracking:
+            # run inference on the very next frame after a change
+            self._tracking = tracking
+            self._frame = 0
+
+        if latency_ms is None:
+            return
+
+        if self._avg_latency is None:
+            self._avg_latency = latency_ms
+        else:
+            self._avg_latency += self._smoothing * (latency_ms - self._avg_latency)
+
+        if self._avg_latency > self.target_latency_ms:
+            self._latency_cap = max(self._min_imgsz, self.imgsz - self._step)
+            # start measuring the new size afresh
+            self._avg_latency = None
+        elif self._avg_latency < self.target_latency_ms * 0.6:
+            cap = min(max(self.idle_imgsz, self.active_imgsz), self._latency_cap + self._step)
+            if cap != self._latency_cap:
+                self._latency_cap = cap
+                self._avg_latency = None
+
+    def stats(self) -> dict:
+        """Current inference size, rate and latency."""
+        return {
+            "tracking": self._tracking,
+            "imgsz": self.imgsz,
+            "every": self.every,
+            "avg_latency_ms": self._avg_latency,
+        }
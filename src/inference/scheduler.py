@@ -0,0 +1,238 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Condition, Thread
+from typing import Any
+
+import numpy as np
+
+from src.metrics.metrics import metrics
+
+
+@dataclass
+class CameraSlot:
+    """Scheduling state for one camera registered with the scheduler."""
+
+    camera: Any
+    max_fps: float | None = None
+    # frames waiting for inference, oldest first. When full the oldest is dropped
+    pending: deque = field(default_factory=deque)
+    # whether a worker is currently processing frames from this camera
+    in_flight: bool = False
+    # monotonic time the next frame may start, for rate limiting
+    next_allowed: float = 0.0
+    processed: int = 0
+    dropped: int = 0
+
+
+class InferenceScheduler:
+    """Shared pool of inference worker threads serving every registered camera.
+
+    Workers gather frames into batches of up to `max_batch`, waiting at most `max_wait`
+    seconds for a batch to fill, and frames for detectors sharing a model go through one
+    forward pass. Batches take each ready camera's pending frames, oldest first, as many as
+    fit, so a camera that is falling behind gives several consecutive frames (its queue
+    holds at most `max_batch`, dropping the oldest). Each camera has at most one batch in
+    flight (so its tracker sees frames in order), and cameras are taken in round-robin
+    order, skipping any over their frame rate limit, so a busy camera can't starve the others.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_fps_per_camera: float | None = None,
+        max_batch: int = 4,
+        max_wait: float = 0.01,
+    ) -> None:
+        self._num_workers = workers
+        self._default_max_fps = max_fps_per_camera
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._cond = Condition()
+        self._slots = {}
+        # round-robin order of camera names and where the next search starts
+        self._order = []
+        self._next_index = 0
+        self._threads = []
+        self._should_stop = False
+
+    def register(self, camera: Any, max_fps: float | None = None) -> None:
+        """Register a camera. It needs `name` and `detector` attributes and a `publish` method."""
+        with self._cond:
+            self._slots[camera.name] = CameraSlot(
+                camera=camera,
+                max_fps=max_fps or self._default_max_fps,
+                pending=deque(maxlen=self._max_batch),
+            )
+            self._order.append(camera.name)
+
+    def unregister(self, camera: Any) -> None:
+        """Stop scheduling frames from a camera."""
+        with self._cond:
+            self._slots.pop(camera.name, None)
+            if camera.name in self._order:
+                self._order.remove(camera.name)
+
+    def submit(self, camera: Any, img_arr: np.ndarray) -> None:
+        """Queue a frame from a camera for inference, dropping its oldest waiting frame if full."""
+        with self._cond:
+            slot = self._slots.get(camera.name)
+            if slot is None:
+                return
+            if len(slot.pending) == slot.pending.maxlen:
+                slot.dropped += 1
+            slot.pending.append(img_arr)
+            self._cond.notify()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Processed, dropped and waiting frame counts per camera."""
+        with self._cond:
+            return {
+                name: {
+                    "processed": slot.processed,
+                    "dropped": slot.dropped,
+                    "pending": len(slot.pending),
+                }
+                for name, slot in self._slots.items()
+            }
+
+    def start(self) -> None:
+        """Start the inference worker threads."""
+        self._should_stop = False
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self._num_workers):
+            thread = Thread(target=self._run, name=f"inference-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Schedule stopping of the inference worker threads."""
+        with self._cond:
+            self._should_stop = True
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        """Inference worker thread."""
+        while True:
+            with self._cond:
+                batch = self._gather()
+                if batch is None:
+                    return
+
+            try:
+                self._process(batch)
+            finally:
+                with self._cond:
+                    for slot, frames in batch:
+                        slot.in_flight = False
+                        slot.processed += len(frames)
+                    self._cond.notify_all()
+
+    def _gather(self) -> list[tuple[CameraSlot, list[np.ndarray]]] | None:
+        """Wait for frames and gather them into a batch, None if stopping.
+        Must be called holding the condition lock.
+        """
+        batch = []
+        size = 0
+        deadline = None
+
+        while True:
+            if self._should_stop:
+                # give back anything taken, so its cameras aren't stuck in flight
+                for slot, _ in batch:
+                    slot.in_flight = False
+                return None
+
+            # take frames from ready cameras until the batch is full
+            wait = None
+            while size < self._max_batch:
+                slot, wait = self._next_ready()
+                if slot is None:
+                    break
+
+                n = min(len(slot.pending), self._max_batch - size)
+                frames = [slot.pending.popleft() for _ in range(n)]
+                slot.in_flight = True
+                if slot.max_fps:
+                    slot.next_allowed = time.monotonic() + n / slot.max_fps
+
+                batch.append((slot, frames))
+                size += n
+
+            now = time.monotonic()
+            if batch and deadline is None:
+                deadline = now + self._max_wait
+
+            # full, or waited long enough for it to fill
+            if size >= self._max_batch or (batch and now >= deadline):
+                return batch
+
+            # wait for more frames, no longer than the batch deadline
+            if batch:
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+            self._cond.wait(timeout=wait)
+
+    def _process(self, batch: list[tuple[CameraSlot, list[np.ndarray]]]) -> None:
+        """Run a batch through the detectors and hand the results back to the cameras."""
+
+        # group frames by the model they need, in batch order. each camera's detector is
+        # read once, so one swapped from settings mid batch is only used from the next
+        groups = {}
+        for slot, frames in batch:
+            detector = slot.camera.detector
+            groups.setdefault(detector.batch_key, []).append((slot, detector, frames))
+
+        for group in groups.values():
+            try:
+                # which frames each detector wants inference run on
+                wanted = [
+                    [detector.should_predict() for _ in frames] for _, detector, frames in group
+                ]
+
+                # one forward pass for every wanted frame in the group
+                imgs = [
+                    detector.prepare(img)
+                    for (_, detector, frames), flags in zip(group, wanted)
+                    for img, flag in zip(frames, flags)
+                    if flag
+                ]
+                with metrics.span("inference"):
+                    results = iter(group[0][1].predict(imgs) if imgs else [])
+
+                # then per camera, in frame order, so each tracker's state stays correct.
+                # skipped frames still go through, to be recorded and streamed
+                for (slot, detector, frames), flags in zip(group, wanted):
+                    for img_arr, flag in zip(frames, flags):
+                        with metrics.span("track", camera=slot.camera.name):
+                            detections = detector.handle_result(
+                                img_arr, next(results) if flag else None
+                            )
+                        slot.camera.publish(img_arr, detections)
+
+            except Exception as e:
+                names = ", ".join(slot.camera.name for slot, _, _ in group)
+                print(f"Inference failed for camera(s) {names}: {e}")
+
+    def _next_ready(self) -> tuple[CameraSlot | None, float | None]:
+        """Find the next camera, in round-robin order, with frames ready to process.
+        If none are ready, returns how long until a rate limited one will be.
+        """
+        now = time.monotonic()
+        wait = None
+
+        for offset in range(len(self._order)):
+            index = (self._next_index + offset) % len(self._order)
+            slot = self._slots[self._order[index]]
+
+            if not slot.pending or slot.in_flight:
+                continue
+            if slot.next_allowed > now:
+                delay = slot.next_allowed - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            # start after this camera next time
+            self._next_index = index + 1
+            return slot, None
+
+        return None, wait
@@ -0,0 +1,124 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator
+
+
+# histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum, like a Prometheus histogram."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # the last count is for values over every bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(upper bound, count of values up to it) for each bucket, ending with +Inf."""
+        with self._lock:
+            counts = list(self.counts)
+        total = 0
+        result = []
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Format labels as Prometheus text, e.g. {camera="main"}."""
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_metric(
+    name: str, metric_type: str, help: str, samples: list[tuple[dict[str, str], float]]
+) -> str:
+    """Format a gauge or counter, with one sample per set of labels, as Prometheus text."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+    lines += [f"{name}{format_labels(labels)} {value}" for labels, value in samples]
+    return "\n".join(lines)
+
+
+class Metrics:
+    """In-memory timing histograms for each stage of the camera pipeline, by stage and
+    camera. Observing is a bisect and a few increments, cheap enough for every frame.
+    """
+
+    name = "surveillance_stage_seconds"
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._buckets = buckets
+        self._histograms = {}
+        self._lock = Lock()
+
+    def observe(self, stage: str, seconds: float, **labels: str) -> None:
+        """Record how long one run of a stage took."""
+        key = (stage, *sorted(labels.items()))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self._buckets))
+        histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str, **labels: str) -> Iterator[None]:
+        """Time the body of a with block as a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def histogram(self, stage: str, **labels: str) -> Histogram | None:
+        """Get the histogram of a stage, None if it was never observed."""
+        return self._histograms.get((stage, *sorted(labels.items())))
+
+    def render(self) -> str:
+        """Format every histogram as Prometheus text."""
+        lines = [
+            f"# HELP {self.name} Time spent in each stage of the camera pipeline.",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+
+        for (stage, *labels), histogram in histograms:
+            labels = {"stage": stage, **dict(labels)}
+            for bound, count in histogram.cumulative():
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        """Forget everything observed."""
+        with self._lock:
+            self._histograms = {}
+
+
+# shared by every stage of the pipeline
+metrics = Metrics()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+from collections import Counter
+from threading import Lock, enumerate as enumerate_threads
+from types import FrameType
+
+
+class SamplingProfiler:
+    """Low overhead sampling profiler for the pipeline threads. Every `interval` seconds it
+    takes a snapshot of the Python stacks of threads whose names start with one of
+    `thread_prefixes`, and counts each distinct stack.
+
+    Time in C code shows up under the Python function that called into it, e.g. torch
+    under the detector's `predict`, and ffmpeg pipe writes under `write_frame`.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        thread_prefixes: tuple[str, ...] = ("camera-", "inference-"),
+    ) -> None:
+        self._interval = interval
+        self._thread_prefixes = thread_prefixes
+        # only one profile at a time
+        self._lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether a profile is being taken."""
+        return self._lock.locked()
+
+    def profile(self, seconds: float) -> Counter:
+        """Sample for `seconds`, from the calling thread, returning the count of each stack
+        (a tuple of frames, outermost first). Raises RuntimeError if already profiling."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being taken")
+
+        try:
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample(stacks)
+                time.sleep(self._interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+    def _sample(self, stacks: Counter) -> None:
+        """Add the current stack of each profiled thread."""
+        names = {
+            t.ident: t.name
+            for t in enumerate_threads()
+            if t.name.startswith(self._thread_prefixes)
+        }
+        for ident, frame in sys._current_frames().items():
+            if ident in names:
+                stacks[(names[ident], *self._walk(frame))] += 1
+
+    @staticmethod
+    def _walk(frame: FrameType | None) -> list[str]:
+        """Frames of a stack, outermost first, as "function (file:line)"."""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    @staticmethod
+    def collapse(stacks: Counter) -> str:
+        """Format stack counts as collapsed stacks, one "frame;frame;frame count" per line,
+        as read by flamegraph.pl, speedscope and similar tools."""
+        return "".join(
+            f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n"
+            for stack, count in stacks.most_common()
+        )
+
+
+# shared, so only one profile runs at a time across requests
+profiler = SamplingProfiler()
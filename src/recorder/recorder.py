@@ -1,136 +1,286 @@
+import base64
 import datetime
+import math
 import time
+import cv2
 import ffmpeg
 import os
 import numpy as np
 import numpy.typing as npt
-from typing import Dict
+from subprocess import Popen
+from threading import Lock, Thread
+from typing import Dict, TYPE_CHECKING
 
-from src.db.database import db_session
-from src.db.models import VideoSnippet, EmailRecipient
+from src.db.cache import config_cache
+from src.db.models import VideoSnippet
+from src.db.rollup import record_detections
+from src.db.writer import db_writer
 from src.detector.detected_object import DetectedObject
+from src.metrics.metrics import metrics
 from src.notification.notification import Notification
 
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from src.retention.retention import RetentionManager
+
+
+# width of the inline placeholder stored for each thumbnail, ~0.5KB as a JPEG
+PLACEHOLDER_WIDTH = 16
+
+# scrubbing preview sprites are this many tiles wide
+PREVIEW_COLUMNS = 5
+
+# recorder states: idle -> recording -> finalising -> idle
+IDLE = "idle"
+RECORDING = "recording"
+FINALISING = "finalising"
+
 
 class Recorder:
-    """Recording class for handling recording & processing of surveillance cameras."""
+    """Recording class for handling recording & processing of surveillance cameras.
+
+    It's a state machine, safe to call from any thread: a recording can only start when
+    idle, frames are only written while recording, and once stopped it's finalised
+    (metadata, thumbnail, db entry) before the next recording can start. Finalising runs
+    on its own thread, so the thread that stopped the recording (e.g. the shared inference
+    worker) carries on straight away.
+    """
 
-    def __init__(self, output_dir: str, max_duration: int = 20, fps: int = 15) -> None:
+    def __init__(
+        self,
+        output_dir: str,
+        max_duration: int = 20,
+        fps: int = 15,
+        retention: "RetentionManager | None" = None,
+        title_prefix: str = "",
+        preview_interval: float = 2,
+        preview_width: int = 160,
+    ) -> None:
         self._output_dir = output_dir
+        # prepended to recording titles, so recordings from different cameras don't clash
+        self._title_prefix = title_prefix
+        # told about each saved recording, to keep disk usage up to date
+        self._retention = retention
         self._max_duration = max_duration  # Max duration in seconds
         self._fps = fps
-        self._is_recording = False
+        # a scrubbing preview tile is kept every this many frames, at this width
+        self._preview_every = max(1, round(fps * preview_interval))
+        self._preview_width = preview_width
+        # guards the state and everything belonging to the current recording
+        self._lock = Lock()
+        self._state = IDLE
         self._process = None
+        # objects tracked during the current recording, for its metadata
+        self._tracked_objects = {}
         self._start_time = None
+        # frames written to the current recording, and the preview tiles kept from them
+        self._frames_written = 0
+        self._previews = []
+        # how long the last recording took to finalise (seconds), once it is playable
+        self._last_finalise_duration = None
+        # thread finalising the last recording
+        self._finaliser = None
         # file names
         self._recording_title = None
         self._recording_video_filename = None
         self._recording_thumbnail_filename = None
 
-    def start_recording(self, frame_shape) -> None:
-        """Starts the recording process with FFmpeg."""
+    @property
+    def state(self) -> str:
+        """"idle", "recording" or "finalising"."""
+        return self._state
 
-        # set filename state
-        self._recording_title = f'{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}'
-        self._recording_video_filename = (
-            f"{self._output_dir}/{self._recording_title}.mp4"
-        )
-        self._recording_thumbnail_filename = (
-            f"{self._output_dir}/{self._recording_title}.jpg"
-        )
+    @property
+    def is_recording(self) -> bool:
+        """Whether frames are being recorded."""
+        return self._state == RECORDING
 
-        try:
-            # begin piping frames into the output file
-            self._process = (
-                ffmpeg.input(
-                    "pipe:0",
-                    format="rawvideo",
-                    pix_fmt="bgr24",
-                    s=f"{frame_shape[1]}x{frame_shape[0]}",
-                    framerate=self._fps,
-                )
-                .output(
-                    self._recording_video_filename,
-                    pix_fmt="yuv420p",
-                    vcodec="libx264",
-                )
-                .overwrite_output()
-                .run_async(pipe_stdin=True)
+    def start_recording(
+        self,
+        frame_shape,
+        tracked_objects: Dict[int, list[DetectedObject]] | None = None,
+    ) -> bool:
+        """Starts the recording process with FFmpeg, returning whether it started. It only
+        starts when idle, not while recording or finalising the last recording.
+        `tracked_objects` (kept up to date by the detector) describe the recording if it's
+        stopped without them, e.g. at its max duration."""
+
+        with self._lock:
+            if self._state != IDLE:
+                return False
+
+            # set filename state
+            self._recording_title = f'{self._title_prefix}{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}'
+            self._recording_video_filename = (
+                f"{self._output_dir}/{self._recording_title}.mp4"
             )
-            
-            # set flags and notify
-            self._is_recording = True
+            self._recording_thumbnail_filename = (
+                f"{self._output_dir}/{self._recording_title}.jpg"
+            )
+
+            try:
+                # begin piping frames into the output file
+                self._process = (
+                    ffmpeg.input(
+                        "pipe:0",
+                        format="rawvideo",
+                        pix_fmt="bgr24",
+                        s=f"{frame_shape[1]}x{frame_shape[0]}",
+                        framerate=self._fps,
+                    )
+                    .output(
+                        self._recording_video_filename,
+                        pix_fmt="yuv420p",
+                        vcodec="libx264",
+                        # move the moov atom to the front when the file is closed, so
+                        # browsers can start playback without fetching the whole file
+                        movflags="+faststart",
+                    )
+                    .overwrite_output()
+                    .run_async(pipe_stdin=True)
+                )
+
+            except Exception as e:
+                # reset and notify
+                print(f"Failed to start recording: {e}")
+                self._reset()
+                return False
+
+            # set state and notify
+            self._state = RECORDING
             self._start_time = time.time()  # Record the start time
+            self._tracked_objects = tracked_objects if tracked_objects is not None else {}
             print(f"Started recording: {self._recording_title}.mp4")
-
-        except Exception as e:
-            # reset flags and notify
-            print(f"Failed to start recording: {e}")
-            self._is_recording = False
-            self._recording_title = None
-            self._recording_video_filename = None
-            self._recording_thumbnail_filename = None
+            return True
 
     def stop_recording(
         self,
-        tracked_objects: Dict[int, DetectedObject] | None,
+        tracked_objects: Dict[int, list[DetectedObject]] | None = None,
         should_save: bool = True,
     ) -> None:
-        """Stops the recording process and finalizes the video file."""
+        """Stops the recording process and finalizes the video file in the background. Does
+        nothing unless recording, so only one caller finalises a recording."""
 
-        if self._process:
-            try:
-                self._process.stdin.close()
-                self._process.wait()
-                print("Stopped recording.")
+        with self._lock:
+            if self._state != RECORDING:
+                return
+            self._begin_finalising(tracked_objects or self._tracked_objects, should_save)
 
+    def _begin_finalising(
+        self,
+        tracked_objects: Dict[int, list[DetectedObject]] | None,
+        should_save: bool,
+    ) -> None:
+        """Move from recording to finalising, and start finalising on its own thread. The
+        lock must be held, from here on frames and new recordings are refused."""
+        self._state = FINALISING
+        process, self._process = self._process, None
+        self._finaliser = Thread(
+            target=self._finalise,
+            args=(process, tracked_objects, should_save),
+            name=f"finalise-{self._recording_title}",
+            daemon=True,
+        )
+        self._finaliser.start()
+
+    def wait_finalised(self, timeout: float | None = None) -> bool:
+        """Wait for the last recording to be finalised, returning whether it was (or there
+        was nothing to finalise) within `timeout` seconds."""
+        finaliser = self._finaliser
+        if finaliser is None:
+            return True
+        finaliser.join(timeout)
+        return not finaliser.is_alive()
+
+    def _finalise(
+        self,
+        process: Popen,
+        tracked_objects: Dict[int, list[DetectedObject]] | None,
+        should_save: bool,
+    ) -> None:
+        """Close the recording and save it, then go back to idle. Runs on the finaliser
+        thread without the lock, so other threads see it's finalising straight away rather
+        than waiting on it."""
+        # time finalisation, from closing the pipe to the clip being playable
+        finalise_start = time.perf_counter()
+        try:
+            process.stdin.close()
+            process.wait()
+            print("Stopped recording.")
 
-                if should_save:
-                    # if there are tracked objects, try parse descriptions of what they are
-                    descriptions = None
-                    if tracked_objects:
-                        descriptions = DetectedObject.parse_objects(tracked_objects)
-                        self.add_metadata(descriptions)
-                    
-                    # create a thumbnail for the video
-                    self.generate_thumbnail()
+            if should_save:
+                # if there are tracked objects, try parse descriptions of what they are
+                descriptions = None
+                labels = []
+                if tracked_objects:
+                    descriptions = DetectedObject.parse_objects(tracked_objects)
+                    labels = sorted({v[0].label for v in tracked_objects.values() if v})
+                    self.add_metadata(descriptions)
 
-                    # save the data (and descriptions)
-                    self.save_data(descriptions)
+                # create a thumbnail for the video
+                self.generate_thumbnail()
+                self.generate_previews()
 
-            except Exception as e:
-                print(f"Failed to stop recording: {e}")
-            finally:
-                self._process = None
+                self._last_finalise_duration = time.perf_counter() - finalise_start
+                metrics.observe("record_finalise", self._last_finalise_duration)
+                print(
+                    f"Finalised {self._recording_title}.mp4 in {self._last_finalise_duration:.2f}s"
+                )
 
-        # reset flags
-        self._is_recording = False
+                # save the data (and descriptions)
+                self.save_data(descriptions, labels)
+
+        except Exception as e:
+            print(f"Failed to stop recording: {e}")
+
+        finally:
+            with self._lock:
+                self._reset()
+
+    def _reset(self) -> None:
+        """Back to idle, with no recording. The lock must be held."""
+        self._state = IDLE
+        self._process = None
         self._start_time = None
+        self._frames_written = 0
+        self._previews = []
+        self._tracked_objects = {}
         self._recording_title = None
         self._recording_video_filename = None
         self._recording_thumbnail_filename = None
 
     def write_frame(self, img_arr: np.ndarray) -> None:
         """Writes a frame to the recording if recording is active."""
-        if not self._is_recording or self._process is None:
-            return
+        with self._lock:
+            if self._state != RECORDING:
+                return
+
+            try:
+                elapsed_time = time.time() - self._start_time
+                if elapsed_time < self._max_duration:
+                    with metrics.span("record_write"):
+                        self._process.stdin.write(img_arr.tobytes())
+                    # keep a small copy every few seconds, for the scrubbing previews
+                    if self._frames_written % self._preview_every == 0:
+                        self._previews.append(self._preview_tile(img_arr))
+                    self._frames_written += 1
+                    return
 
-        try:
-            elapsed_time = time.time() - self._start_time
-            if elapsed_time >= self._max_duration:
                 print("Max recording duration reached.")
-                self.stop_recording()
-            else:
-                self._process.stdin.write(img_arr.tobytes())
+                should_save = True
 
-        # shouldn't happen but just in case
-        except BrokenPipeError:
-            print("Broken pipe: The FFmpeg process terminated unexpectedly.")
-            self.stop_recording(should_save=False)
+            # shouldn't happen but just in case
+            except BrokenPipeError:
+                print("Broken pipe: The FFmpeg process terminated unexpectedly.")
+                should_save = False
 
-        except Exception as e:
-            print(f"Error writing frame: {e}")
-            self.stop_recording(should_save=False)
+            except Exception as e:
+                print(f"Error writing frame: {e}")
+                should_save = False
+
+            # stop while still holding the lock, so no other thread stops it (or starts
+            # another recording) first
+            self._begin_finalising(self._tracked_objects, should_save)
 
     def generate_thumbnail(self) -> None:
         """Generate a thumbnail for the recording"""
@@ -141,13 +291,74 @@ class Recorder:
             .run()
         )
 
+    def _preview_tile(self, img_arr: np.ndarray) -> np.ndarray:
+        """A frame scaled down to a scrubbing preview tile."""
+        height = max(1, round(img_arr.shape[0] * self._preview_width / img_arr.shape[1]))
+        return cv2.resize(img_arr, (self._preview_width, height), interpolation=cv2.INTER_AREA)
+
+    def generate_previews(self) -> None:
+        """Write the scrubbing previews for the recording: the tiles kept while recording,
+        in a sprite image, and a WebVTT track of which tile to show at each time. Players
+        show them while hovering over the timeline, with nothing decoded server side."""
+        if not self._previews:
+            return
+
+        try:
+            vtt_title, sprite_title = VideoSnippet.preview_titles(f"{self._recording_title}.mp4")
+            tile_height, tile_width = self._previews[0].shape[:2]
+            columns = min(PREVIEW_COLUMNS, len(self._previews))
+            rows = math.ceil(len(self._previews) / columns)
+
+            # tiles left to right, top to bottom
+            sprite = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+            cues = ["WEBVTT", ""]
+            duration = self._frames_written / self._fps
+            for i, tile in enumerate(self._previews):
+                x, y = (i % columns) * tile_width, (i // columns) * tile_height
+                sprite[y : y + tile_height, x : x + tile_width] = tile
+
+                start = i * self._preview_every / self._fps
+                end = min((i + 1) * self._preview_every / self._fps, duration)
+                cues += [
+                    f"{format_vtt_time(start)} --> {format_vtt_time(end)}",
+                    f"{sprite_title}#xywh={x},{y},{tile_width},{tile_height}",
+                    "",
+                ]
+
+            cv2.imwrite(
+                f"{self._output_dir}/{sprite_title}", sprite, [cv2.IMWRITE_JPEG_QUALITY, 70]
+            )
+            with open(f"{self._output_dir}/{vtt_title}", "w") as f:
+                f.write("\n".join(cues))
+
+        except Exception as e:
+            # the recording is still fine without them
+            print(f"Failed to generate previews: {e}")
+
+    @staticmethod
+    def generate_placeholder(thumbnail_filename: str) -> str | None:
+        """A tiny, low quality copy of a thumbnail as a data URI, so the saved page can show
+        something straight away without a request per recording. None if there's no
+        thumbnail."""
+        img = cv2.imread(thumbnail_filename)
+        if img is None:
+            return None
+
+        height = max(1, round(img.shape[0] * PLACEHOLDER_WIDTH / img.shape[1]))
+        small = cv2.resize(img, (PLACEHOLDER_WIDTH, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 40])
+        if not ok:
+            return None
+        return "data:image/jpeg;base64," + base64.b64encode(jpeg.tobytes()).decode()
+
     def add_metadata(self, metadata: str) -> None:
         """Adds metadata to the recorded video. The way FFMPEG works, you cannot update a file's metadata.
-        Also, the metadata is not known until the streaming is complete. This means the file must be rewritten.
+        Also, the metadata is not known until the streaming is complete. This means the file must be rewritten,
+        but the streams are copied rather than re-encoded, and the moov atom is kept at the front (fast-start).
         """
         try:
-            # create temporary file name
-            temp_file = f"{self._output_dir}/temp.mp4"
+            # create temporary file name, per recording as cameras share the output dir
+            temp_file = f"{self._output_dir}/{self._recording_title}.tmp.mp4"
 
             if os.path.isfile(self._recording_video_filename):
                 (
@@ -155,8 +366,9 @@ class Recorder:
                     ffmpeg.input(self._recording_video_filename)
                     .output(
                         temp_file,
-                        pix_fmt="yuv420p",
-                        vcodec="libx264",
+                        # remux only, no re-encode
+                        codec="copy",
+                        movflags="+faststart",
                         # below idea taken from https://github.com/kkroening/ffmpeg-python/issues/112#issuecomment-473682038
                         # as ffmpeg-python cannot handle more than one metadata tag currently
                         **{
@@ -177,26 +389,73 @@ class Recorder:
         except Exception as e:
             print(f"Failed to add metadata to video: {e}")
 
-    def save_data(self, descriptions: str | None) -> None:
-        """Save the video and thumbnail to db, and notify users."""
-        db_session.add(
-            VideoSnippet(
-                snippet_title=f"{self._recording_title}.mp4",
-                thumbnail_title=f"{self._recording_title}.jpg",
-                description=descriptions,
-            )
-        ),
-        db_session.commit()
-
+    def save_data(self, descriptions: str | None, labels: list[str] | None = None) -> None:
+        """Save the video and thumbnail to db, and notify users.
+        The insert goes through the write-behind queue so the camera thread isn't held up.
+        """
         body_text = f"Movement was detected by the surveillance camera! \n\nA recording was made. \nThis can be viewed on the dashboard, video {self._recording_title}.mp4"
 
         if descriptions:
             body_text += f"\n\nThe video features:\n\n{descriptions}"
 
-        Notification.send_emails(
-            user=os.environ["SB_MAIL_USERNAME"],
-            pwd=os.environ["SB_MAIL_PASSWORD"],
-            emails=[r.emailAddress for r in db_session.query(EmailRecipient).all()],
-            subject="Movement Detected",
-            body=body_text,
+        # recipients come from the config cache, so no db reads on the camera thread
+        emails = [r.emailAddress for r in config_cache.get_email_recipients()]
+
+        # size on disk, for the retention policy
+        size_bytes = sum(
+            os.path.getsize(f)
+            for f in (
+                self._recording_video_filename,
+                self._recording_thumbnail_filename,
+                *(
+                    f"{self._output_dir}/{title}"
+                    for title in VideoSnippet.preview_titles(f"{self._recording_title}.mp4")
+                ),
+            )
+            if os.path.isfile(f)
+        )
+        if self._retention:
+            self._retention.track_added(size_bytes)
+
+        placeholder = self.generate_placeholder(self._recording_thumbnail_filename)
+
+        # when the recording started, rather than when it was saved
+        created = (
+            datetime.datetime.fromtimestamp(self._start_time)
+            if self._start_time
+            else datetime.datetime.now()
+        )
+        snippet = VideoSnippet(
+            snippet_title=f"{self._recording_title}.mp4",
+            thumbnail_title=f"{self._recording_title}.jpg",
+            description=descriptions,
+            created=created,
+            labels=labels,
+            size_bytes=size_bytes,
+            placeholder=placeholder,
         )
+
+        def add(session: "Session") -> None:
+            # the recording and its hourly detection counts are committed together
+            session.add(snippet)
+            record_detections(session, created, labels or [])
+
+        # only notify once the recording is actually in the db
+        db_writer.submit(
+            add,
+            on_commit=lambda: Notification.send_emails(
+                user=os.environ["SB_MAIL_USERNAME"],
+                pwd=os.environ["SB_MAIL_PASSWORD"],
+                emails=emails,
+                subject="Movement Detected",
+                body=body_text,
+            ),
+        )
+
+
+def format_vtt_time(seconds: float) -> str:
+    """Format a time in seconds as a WebVTT timestamp, hh:mm:ss.ttt"""
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    return f"{hours:02}:{minutes:02}:{milliseconds // 1000:02}.{milliseconds % 1000:03}"
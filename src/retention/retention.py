@@ -0,0 +1,270 @@
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+
+from src.db.database import db_session
+from src.db.models import VideoSnippet
+from src.db.writer import db_writer
+
+
+class RetentionManager:
+    """Deletes old recordings in the background so the disk never fills up.
+
+    Recordings are removed once they are older than `max_age_days`, when a label has
+    more than `max_count_per_label` recordings, or (oldest first) while the recordings
+    take up more than `max_total_bytes` or the disk has less than `min_free_bytes` free.
+    The disk may be filled by other things, so recordings are only deleted for free space
+    if that frees enough, and never the newest `min_keep`. Disk usage is counted once at
+    startup, then kept up to date incrementally.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        max_age_days: float | None = 30,
+        max_total_bytes: int | None = 8 * 1024**3,
+        max_count_per_label: int | None = 500,
+        min_free_bytes: int | None = 1024**3,
+        min_keep: int = 10,
+        interval: float = 600,
+        batch_size: int = 100,
+    ) -> None:
+        self._output_dir = output_dir
+        self._max_age_days = max_age_days
+        self._max_total_bytes = max_total_bytes
+        self._max_count_per_label = max_count_per_label
+        self._min_free_bytes = min_free_bytes
+        self._min_keep = min_keep
+        self._interval = interval
+        self._batch_size = batch_size
+
+        # running total of bytes used by recordings
+        self._lock = Lock()
+        self._total_bytes = None
+
+        # background job control
+        self._thread = None
+        self._wake = Event()
+        self._should_stop = False
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes currently used by recordings."""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._count_total_bytes()
+            return self._total_bytes
+
+    def track_added(self, size_bytes: int) -> None:
+        """Count a newly saved recording, and wake the job early if over a limit."""
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size_bytes
+
+        if self._over_size_limit():
+            self._wake.set()
+
+    def start(self) -> None:
+        """Start the background retention job."""
+        if self._thread is None or not self._thread.is_alive():
+            self._should_stop = False
+            self._thread = Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Schedule stopping of the background retention job."""
+        self._should_stop = True
+        self._wake.set()
+
+    def _run(self) -> None:
+        """Retention background thread."""
+        while not self._should_stop:
+            try:
+                self.enforce()
+            except Exception as e:
+                print(f"Retention job failed: {e}")
+            finally:
+                db_session.remove()
+
+            # sleep until the next run, or until woken by a new recording
+            self._wake.wait(self._interval)
+            self._wake.clear()
+
+    def enforce(self) -> int:
+        """Apply the retention policy once, returning how many recordings were deleted."""
+
+        # load just the columns needed, oldest first
+        rows = (
+            db_session.query(
+                VideoSnippet.id,
+                VideoSnippet.created,
+                VideoSnippet.labels,
+                VideoSnippet.sizeBytes,
+            )
+            .order_by(VideoSnippet.created)
+            .all()
+        )
+
+        to_delete = set()
+
+        # too old
+        if self._max_age_days is not None:
+            cutoff = datetime.now() - timedelta(days=self._max_age_days)
+            to_delete.update(r.id for r in rows if r.created and r.created < cutoff)
+
+        # too many for a label, keep the newest
+        if self._max_count_per_label is not None:
+            by_label = defaultdict(list)
+            for r in rows:
+                for label in (r.labels or "").split(","):
+                    if label:
+                        by_label[label].append(r.id)
+            for ids in by_label.values():
+                if len(ids) > self._max_count_per_label:
+                    to_delete.update(ids[: len(ids) - self._max_count_per_label])
+
+        # too big, remove oldest first until back under the limit
+        total = self.total_bytes - sum(r.sizeBytes or 0 for r in rows if r.id in to_delete)
+        free = self._free_bytes()
+
+        # low on disk space, but only delete for it if that frees enough without deleting
+        # the newest recordings, as it may be filled by something else
+        free_for = self._min_free_bytes
+        if free_for is not None and free < free_for:
+            deletable = rows[: max(0, len(rows) - self._min_keep)]
+            if free + sum(r.sizeBytes or 0 for r in deletable if r.id not in to_delete) < free_for:
+                print(
+                    f"Low on disk space ({free} bytes free), but deleting recordings can't "
+                    f"free {free_for} bytes, so none are deleted for it"
+                )
+                free_for = None
+
+        for r in rows:
+            over_total = self._max_total_bytes is not None and total > self._max_total_bytes
+            under_free = free_for is not None and free < free_for
+            if not (over_total or under_free):
+                break
+            if r.id not in to_delete:
+                to_delete.add(r.id)
+                total -= r.sizeBytes or 0
+                free += r.sizeBytes or 0
+
+        if to_delete:
+            self.delete_recordings(sorted(to_delete), wait=True)
+            print(f"Retention removed {len(to_delete)} recording(s)")
+
+        return len(to_delete)
+
+    def delete_recordings(self, ids: list[int], wait: bool = False) -> None:
+        """Delete recordings in batches, rows first then their files.
+        Deletes go through the db writer, if `wait` is set this blocks until they're done.
+        """
+        for i in range(0, len(ids), self._batch_size):
+            batch_ids = ids[i : i + self._batch_size]
+
+            # get the file names for this batch
+            rows = (
+                db_session.query(
+                    VideoSnippet.snippetTitle,
+                    VideoSnippet.thumbnailTitle,
+                    VideoSnippet.sizeBytes,
+                )
+                .where(VideoSnippet.id.in_(batch_ids))
+                .all()
+            )
+            filenames = [
+                f
+                for r in rows
+                for f in (
+                    r.snippetTitle,
+                    r.thumbnailTitle,
+                    *VideoSnippet.preview_titles(r.snippetTitle),
+                )
+            ]
+            freed = sum(r.sizeBytes or 0 for r in rows)
+
+            db_writer.submit(
+                lambda session, batch_ids=batch_ids: session.query(VideoSnippet)
+                .where(VideoSnippet.id.in_(batch_ids))
+                .delete(synchronize_session=False),
+                # only remove the files once the rows are gone
+                on_commit=lambda filenames=filenames, freed=freed: self._remove_files(
+                    filenames, freed
+                ),
+            )
+
+        if wait:
+            db_writer.flush()
+
+    def _remove_files(self, filenames: list[str], freed: int) -> None:
+        """Unlink recording files and take them off the running total."""
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self._output_dir, filename))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to remove {filename}: {e}")
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes = max(0, self._total_bytes - freed)
+
+    def _over_size_limit(self) -> bool:
+        """Whether the recordings are over the size limit or the disk is nearly full."""
+        if self._max_total_bytes is not None and self.total_bytes > self._max_total_bytes:
+            return True
+        if self._min_free_bytes is not None and self._free_bytes() < self._min_free_bytes:
+            return True
+        return False
+
+    def _free_bytes(self) -> int:
+        """Free space left on the disk holding the recordings."""
+        return shutil.disk_usage(self._output_dir).free
+
+    def _count_total_bytes(self) -> int:
+        """Sum the recording sizes, measuring (and saving) any that aren't known yet."""
+        total = 0
+        unknown = []
+        for r in db_session.query(
+            VideoSnippet.id,
+            VideoSnippet.snippetTitle,
+            VideoSnippet.thumbnailTitle,
+            VideoSnippet.sizeBytes,
+        ).all():
+            if r.sizeBytes is None:
+                size = sum(
+                    self.file_size(os.path.join(self._output_dir, f))
+                    for f in (
+                        r.snippetTitle,
+                        r.thumbnailTitle,
+                        *VideoSnippet.preview_titles(r.snippetTitle),
+                    )
+                )
+                unknown.append((r.id, size))
+                total += size
+            else:
+                total += r.sizeBytes
+
+        # backfill sizes for recordings made before sizes were stored
+        if unknown:
+            db_writer.submit(
+                lambda session: [
+                    session.query(VideoSnippet)
+                    .where(VideoSnippet.id == id)
+                    .update({"sizeBytes": size})
+                    for id, size in unknown
+                ]
+            )
+
+        return total
+
+    @staticmethod
+    def file_size(path: str) -> int:
+        """Size of a file in bytes, 0 if it doesn't exist."""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
@@ -15,10 +15,7 @@ class Servos:
         min_angle: float = 0.0,
         max_angle: float = 180.0
     ) -> None:
-        
-        # register the cleanup function for when the instance is terminated
-        atexit.register(self._cleanup)
-        
+
         # initialise systemd logger
         self.logger = logger
 
@@ -37,6 +34,10 @@ class Servos:
         self._pan_servo.start(self._angle_to_duty_cycle(self._pan_angle))
         self._tilt_servo.start(self._angle_to_duty_cycle(self._tilt_angle))
 
+        # register the cleanup function for when the instance is terminated, once there's
+        # something to clean up (if the PWMs failed to start, _cleanup would fail at exit)
+        atexit.register(self._cleanup)
+
     def set_pan_angle(self, new_angle: int = 90) -> None:
         "Sets the pan angle."
         assert new_angle >= 0.0
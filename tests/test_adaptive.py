@@ -0,0 +1,89 @@
+from src.inference.adaptive import AdaptiveRate
+
+
+def test_idle_is_small_and_sparse():
+    """Test that while nothing is tracked, inference is small and runs every Nth frame."""
+    rate = AdaptiveRate(idle_imgsz=96, idle_every=3)
+
+    assert rate.imgsz == 96
+    assert [rate.should_infer() for _ in range(6)] == [True, False, False] * 2
+
+
+def test_tracking_is_larger_and_dense():
+    """Test that once something is tracked, inference is larger and runs on every frame."""
+    rate = AdaptiveRate(idle_imgsz=96, active_imgsz=256, idle_every=3, active_every=1)
+    rate.should_infer()
+
+    rate.update(tracking=True)
+
+    assert rate.imgsz == 256
+    assert all(rate.should_infer() for _ in range(5))
+
+
+def test_back_to_idle_infers_next_frame():
+    """Test that a change of mode restarts the frame count, so the next frame is inferred."""
+    rate = AdaptiveRate(idle_every=3)
+    rate.update(tracking=True)
+    rate.should_infer()
+
+    rate.update(tracking=False)
+
+    assert rate.should_infer()
+    assert not rate.should_infer()
+
+
+def test_steps_down_when_slow():
+    """Test that the size steps down while latency is over target, not below the minimum."""
+    rate = AdaptiveRate(active_imgsz=256, target_latency_ms=100, min_imgsz=64, step=32)
+    rate.update(tracking=True)
+
+    rate.update(tracking=True, latency_ms=300)
+    assert rate.imgsz == 224
+
+    for _ in range(20):
+        rate.update(tracking=True, latency_ms=300)
+    assert rate.imgsz == 64
+
+
+def test_steps_back_up_when_fast():
+    """Test that the size steps back up, to the configured size, once latency is low."""
+    rate = AdaptiveRate(active_imgsz=256, target_latency_ms=100, step=32)
+    rate.update(tracking=True, latency_ms=300)
+    assert rate.imgsz == 224
+
+    for _ in range(5):
+        rate.update(tracking=True, latency_ms=10)
+    assert rate.imgsz == 256
+
+
+def test_configure():
+    """Test that new targets apply straight away."""
+    rate = AdaptiveRate()
+
+    rate.configure(
+        idle_imgsz=128, active_imgsz=320, idle_every=5, active_every=2, target_latency_ms=50
+    )
+
+    assert rate.imgsz == 128
+    assert rate.every == 5
+
+
+def test_new_matches_configured():
+    """Test that a new rate starts the same as one configured with the same targets, even
+    when idle is larger than active."""
+    targets = dict(
+        idle_imgsz=320, active_imgsz=256, idle_every=1, active_every=1, target_latency_ms=250
+    )
+    configured = AdaptiveRate()
+    configured.configure(**targets)
+
+    rate = AdaptiveRate(**targets)
+
+    assert rate.imgsz == configured.imgsz == 320
+    assert rate._latency_cap == configured._latency_cap
+
+
+def test_sizes():
+    """Test that the sizes used idle and active are listed once each, at least the minimum."""
+    assert AdaptiveRate().sizes == [96, 256]
+    assert AdaptiveRate(idle_imgsz=32, active_imgsz=32).sizes == [64]
@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.camera.annotator import Annotator
+from src.detector.detected_object import DetectedObject
+
+
+def detection(bbox, label="person", track_id=1) -> DetectedObject:
+    """Helper to make a detection in a 640x480 frame."""
+    return DetectedObject(
+        label=label, bbox=np.array(bbox), height=480, width=640, track_id=track_id
+    )
+
+
+def test_draws_box_in_place():
+    """Test that boxes are drawn onto the frame itself, in the label's colour."""
+    annotator = Annotator(line_width=2)
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    result = annotator.draw(img, [detection([100, 100, 200, 200])])
+
+    assert result is img
+    assert tuple(img[150, 100]) == Annotator.colour("person")
+    # inside of the box untouched
+    assert not img[150, 150].any()
+
+
+def test_label_images_cached():
+    """Test that label images are only rendered once per label and colour, whatever the
+    objects' track ids."""
+    annotator = Annotator()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    annotator.draw(img, [detection([100, 100, 200, 200], track_id=1)])
+    cached = annotator._label_cache[("person", Annotator.colour("person"))]
+    annotator.draw(img, [detection([300, 300, 400, 400], track_id=i) for i in range(2, 50)])
+
+    assert annotator._label_cache[("person", Annotator.colour("person"))] is cached
+    assert len(annotator._label_cache) == 1
+
+
+def test_label_cache_bounded():
+    """Test that the label cache doesn't grow past its limit."""
+    annotator = Annotator(max_cached_labels=5)
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    annotator.draw(img, [detection([10, 10, 50, 50], label=f"label{i}") for i in range(20)])
+
+    assert len(annotator._label_cache) <= 5
+
+
+def test_boxes_at_frame_edges():
+    """Test that boxes and labels at or past the frame edges are clipped."""
+    annotator = Annotator()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    annotator.draw(
+        img,
+        [
+            detection([0, 0, 50, 50]),
+            detection([620, 470, 700, 500], label="a much longer label"),
+        ],
+    )
+
+    assert img.shape == (480, 640, 3)
@@ -0,0 +1,36 @@
+from benchmarks.compare import compare
+from benchmarks.pipeline import StageTimer, run
+
+
+def test_stage_timer_percentiles():
+    """Test that stage latencies are summarised in ms."""
+    timer = StageTimer()
+    for ms in range(1, 101):
+        timer.record("encode", ms / 1000)
+
+    summary = timer.summary()["encode"]
+
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.5
+    assert summary["max_ms"] == 100
+
+
+def test_pipeline_benchmark():
+    """Test that a short benchmark run reports each stage, fps and resource use."""
+    results = run(frames=20, viewers=1, record=False, timeout=30)
+
+    assert results["fps"]["processed"] > 0
+    assert len(results["fps"]["per_viewer"]) == 1
+    for stage in ("read", "predict_batch", "handle_result", "annotate", "encode_full", "end_to_end"):
+        assert results["stages"][stage]["count"] > 0
+    assert results["rss_max_mb"] > 0
+
+
+def test_compare_flags_regressions():
+    """Test that a slower stage or lower fps is reported as a regression."""
+    def results(p50, fps):
+        stage = {"p50_ms": p50, "p90_ms": p50}
+        return {"stages": {"encode": stage}, "fps": {"processed": fps}, "cpu_percent": 50, "rss_max_mb": 100}
+
+    assert compare(results(10, 30), results(10.5, 29)) == []
+    assert compare(results(10, 30), results(20, 20)) == ["encode p50 +100.0%", "fps processed -33.3%"]
@@ -0,0 +1,69 @@
+import pytest
+import numpy as np
+
+from src.camera.brightness import BrightnessMonitor
+
+
+def frame(value: int) -> np.ndarray:
+    """Helper to make a flat 640x480 frame of the given brightness."""
+    return np.full((480, 640, 3), value, dtype=np.uint8)
+
+
+def test_estimate_brightness():
+    """Test that the strided estimate matches the full frame mean for a flat frame."""
+    monitor = BrightnessMonitor()
+
+    assert monitor.estimate_brightness(frame(100)) == pytest.approx(100, abs=0.5)
+
+
+def test_only_checks_every_n_frames():
+    """Test that brightness is only checked every `check_every` frames."""
+    monitor = BrightnessMonitor(check_every=5, dwell_seconds=0)
+
+    results = [monitor.should_switch(0, frame(0), now=0) for _ in range(5)]
+
+    assert results == [False, False, False, False, True]
+
+
+def test_dwell_time():
+    """Test that a switch needs brightness to stay past the threshold for the dwell time."""
+    monitor = BrightnessMonitor(check_every=1, dwell_seconds=10)
+
+    assert not monitor.should_switch(0, frame(0), now=0)
+    assert not monitor.should_switch(0, frame(0), now=5)
+    assert monitor.should_switch(0, frame(0), now=10)
+
+
+def test_hysteresis():
+    """Test that readings just back over the threshold don't cancel a pending switch,
+    but readings clearly back over it do."""
+    monitor = BrightnessMonitor(check_every=1, dwell_seconds=10, std_threshold=30, margin=10)
+
+    monitor.should_switch(0, frame(20), now=0)
+    # within the margin, still pending
+    monitor.should_switch(0, frame(35), now=5)
+    assert monitor.should_switch(0, frame(20), now=10)
+
+    monitor.should_switch(0, frame(20), now=20)
+    # clearly light again, pending switch cancelled
+    monitor.should_switch(0, frame(50), now=25)
+    assert not monitor.should_switch(0, frame(20), now=30)
+
+
+def test_noir_switches_when_light():
+    """Test that the noir camera switches back once it's light."""
+    monitor = BrightnessMonitor(check_every=1, dwell_seconds=0, noir_threshold=250)
+
+    assert not monitor.should_switch(1, frame(200), now=0)
+    assert monitor.should_switch(1, frame(255), now=1)
+
+
+def test_lux_metadata_preferred():
+    """Test that lux metadata is used over the frame when lux thresholds are set."""
+    monitor = BrightnessMonitor(
+        check_every=1, dwell_seconds=0, std_lux_threshold=5, noir_lux_threshold=50
+    )
+
+    # frame is dark but the sensor says it's bright enough
+    assert not monitor.should_switch(0, frame(0), lux=100, now=0)
+    assert monitor.should_switch(0, frame(255), lux=1, now=1)
@@ -1,48 +1,227 @@
-import pytest
-from unittest.mock import MagicMock, patch
-import cv2
-import numpy as np
-from src.camera.camera import Camera, CameraEvent
-
-
-@pytest.fixture
-def mock_picamera():
-    """Fixture to mock Picamera2."""
-    with patch("src.camera.camera.Picamera2") as mock_picamera2:
-        mock_picamera_instance = MagicMock()
-        mock_picamera2.return_value = mock_picamera_instance
-        yield mock_picamera_instance
-
-
-@pytest.fixture
-def mock_detector():
-    """Fixture to mock the BaseDetector."""
-    mock_detector = MagicMock()
-    mock_detector.process_img.side_effect = (
-        lambda img: img
-    )  # return same image for testing purposes
-    yield mock_detector
-
-
-def test_get_frame(mock_detector):
-    """Test that `get_frame` returns the current frame after the event is set."""
-    # Mock frame and event behavior
-    Camera._frame = b"mock_frame_data"
-    Camera._event = MagicMock()
-
-    # make sure wait() returns True, and clear() is called
-    Camera._event.wait.return_value = True
-
-    # init camera and call get_frame
-    cam = Camera(mock_detector, camera_num=0)
-    frame = cam.get_frame()
-
-    # check wait and clear were called
-    Camera._event.wait.assert_called()
-    Camera._event.clear.assert_called()
-
-    # Check that the returned frame is the mocked frame
-    assert frame == b"mock_frame_data"
-
-    # thread keeps running unless you stop it
-    Camera.stop()
+import pytest
+from unittest.mock import MagicMock
+import cv2
+import numpy as np
+from src.blueprints.home import gen
+from src.camera.camera import Camera, CameraEvent
+from src.camera.sources import FrameSource
+from src.inference.scheduler import InferenceScheduler
+
+
+class MockSource(FrameSource):
+    """Frame source that returns blank frames."""
+
+    def __init__(self):
+        self.opened = False
+        self.closed = False
+
+    def open(self):
+        self.opened = True
+
+    def read(self):
+        return np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def mock_detector():
+    """Fixture to mock the BaseDetector."""
+    mock_detector = MagicMock()
+    # return same image for testing purposes
+    mock_detector.predict.side_effect = lambda imgs: imgs
+    mock_detector.handle_result.return_value = []
+    yield mock_detector
+
+
+@pytest.fixture
+def scheduler():
+    """Fixture for a running inference scheduler."""
+    scheduler = InferenceScheduler(workers=1)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    """Make sure each test starts with no registered cameras."""
+    yield
+    for camera in Camera.all():
+        Camera.unregister(camera.name)
+
+
+def test_get_frame(mock_detector):
+    """Test that `get_frame` returns the current frame after the event is set."""
+    cam = Camera("main", MockSource(), mock_detector, MagicMock())
+
+    # Mock frame and event behavior
+    rendition = cam.renditions["full"]
+    rendition.frame = b"mock_frame_data"
+    rendition.event = MagicMock()
+
+    # make sure wait() returns True, and clear() is called
+    rendition.event.wait.return_value = True
+
+    frame = cam.get_frame()
+
+    # check wait and clear were called
+    rendition.event.wait.assert_called()
+    rendition.event.clear.assert_called()
+
+    # Check that the returned frame is the mocked frame
+    assert frame == b"mock_frame_data"
+
+
+def test_stream_frames(mock_detector, scheduler):
+    """Test that frames go from the source, through the detector, out as jpegs."""
+    source = MockSource()
+    cam = Camera.register(Camera("main", source, mock_detector, scheduler))
+
+    cam.start()
+    frame = cam.get_frame()
+
+    # jpeg start of image marker
+    assert frame[:2] == b"\xff\xd8"
+    mock_detector.handle_result.assert_called()
+    assert source.opened
+
+    # thread keeps running unless you stop it
+    cam.stop(wait=True)
+    assert source.closed
+
+
+def test_multiple_cameras(scheduler):
+    """Test that several cameras can be registered and streamed at once."""
+    detectors = [MagicMock(), MagicMock()]
+    for d in detectors:
+        d.predict.side_effect = lambda imgs: imgs
+        d.handle_result.return_value = []
+
+    cams = [
+        Camera.register(Camera(f"cam{i}", MockSource(), d, scheduler))
+        for i, d in enumerate(detectors)
+    ]
+
+    for cam in cams:
+        cam.start()
+        assert cam.get_frame()[:2] == b"\xff\xd8"
+
+    assert Camera.get("cam1") is cams[1]
+    assert [c.name for c in Camera.all()] == ["cam0", "cam1"]
+    for d in detectors:
+        d.handle_result.assert_called()
+
+
+def test_renditions_encoded_only_with_clients(mock_detector):
+    """Test that a rendition is only scaled and encoded while it has clients."""
+    cam = Camera("main", MockSource(), mock_detector, MagicMock())
+    thumb = cam.renditions["thumb"]
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # nobody watching
+    cam.publish(frame, [])
+    assert thumb.frame is None
+    assert cam.renditions["full"].frame is None
+
+    # a client starts watching the thumbnail
+    cam.subscribe("thumb")
+    cam.publish(frame, [])
+
+    decoded = cv2.imdecode(np.frombuffer(thumb.frame, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (120, 160, 3)
+    assert cam.renditions["full"].frame is None
+
+
+def test_annotates_only_with_clients(mock_detector):
+    """Test that frames are only annotated while someone is watching."""
+    cam = Camera("main", MockSource(), mock_detector, MagicMock())
+    cam._annotator = MagicMock()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    cam.publish(frame, [])
+    cam._annotator.draw.assert_not_called()
+
+    cam.subscribe("sd")
+    cam.publish(frame, [])
+    cam._annotator.draw.assert_called_once_with(frame, [])
+
+    cam.unsubscribe("sd")
+    cam.publish(frame, [])
+    cam._annotator.draw.assert_called_once()
+
+
+def test_stream_subscribes_until_closed(mock_detector):
+    """Test that a streaming client counts as a viewer until it disconnects."""
+    cam = Camera("main", MockSource(), mock_detector, MagicMock())
+    stream = gen(cam, "sd")
+    next(stream)
+    assert cam.viewers == 1
+
+    # a frame is published
+    cam.renditions["sd"].frame = b"frame"
+    cam.renditions["sd"].event.set()
+    assert b"frame" in next(stream)
+
+    # client disconnects
+    stream.close()
+    assert cam.viewers == 0
+
+
+def test_detection_runs_without_viewers(mock_detector, scheduler):
+    """Test that frames still go through the detector while nobody is watching."""
+    cam = Camera.register(Camera("main", MockSource(), mock_detector, scheduler))
+    cam._annotator = MagicMock()
+
+    cam.start()
+    cam.stop(wait=True)
+
+    assert cam.viewers == 0
+    mock_detector.handle_result.assert_called()
+    cam._annotator.draw.assert_not_called()
+
+
+def test_camera_event_wait_timeout():
+    """Test that waiting for a frame can time out."""
+    event = CameraEvent()
+
+    assert event.wait(timeout=0.01) is False
+
+
+def test_camera_event_set_while_unsubscribing():
+    """Test that a client unsubscribing while frames are signalled doesn't break set()."""
+    event = CameraEvent()
+    entry = event.subscribe()
+
+    # the client goes between set() copying the clients and signalling them
+    client_event = MagicMock()
+    client_event.is_set.return_value = False
+    client_event.set.side_effect = event.unsubscribe
+    entry[0] = client_event
+
+    event.set()
+
+    client_event.set.assert_called_once()
+    assert event.subscribers == 0
+
+
+def test_set_detector_keeps_source_running(mock_detector, scheduler):
+    """Test that swapping the detector doesn't reopen the source, and frames go through the
+    new detector."""
+    source = MockSource()
+    cam = Camera.register(Camera("main", source, mock_detector, scheduler))
+    cam.start()
+    thread = cam._thread
+
+    new_detector = MagicMock()
+    new_detector.predict.side_effect = lambda imgs: imgs
+    new_detector.handle_result.return_value = []
+    cam.set_detector(new_detector)
+    cam.get_frame()
+    cam.get_frame()
+
+    new_detector.handle_result.assert_called()
+    assert cam._thread is thread and thread.is_alive()
+    assert not source.closed
+    cam.stop(wait=True)
@@ -0,0 +1,156 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from src.db.cache import CachedInferenceSettings, ConfigCache
+from src.db.database import Base
+from src.db.models import InferenceSettings, Labels
+
+
+@pytest.fixture
+def engine():
+    """Fixture for an in-memory db."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+
+
+@pytest.fixture
+def session(engine):
+    """Fixture for a scoped session with the starting labels set."""
+    session = scoped_session(sessionmaker(bind=engine))
+    session.add(Labels(labels_dict={"person": True, "dog": False}))
+    session.commit()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def query_counter(engine):
+    """Fixture that counts the SELECT statements run against the db."""
+    counter = {"selects": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            counter["selects"] += 1
+
+    yield counter
+
+
+def test_labels_cached(session, query_counter):
+    """Test that the labels are only read from the db once."""
+    cache = ConfigCache(session=session)
+
+    assert cache.get_enabled_labels() == ["person"]
+    assert cache.get_labels() == {"person": True, "dog": False}
+    assert query_counter["selects"] == 1
+
+
+def test_set_labels_writes_through(session, query_counter):
+    """Test that setting labels updates both the db and the cache."""
+    cache = ConfigCache(session=session)
+
+    cache.set_labels({"person": False, "dog": True})
+
+    assert cache.get_enabled_labels() == ["dog"]
+    assert query_counter["selects"] == 0
+    assert session.query(Labels).first().labelsJson == {"person": False, "dog": True}
+
+
+def test_recipients_invalidated(session):
+    """Test that adding and deleting recipients invalidates the cached list."""
+    cache = ConfigCache(session=session)
+    assert cache.get_email_recipients() == []
+
+    cache.add_email_recipient("a@example.com")
+    recipients = cache.get_email_recipients()
+    assert [r.emailAddress for r in recipients] == ["a@example.com"]
+
+    cache.delete_email_recipient(recipients[0].id)
+    assert cache.get_email_recipients() == []
+
+
+def test_returned_labels_are_copies(session):
+    """Test that mutating returned labels doesn't change the cached copy."""
+    cache = ConfigCache(session=session)
+
+    cache.get_labels()["dog"] = True
+
+    assert cache.get_labels()["dog"] is False
+
+
+def test_inference_settings_defaults(session):
+    """Test that the default inference settings are used if none are stored."""
+    cache = ConfigCache(session=session)
+
+    assert cache.get_inference_settings() == CachedInferenceSettings()
+
+
+def test_set_inference_settings_writes_through(session, query_counter):
+    """Test that setting inference settings updates both the db and the cache."""
+    cache = ConfigCache(session=session)
+    session.add(InferenceSettings())
+    session.commit()
+    settings = CachedInferenceSettings(idle_imgsz=128, active_every=2)
+
+    cache.set_inference_settings(settings)
+    query_counter["selects"] = 0
+
+    assert cache.get_inference_settings() == settings
+    assert query_counter["selects"] == 0
+    row = session.query(InferenceSettings).one()
+    assert (row.idleImgsz, row.activeEvery) == (128, 2)
+
+
+def test_regions_cached_per_camera(session, query_counter):
+    """Test that regions are read from the db once, and kept per camera."""
+    cache = ConfigCache(session=session)
+    cache.set_regions("main", [[(0, 0), (1, 0), (1, 1)]])
+    cache.set_regions("garden", [[(0, 0), (0.5, 0), (0.5, 0.5)], [(0.5, 0.5), (1, 0.5), (1, 1)]])
+    query_counter["selects"] = 0
+
+    assert cache.get_regions("main") == [[(0, 0), (1, 0), (1, 1)]]
+    assert len(cache.get_regions("garden")) == 2
+    assert cache.get_regions("other") == []
+    assert query_counter["selects"] == 1
+
+
+def test_set_regions_replaces(session):
+    """Test that setting a camera's regions replaces its old ones."""
+    cache = ConfigCache(session=session)
+    cache.set_regions("main", [[(0, 0), (1, 0), (1, 1)]])
+
+    cache.set_regions("main", [])
+
+    assert cache.get_regions("main") == []
+
+
+def test_refresh_picks_up_changes_from_another_process(session):
+    """Test that a cache sees another process's write once refreshed, e.g. labels set
+    through another web worker."""
+    cache = ConfigCache(session=session)
+    other = ConfigCache(session=session)
+    cache.refresh()
+    assert cache.get_enabled_labels() == ["person"]
+
+    other.set_labels({"person": False, "dog": True})
+    other.add_email_recipient("a@example.com")
+
+    assert cache.get_enabled_labels() == ["person"]
+    cache.refresh()
+    assert cache.get_enabled_labels() == ["dog"]
+    assert [r.emailAddress for r in cache.get_email_recipients()] == ["a@example.com"]
+
+
+def test_refresh_keeps_cache_if_unchanged(session, query_counter):
+    """Test that refreshing without a change in between only reads the config version."""
+    cache = ConfigCache(session=session)
+    cache.refresh()
+    cache.get_labels()
+    query_counter["selects"] = 0
+
+    cache.refresh()
+    cache.get_labels()
+
+    assert query_counter["selects"] == 1
@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.database import Base
+from src.db.models import EmailRecipient
+from src.db.writer import DbWriter
+
+
+@pytest.fixture
+def session_factory():
+    """Fixture for a scoped session bound to an in-memory db."""
+    # static pool so the writer thread sees the same in-memory db
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = scoped_session(sessionmaker(bind=engine))
+    yield factory
+    factory.remove()
+
+
+def test_add_commits_in_background(session_factory):
+    """Test that queued objects are committed by the writer thread."""
+    writer = DbWriter(session_factory=session_factory)
+
+    writer.add(EmailRecipient(email_address="a@example.com"))
+    writer.add(EmailRecipient(email_address="b@example.com"))
+    writer.flush()
+
+    emails = [r.emailAddress for r in session_factory().query(EmailRecipient).all()]
+    assert sorted(emails) == ["a@example.com", "b@example.com"]
+
+
+def test_on_commit_called(session_factory):
+    """Test that the on_commit callback runs once the object is committed."""
+    writer = DbWriter(session_factory=session_factory)
+    callback = MagicMock()
+
+    writer.add(EmailRecipient(email_address="a@example.com"), on_commit=callback)
+    writer.flush()
+
+    callback.assert_called_once()
+
+
+def test_bad_item_does_not_drop_batch(session_factory):
+    """Test that a failing item is dropped without losing the rest of its batch."""
+    writer = DbWriter(session_factory=session_factory)
+    good_callback = MagicMock()
+    bad_callback = MagicMock()
+
+    def failing_work(session):
+        raise ValueError("bad item")
+
+    writer.submit(failing_work, on_commit=bad_callback)
+    writer.add(EmailRecipient(email_address="a@example.com"), on_commit=good_callback)
+    writer.flush()
+
+    emails = [r.emailAddress for r in session_factory().query(EmailRecipient).all()]
+    assert emails == ["a@example.com"]
+    good_callback.assert_called_once()
+    bad_callback.assert_not_called()
+
+
+def test_failed_rollback_does_not_stop_writer():
+    """Test that a batch failing outside the per-item retry is dropped, flush() still
+    returns, and the writer carries on with the next batch."""
+    session = MagicMock()
+    session.commit.side_effect = [ValueError("commit failed"), None]
+    session.rollback.side_effect = [RuntimeError("rollback failed")]
+    writer = DbWriter(session_factory=lambda: session, max_batch=1)
+
+    writer.submit(lambda s: None)
+    writer.flush()
+
+    callback = MagicMock()
+    writer.submit(lambda s: None, on_commit=callback)
+    writer.flush()
+
+    callback.assert_called_once()
+    assert writer.pending == 0
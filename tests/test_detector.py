@@ -1,7 +1,25 @@
 import pytest
-from unittest.mock import Mock, patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
 import numpy as np
-from src.detector.detector import YoloWorldDetector, BaseDetector
+import torch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.database import Base
+from src.db.models import DetectionRollup, VideoSnippet
+from src.db.writer import DbWriter
+from src.detector.detector import YoloWorldDetector, BaseDetector, model_cache
+from src.recorder.recorder import Recorder
+
+
+@pytest.fixture(autouse=True)
+def clear_model_cache():
+    """Make sure models aren't shared between tests."""
+    model_cache.clear()
+    yield
+    model_cache.clear()
 
 
 @pytest.fixture
@@ -64,8 +82,174 @@ def test_process_img_stop_recording(recorder_mock):
     img_arr = np.zeros((480, 640, 3), dtype=np.uint8)
 
     detector._frames_without_tracking = 10  # Simulate buffer_frames limit reached
-    detector._recorder._is_recording = True
+    detector._recorder.is_recording = True
 
     detector.process_img(img_arr)
 
     recorder_mock.stop_recording.assert_called_once_with(detector._tracked_objects)
+
+
+def test_detectors_share_model(yolo_mock, recorder_mock):
+    """Test that detectors with the same labels share a model, so they can be batched,
+    but each keep their own tracker."""
+    a = YoloWorldDetector(recorder=recorder_mock, labels=["dog"])
+    b = YoloWorldDetector(recorder=Mock(), labels=["dog"])
+
+    yolo_mock.assert_called_once_with("yolov8s-world.pt")
+    assert a.batch_key == b.batch_key
+    assert a._tracker is not b._tracker
+
+
+def test_predict_batch(yolo_mock, recorder_mock):
+    """Test that a batch of images goes through the model in one call."""
+    detector = YoloWorldDetector(recorder=recorder_mock)
+    imgs = [np.zeros((480, 640, 3)), np.ones((480, 640, 3))]
+
+    detector.predict(imgs)
+
+    yolo_mock.return_value.cpu().predict.assert_called_once_with(
+        imgs, imgsz=96, verbose=False
+    )
+
+
+def test_skipped_frame_still_recorded(yolo_mock, recorder_mock):
+    """Test that a frame inference was skipped on is still recorded, with the last detections"""
+    detector = YoloWorldDetector(recorder=recorder_mock)
+    detector._recorder.is_recording = True
+    detector._last_detections = ["last"]
+    img_arr = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    detections = detector.handle_result(img_arr, None)
+
+    assert detections == ["last"]
+    recorder_mock.write_frame.assert_called_once_with(img_arr)
+    recorder_mock.stop_recording.assert_not_called()
+
+
+def test_buffer_counts_skipped_frames(yolo_mock, recorder_mock):
+    """Test that recording stops after buffer_frames real frames without tracking, not
+    buffer_frames inferred ones, when inference skips frames"""
+    from src.inference.adaptive import AdaptiveRate
+
+    detector = YoloWorldDetector(
+        recorder=recorder_mock, buffer_frames=6, rate=AdaptiveRate(idle_every=3)
+    )
+    recorder_mock.is_recording = True
+    img_arr = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # a result with nothing tracked
+    result = Mock(speed=None)
+    result.boxes.is_track = False
+    result.boxes.__iter__ = Mock(return_value=iter([]))
+
+    frames = 0
+    with patch.object(detector, "_track", side_effect=lambda r: r), patch.object(
+        detector, "_filter_regions", side_effect=lambda img, r: r
+    ):
+        while not recorder_mock.stop_recording.called and frames < 50:
+            frames += 1
+            detector.handle_result(img_arr, result if detector.should_predict() else None)
+
+    assert frames == 6
+
+
+def test_warm_up(yolo_mock, recorder_mock):
+    """Test that warm up runs inference at each size the rate uses, without touching the recorder"""
+    detector = YoloWorldDetector(recorder=recorder_mock)
+
+    detector.warm_up(runs=2)
+
+    model = yolo_mock.return_value.cpu()
+    assert [c.kwargs["imgsz"] for c in model.predict.call_args_list] == [96, 96, 256, 256]
+    assert model.predict.call_args.args[0][0].shape == (480, 640, 3)
+    recorder_mock.start_recording.assert_not_called()
+    recorder_mock.write_frame.assert_not_called()
+
+
+def test_detections_outside_regions_ignored(yolo_mock, recorder_mock):
+    """Test that only detections centred in a region of interest are kept, in frame coordinates"""
+    from ultralytics.engine.results import Results
+    import torch
+    from src.detector.roi import RegionMask
+
+    # right half of the frame, cropped from x=280
+    regions = RegionMask([[(0.5, 0), (1, 0), (1, 1), (0.5, 1)]], pad=40)
+    detector = YoloWorldDetector(recorder=recorder_mock, regions=regions)
+    recorder_mock.is_recording = True
+    img_arr = np.zeros((480, 640, 3), dtype=np.uint8)
+    crop = detector.prepare(img_arr)
+
+    # one box in the region, one in the crop padding, outside it
+    result = Results(
+        crop,
+        path="",
+        names={0: "person"},
+        boxes=torch.tensor([[100.0, 10, 140, 50, 0.9, 0], [10, 10, 30, 50, 0.9, 0]]),
+    )
+    detections = detector.handle_result(img_arr, result)
+
+    assert crop.shape == (480, 360, 3)
+    assert len(detections) == 1
+    assert list(detections[0].bbox) == [380, 10, 420, 50]
+    assert (detections[0].height, detections[0].width) == (480, 640)
+
+
+class Boxes(list):
+    """Stands in for a result's boxes, tracked if there are any."""
+
+    @property
+    def is_track(self):
+        return bool(self)
+
+
+def tracked_result(*objects):
+    """Helper for an inference result with (track id, class) objects in it."""
+    boxes = Boxes(
+        SimpleNamespace(id=track_id, cls=cls, xyxy=torch.tensor([[0.0, 0, 10, 10]]))
+        for track_id, cls in objects
+    )
+    return SimpleNamespace(boxes=boxes, speed=None)
+
+
+def test_each_recording_has_its_own_labels(yolo_mock, tmp_path):
+    """Test that two recordings in a row are saved with the labels of only the objects in
+    each, and counted as such in the rollup"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine, autoflush=False))
+    writer = DbWriter(session_factory=session)
+
+    recorder = Recorder(output_dir=str(tmp_path))
+    detector = YoloWorldDetector(recorder=recorder, labels=["person", "dog"], buffer_frames=2)
+    img_arr = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    with patch("src.recorder.recorder.ffmpeg"), patch.object(
+        recorder, "generate_thumbnail"
+    ), patch("src.recorder.recorder.db_writer", writer), patch(
+        "src.recorder.recorder.config_cache"
+    ), patch("src.recorder.recorder.Notification"), patch.dict(
+        "os.environ", {"SB_MAIL_USERNAME": "", "SB_MAIL_PASSWORD": ""}
+    ), patch.object(
+        detector, "_track", side_effect=lambda r: r
+    ), patch.object(detector, "_filter_regions", side_effect=lambda img, r: r):
+        # a dog, then a person, each followed by enough empty frames to stop recording
+        for result in [
+            tracked_result((1, 1)),
+            tracked_result(),
+            tracked_result(),
+            tracked_result((2, 0)),
+            tracked_result(),
+            tracked_result(),
+        ]:
+            detector.handle_result(img_arr, result)
+            # finalised in the background, the next recording can't start until it's done
+            recorder.wait_finalised()
+        writer.flush()
+
+    snippets = session.query(VideoSnippet).order_by(VideoSnippet.id).all()
+    assert [s.labels for s in snippets] == ["dog", "person"]
+    counts = {r.label: r.count for r in session.query(DetectionRollup)}
+    assert counts == {"dog": 1, "person": 1}
+    session.remove()
@@ -0,0 +1,74 @@
+import sys
+import types
+import pytest
+from unittest.mock import MagicMock, patch
+
+# off the Pi picamera2 isn't installed, stand in for it so dual_camera imports. Picamera2
+# is patched in every test anyway
+try:
+    import picamera2
+except ImportError:
+    sys.modules["picamera2"] = types.SimpleNamespace(Picamera2=MagicMock())
+
+from src.camera.dual_camera import DualCamera
+
+
+@pytest.fixture
+def mock_picams():
+    """Fixture to mock Picamera2, one instance per camera num."""
+    picams = {0: MagicMock(), 1: MagicMock()}
+    for num, picam in picams.items():
+        picam.capture_request.return_value.make_array.return_value = f"frame {num}"
+        picam.capture_request.return_value.get_metadata.return_value = {"Lux": num}
+
+    with patch(
+        "src.camera.dual_camera.Picamera2",
+        side_effect=lambda camera_num: picams[camera_num],
+    ):
+        yield picams
+
+
+def test_opens_both_cameras(mock_picams):
+    """Test that both sensors are configured and started, with the inactive one idling."""
+    with DualCamera(active_num=0, fps=30, idle_fps=2, warm_up=0) as cams:
+        assert cams.active_num == 0
+
+    for picam in mock_picams.values():
+        picam.configure.assert_called_once()
+        picam.start.assert_called_once()
+        picam.close.assert_called_once()
+
+    mock_picams[0].set_controls.assert_called_with({"FrameDurationLimits": (33333, 33333)})
+    mock_picams[1].set_controls.assert_called_with({"FrameDurationLimits": (500000, 500000)})
+
+
+def test_switch_without_reopening(mock_picams):
+    """Test that switching takes frames from the other sensor without restarting either."""
+    with DualCamera(active_num=0, fps=30, idle_fps=2, warm_up=0) as cams:
+        assert cams.capture() == ("frame 0", 0)
+
+        cams.switch()
+
+        assert cams.active_num == 1
+        assert cams.capture() == ("frame 1", 1)
+        mock_picams[1].set_controls.assert_called_with(
+            {"FrameDurationLimits": (33333, 33333)}
+        )
+        mock_picams[0].set_controls.assert_called_with(
+            {"FrameDurationLimits": (500000, 500000)}
+        )
+
+        for picam in mock_picams.values():
+            picam.start.assert_called_once()
+            picam.stop.assert_not_called()
+
+
+def test_single_camera(mock_picams):
+    """Test that with only one sensor attached, switching does nothing."""
+    with patch(
+        "src.camera.dual_camera.Picamera2",
+        side_effect=[mock_picams[0], RuntimeError("no camera")],
+    ):
+        with DualCamera(active_num=0, warm_up=0) as cams:
+            cams.switch()
+            assert cams.active_num == 0
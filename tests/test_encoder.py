@@ -0,0 +1,72 @@
+import pytest
+import cv2
+import numpy as np
+
+from src.camera.encoder import (
+    OpenCvEncoder,
+    QualityGovernor,
+    SimpleJpegEncoder,
+    StreamEncoder,
+    create_encoder,
+)
+
+
+@pytest.fixture
+def frame():
+    """Fixture for a noisy BGR frame, blue on the left half."""
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    img[:, :320] = (255, 0, 0)
+    return img
+
+
+@pytest.mark.parametrize("encoder", [SimpleJpegEncoder(), OpenCvEncoder()])
+def test_encoders_keep_bgr_order(encoder, frame):
+    """Test that encoders take BGR frames as they are, with no channel swap."""
+    data = encoder.encode(frame, quality=90)
+
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded[240, 100, 0] > 200  # blue
+    assert decoded[240, 100, 2] < 50  # red
+
+
+def test_create_encoder_prefers_simplejpeg():
+    """Test that simplejpeg is used when it is installed."""
+    assert isinstance(create_encoder(), SimpleJpegEncoder)
+
+
+def test_governor_lowers_quality_over_budget():
+    """Test that quality steps down while the stream is over budget."""
+    governor = QualityGovernor(budget_bytes_per_sec=100_000, initial_quality=75, step=5)
+
+    # 50KB frames at 10fps = 500KB/s
+    for i in range(5):
+        governor.update(50_000, now=i * 0.1)
+
+    assert governor.quality < 75
+
+
+def test_governor_raises_quality_under_budget():
+    """Test that quality steps back up when well under budget, within the max."""
+    governor = QualityGovernor(
+        budget_bytes_per_sec=1_000_000, initial_quality=75, max_quality=85, step=5
+    )
+
+    # 10KB frames at 10fps = 100KB/s
+    for i in range(10):
+        governor.update(10_000, now=i * 0.1)
+
+    assert governor.quality == 85
+
+
+def test_stream_encoder_stats(frame):
+    """Test that the stream encoder records encode metrics."""
+    encoder = StreamEncoder()
+
+    data = encoder.encode(frame)
+    stats = encoder.stats()
+
+    assert data[:2] == b"\xff\xd8"
+    assert stats["frames"] == 1
+    assert stats["avg_frame_bytes"] == len(data)
+    assert stats["avg_encode_ms"] > 0
@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import MagicMock
+from flask import Flask
+
+from src.blueprints.health import health_blueprint
+from src.engine.engine import Engine
+
+
+def make_camera(name, batch_key="model"):
+    """Make a mock camera, ready once started, with a detector sharing `batch_key`."""
+    camera = MagicMock()
+    camera.name = name
+    camera.ready = False
+    camera.detector.batch_key = batch_key
+
+    def start():
+        camera.ready = True
+
+    camera.start.side_effect = start
+    return camera
+
+
+@pytest.fixture
+def cameras():
+    """Fixture for two cameras sharing a model and one with its own."""
+    return [make_camera("main"), make_camera("yard"), make_camera("door", batch_key="other")]
+
+
+def test_engine_warms_up_then_starts_cameras(cameras):
+    """Test that the engine warms up each model once, then starts every camera."""
+    engine = Engine(cameras, warm_up_runs=3)
+    assert not engine.ready
+
+    engine.start()
+    engine.join(timeout=5)
+
+    cameras[0].detector.warm_up.assert_called_once_with(runs=3)
+    cameras[1].detector.warm_up.assert_not_called()
+    cameras[2].detector.warm_up.assert_called_once_with(runs=3)
+    for camera in cameras:
+        camera.start.assert_called_once()
+
+    assert engine.ready
+    assert engine.status() == {
+        "ready": True,
+        "state": "running",
+        "cameras": {"main": True, "yard": True, "door": True},
+    }
+
+
+def test_engine_starts_cameras_if_warm_up_fails(cameras):
+    """Test that a failed warm up doesn't stop the cameras starting."""
+    cameras[0].detector.warm_up.side_effect = RuntimeError("no model")
+
+    engine = Engine(cameras)
+    engine.start()
+    engine.join(timeout=5)
+
+    assert engine.ready
+    cameras[0].start.assert_called_once()
+
+
+def test_engine_not_ready_until_cameras_are(cameras):
+    """Test that the engine isn't ready while a camera has no frames."""
+    cameras[1].start.side_effect = None
+
+    engine = Engine(cameras)
+    engine.start()
+    engine.join(timeout=5)
+
+    assert engine.state == "running"
+    assert not engine.ready
+    assert engine.status()["cameras"]["yard"] is False
+
+
+def test_ready_route(cameras):
+    """Test that /ready is 503 until the engine is ready, then 200."""
+    engine = Engine(cameras)
+    app = Flask(__name__)
+    app.config["ENGINE"] = engine
+    app.register_blueprint(health_blueprint)
+    client = app.test_client()
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["state"] == "stopped"
+
+    engine.start()
+    engine.join(timeout=5)
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
@@ -0,0 +1,157 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.camera.camera import Camera
+from src.db.cache import CachedInferenceSettings
+from src.engine.client import EngineClient, EngineError
+from src.engine.engine import Engine
+from src.engine.server import EngineServer, acquire_lock
+from src.profiler.profiler import profiler
+
+
+def wait_for(condition, timeout=2):
+    """Wait until a condition is true, returning whether it became true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def camera():
+    """Fixture for a camera, with a mock source, detector and scheduler."""
+    return Camera("main", MagicMock(), MagicMock(), MagicMock())
+
+
+@pytest.fixture
+def engine(camera):
+    """Fixture for an engine with the camera."""
+    return Engine([camera], model="v8nano")
+
+
+@pytest.fixture
+def client(engine, tmp_path):
+    """Fixture for an engine served over a socket, and a client of it."""
+    socket_path = str(tmp_path / "engine.sock")
+    server = EngineServer(engine, socket_path)
+    server.start()
+    yield EngineClient(socket_path)
+    server.stop()
+
+
+def test_status(client):
+    """Test that the engine's status is passed through."""
+    assert client.status() == {"ready": False, "state": "stopped", "cameras": {"main": False}}
+    assert client.camera_names() == ["main"]
+
+
+def test_status_unreachable(tmp_path):
+    """Test that an engine that isn't running isn't ready."""
+    client = EngineClient(str(tmp_path / "missing.sock"))
+
+    assert client.status()["state"] == "unreachable"
+    assert client.camera_names() == []
+    assert client.camera("main") is None
+
+
+def test_stream_frames(client, camera):
+    """Test that a remote viewer is counted, and gets frames through shared memory."""
+    remote = client.camera("main")
+    assert client.camera("yard") is None
+
+    remote.subscribe("sd")
+    assert wait_for(lambda: camera.viewers == 1)
+
+    # the engine only encodes watched renditions
+    camera.publish(np.zeros((480, 640, 3), dtype=np.uint8), [])
+    frame = remote.get_frame("sd")
+    assert frame.startswith(b"\xff\xd8")
+    assert camera.renditions["full"].frame is None
+
+    remote.unsubscribe("sd")
+    assert wait_for(lambda: camera.viewers == 0)
+
+
+def test_get_frame_timeout(client):
+    """Test that a viewer gives up if the engine sends no frames."""
+    remote = client.camera("main")
+    remote._frame_timeout = 0.05
+
+    with pytest.raises(TimeoutError):
+        remote.get_frame("thumb")
+    remote.unsubscribe("thumb")
+
+
+def test_commands(client, camera):
+    """Test that settings changes are applied to the engine's cameras."""
+    settings = CachedInferenceSettings(idle_imgsz=128)
+
+    client.configure_inference(settings)
+    client.set_regions("main", [[(0, 0), (1, 0), (1, 1)]])
+
+    camera.detector.rate.configure.assert_called_once_with(
+        idle_imgsz=128, idle_every=3, active_imgsz=256, active_every=1, target_latency_ms=250
+    )
+    assert camera.detector.set_regions.call_args.args[0].polygons == [[[0, 0], [1, 0], [1, 1]]]
+
+
+def test_model_shared_by_clients(client, engine, tmp_path):
+    """Test that a model set through one web worker's client is seen by every other's."""
+    other = EngineClient(str(tmp_path / "engine.sock"))
+    assert other.get_model() == "v8nano"
+
+    with patch("src.detector.detector.create_detector"):
+        client.set_detectors("v8world", ["person"])
+
+    assert other.get_model() == "v8world"
+    assert EngineClient(str(tmp_path / "missing.sock")).get_model() is None
+
+
+def test_ensure_running_restarts_with_new_config(engine, tmp_path):
+    """Test that an engine running with the app's config is left alone, and one started
+    with different config (e.g. before the cameras changed) is stopped and started again."""
+    socket_path = str(tmp_path / "engine.sock")
+    server = EngineServer(engine, socket_path, {"CAMERA_SOURCES": [{"name": "main"}]})
+    server.start()
+    client = EngineClient(socket_path)
+
+    try:
+        with patch("src.engine.client.subprocess.Popen") as popen:
+            client.ensure_running({"CAMERA_SOURCES": [{"name": "main"}]})
+            popen.assert_not_called()
+            assert not server.stopped.is_set()
+
+            client.ensure_running({"CAMERA_SOURCES": [{"name": "yard"}]})
+            assert server.stopped.is_set()
+            popen.assert_called_once()
+            assert '"yard"' in popen.call_args.args[0][-1]
+    finally:
+        server.stop()
+
+
+def test_errors(client):
+    """Test that errors in the engine are raised in the client."""
+    with pytest.raises(EngineError):
+        client.camera("main").subscribe("huge")
+
+    # a busy profiler is a RuntimeError, as in the engine
+    with profiler._lock:
+        with pytest.raises(RuntimeError):
+            client.profile(0.1)
+
+
+def test_one_engine_per_socket(tmp_path):
+    """Test that only one engine can hold a socket's lock."""
+    socket_path = str(tmp_path / "engine.sock")
+
+    lock = acquire_lock(socket_path)
+    assert lock is not None
+    assert acquire_lock(socket_path) is None
+
+    lock.close()
+    assert acquire_lock(socket_path) is not None
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from src.engine.frames import FrameRing
+
+
+@pytest.fixture
+def ring():
+    """Fixture for a small frame ring, and a reader attached to it."""
+    ring = FrameRing(f"sb_test_{os.getpid()}", create=True, slots=3, slot_bytes=16)
+    reader = FrameRing(ring.name)
+    yield ring, reader
+    reader.close()
+    ring.close()
+
+
+def test_empty(ring):
+    """Test that there's nothing to read before the first frame."""
+    _, reader = ring
+
+    assert reader.latest == 0
+    assert reader.read() is None
+
+
+def test_read_latest(ring):
+    """Test that the reader gets the latest frame, numbered, and only once."""
+    ring, reader = ring
+
+    ring.write(b"one")
+    ring.write(b"two")
+
+    assert reader.read() == (2, b"two")
+    assert reader.read(after=2) is None
+
+    ring.write(b"three")
+    assert reader.read(after=2) == (3, b"three")
+
+
+def test_wraps_around(ring):
+    """Test that slots are reused once every slot has been written."""
+    ring, reader = ring
+
+    for i in range(10):
+        ring.write(f"frame {i}".encode())
+
+    assert reader.read() == (10, b"frame 9")
+
+
+def test_frame_too_big(ring):
+    """Test that a frame bigger than a slot isn't written."""
+    ring, reader = ring
+
+    assert not ring.write(bytes(17))
+    assert reader.read() is None
+
+
+def test_engine_restart(ring):
+    """Test that a reader gets frames from a new engine, even though they're numbered lower."""
+    ring, reader = ring
+
+    ring.write(b"new engine")
+
+    assert reader.read(after=500) == (1, b"new engine")
+
+
+def test_torn_read(ring):
+    """Test that a frame being overwritten isn't returned."""
+    ring, reader = ring
+    ring.write(b"one")
+
+    # the slot being written has its number zeroed
+    offset = ring._offset(1)
+    ring._shm.buf[offset : offset + 8] = bytes(8)
+
+    assert reader.read() is None
@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# the repo root, so the subprocess can import src
+ROOT = Path(__file__).resolve().parent.parent
+
+# too slow to import, or hardware specific, should only load when the app is created
+HEAVY_MODULES = ["torch", "ultralytics", "picamera2", "rpi_hardware_pwm", "cysystemd", "qrcode"]
+
+
+def import_in_subprocess(*modules: str) -> dict:
+    """Import modules in a fresh interpreter, returning how long it took and the heavy
+    modules that were loaded along the way."""
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+for module in {list(modules)!r}:
+    __import__(module)
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_package_is_fast():
+    """Test that importing the package is within budget and loads no heavy modules."""
+    result = import_in_subprocess("src")
+
+    assert result["heavy"] == []
+    assert result["seconds"] < 1.0
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "src.blueprints.admin",
+        "src.blueprints.api",
+        "src.blueprints.home",
+        "src.blueprints.media",
+        "src.blueprints.metrics",
+        "src.blueprints.saved",
+        "src.blueprints.servo_controls",
+        "src.blueprints.settings",
+        "src.blueprints.utils",
+    ],
+)
+def test_import_blueprint_loads_no_heavy_modules(module):
+    """Test that importing a blueprint doesn't load the model or hardware libraries."""
+    assert import_in_subprocess(module)["heavy"] == []
@@ -0,0 +1,69 @@
+import pytest
+from flask import Flask
+
+from src.blueprints.media import media_blueprint
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Fixture for a minimal app with the media blueprint and a recording on disk."""
+    (tmp_path / "clip.mp4").write_bytes(bytes(range(256)) * 4)
+
+    app = Flask(__name__)
+    app.config["RECORDINGS_DIR"] = str(tmp_path)
+    app.register_blueprint(media_blueprint)
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Fixture for a test client of the app."""
+    return app.test_client()
+
+
+def test_full_file(client):
+    """Test that a recording is served with caching headers."""
+    response = client.get("/media/recordings/clip.mp4")
+
+    assert response.status_code == 200
+    assert len(response.data) == 1024
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+
+def test_range_request(client):
+    """Test that a byte range only returns the bytes asked for."""
+    response = client.get("/media/recordings/clip.mp4", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.data == bytes(range(10, 20))
+    assert response.headers["Content-Range"] == "bytes 10-19/1024"
+
+
+def test_etag_not_modified(client):
+    """Test that a matching ETag returns 304 with no body."""
+    etag = client.get("/media/recordings/clip.mp4").headers["ETag"]
+
+    response = client.get("/media/recordings/clip.mp4", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_missing_and_traversal(client):
+    """Test that missing files, and files outside the recordings dir, 404."""
+    assert client.get("/media/recordings/nope.mp4").status_code == 404
+    assert client.get("/media/recordings/../secret.txt").status_code == 404
+
+
+def test_x_accel_redirect(app, client):
+    """Test that the transfer is handed off to nginx when configured."""
+    app.config["MEDIA_X_ACCEL_PREFIX"] = "/protected_recordings/"
+
+    response = client.get("/media/recordings/clip.mp4")
+
+    assert response.headers["X-Accel-Redirect"] == "/protected_recordings/clip.mp4"
+    assert response.headers["Content-Type"] == "video/mp4"
+    assert response.data == b""
@@ -0,0 +1,89 @@
+import pytest
+from unittest.mock import MagicMock
+from flask import Flask
+
+from src.blueprints.metrics import metrics_blueprint
+from src.camera.camera import Camera
+from src.engine.engine import Engine
+from src.metrics.metrics import Histogram, Metrics, format_labels
+
+
+def test_histogram_buckets():
+    """Test that values are counted in the first bucket they fit, cumulatively."""
+    histogram = Histogram(buckets=(0.01, 0.1))
+
+    for value in (0.005, 0.01, 0.05, 1):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [("0.01", 2), ("0.1", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(1.065)
+
+
+def test_span():
+    """Test that a span observes how long its body took, by stage and labels."""
+    metrics = Metrics()
+
+    with metrics.span("encode", camera="main"):
+        pass
+    with metrics.span("encode", camera="main"):
+        pass
+
+    assert metrics.histogram("encode", camera="main").count == 2
+    assert metrics.histogram("encode", camera="yard") is None
+
+
+def test_span_observes_on_error():
+    """Test that a span still observes if its body raises."""
+    metrics = Metrics()
+
+    with pytest.raises(ValueError):
+        with metrics.span("capture"):
+            raise ValueError()
+
+    assert metrics.histogram("capture").count == 1
+
+
+def test_render():
+    """Test that histograms are rendered as Prometheus text."""
+    metrics = Metrics(buckets=(0.1,))
+    metrics.observe("capture", 0.05, camera="main")
+
+    text = metrics.render()
+
+    assert "# TYPE surveillance_stage_seconds histogram" in text
+    assert 'surveillance_stage_seconds_bucket{camera="main",le="0.1",stage="capture"} 1' in text
+    assert 'surveillance_stage_seconds_bucket{camera="main",le="+Inf",stage="capture"} 1' in text
+    assert 'surveillance_stage_seconds_count{camera="main",stage="capture"} 1' in text
+
+
+def test_label_escaping():
+    """Test that label values are escaped."""
+    assert format_labels({"camera": 'a"b'}) == '{camera="a\\"b"}'
+
+
+@pytest.fixture
+def client():
+    """Fixture for a test client of a minimal app with the metrics blueprint and a camera."""
+    scheduler = MagicMock()
+    scheduler.stats.return_value = {"main": {"processed": 10, "dropped": 2, "pending": 1}}
+    camera = Camera("main", MagicMock(), MagicMock(), scheduler)
+
+    app = Flask(__name__)
+    app.config["ENGINE"] = Engine([camera], scheduler=scheduler)
+    app.register_blueprint(metrics_blueprint)
+    yield app.test_client()
+
+
+def test_metrics_route(client):
+    """Test that the metrics route reports frame counts, queue depths and viewers."""
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'surveillance_frames_processed_total{camera="main"} 10' in text
+    assert 'surveillance_frames_dropped_total{camera="main"} 2' in text
+    assert 'surveillance_inference_queue_depth{camera="main"} 1' in text
+    assert 'surveillance_viewers{camera="main",rendition="sd"} 0' in text
+    assert "surveillance_db_writer_queue_depth 0" in text
@@ -0,0 +1,95 @@
+import time
+from collections import Counter
+from threading import Event, Thread
+
+import pytest
+from flask import Flask
+
+from src.blueprints.admin import admin_blueprint
+from src.engine.engine import Engine
+from src.profiler.profiler import SamplingProfiler
+
+
+def busy_camera_work(stop: Event) -> None:
+    """Busy loop for a profiled thread."""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def camera_thread():
+    """Fixture for a busy thread named like a camera thread."""
+    stop = Event()
+    thread = Thread(target=busy_camera_work, args=(stop,), name="camera-main", daemon=True)
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_profile_samples_named_threads(camera_thread):
+    """Test that only the camera and inference threads are sampled."""
+    profiler = SamplingProfiler(interval=0.001)
+
+    stacks = profiler.profile(0.1)
+
+    assert stacks
+    assert all(stack[0] == "camera-main" for stack in stacks)
+    assert any("busy_camera_work" in stack[-1] for stack in stacks)
+
+
+def test_collapse():
+    """Test that stacks are formatted as collapsed stacks, most common first."""
+    stacks = {("camera-main", "run (a.py:1)", "read (b.py:2)"): 3, ("camera-main", "run (a.py:1)"): 5}
+
+    collapsed = SamplingProfiler.collapse(Counter(stacks))
+
+    assert collapsed == "camera-main;run (a.py:1) 5\ncamera-main;run (a.py:1);read (b.py:2) 3\n"
+
+
+def test_one_profile_at_a_time():
+    """Test that a second profile can't start while one is running."""
+    profiler = SamplingProfiler()
+    thread = Thread(target=profiler.profile, args=(0.2,))
+    thread.start()
+    time.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        profiler.profile(0.1)
+    thread.join()
+
+
+@pytest.fixture
+def app():
+    """Fixture for a minimal app with the admin blueprint."""
+    app = Flask(__name__)
+    app.config["ADMIN_TOKEN"] = "secret"
+    app.config["ENGINE"] = Engine([])
+    app.register_blueprint(admin_blueprint)
+    yield app
+
+
+def test_profile_route(app, camera_thread):
+    """Test that the admin token gets a collapsed stack file."""
+    response = app.test_client().get(
+        "/admin/profile?seconds=0.1", headers={"Authorization": "Bearer secret"}
+    )
+
+    assert response.status_code == 200
+    assert "profile.folded" in response.headers["Content-Disposition"]
+    assert response.get_data(as_text=True).startswith("camera-main;")
+
+
+def test_profile_route_needs_token(app):
+    """Test that the profile route is forbidden without the right token."""
+    client = app.test_client()
+
+    assert client.get("/admin/profile?seconds=0.1").status_code == 403
+    assert client.get("/admin/profile?seconds=0.1&token=wrong").status_code == 403
+
+
+def test_profile_route_disabled_without_token(app):
+    """Test that without an admin token set, the route doesn't exist."""
+    app.config["ADMIN_TOKEN"] = None
+
+    assert app.test_client().get("/admin/profile").status_code == 404
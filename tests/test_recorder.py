@@ -0,0 +1,316 @@
+import base64
+import threading
+import time
+
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.database import Base
+from src.db.models import DetectionRollup, VideoSnippet
+from src.db.writer import DbWriter
+from src.detector.detected_object import DetectedObject
+from src.recorder.recorder import Recorder, format_vtt_time
+
+
+@pytest.fixture
+def mock_ffmpeg():
+    """Fixture to mock ffmpeg-python."""
+    with patch("src.recorder.recorder.ffmpeg") as mock_ffmpeg:
+        yield mock_ffmpeg
+
+
+def test_start_recording_fast_start(mock_ffmpeg, tmp_path):
+    """Test that recordings are written with the moov atom at the front."""
+    recorder = Recorder(output_dir=str(tmp_path))
+
+    recorder.start_recording((480, 640, 3))
+
+    output_kwargs = mock_ffmpeg.input.return_value.output.call_args.kwargs
+    assert output_kwargs["movflags"] == "+faststart"
+    assert recorder.is_recording
+
+
+def test_add_metadata_remuxes_without_reencoding(mock_ffmpeg, tmp_path):
+    """Test that adding metadata copies the streams rather than re-encoding them."""
+    recorder = Recorder(output_dir=str(tmp_path))
+    recorder._recording_title = "clip"
+    recorder._recording_video_filename = str(tmp_path / "clip.mp4")
+    (tmp_path / "clip.mp4").write_bytes(b"video")
+    (tmp_path / "clip.tmp.mp4").write_bytes(b"video with metadata")
+
+    recorder.add_metadata("person entered")
+
+    output_kwargs = mock_ffmpeg.input.return_value.output.call_args.kwargs
+    assert output_kwargs["codec"] == "copy"
+    assert output_kwargs["movflags"] == "+faststart"
+    assert "vcodec" not in output_kwargs
+    # remuxed to a temp file of its own, as cameras share the output dir
+    output_args = mock_ffmpeg.input.return_value.output.call_args.args
+    assert output_args == (str(tmp_path / "clip.tmp.mp4"),)
+    assert (tmp_path / "clip.mp4").read_bytes() == b"video with metadata"
+
+
+def test_stop_recording_measures_finalisation(mock_ffmpeg, tmp_path):
+    """Test that the time taken to finalise a recording is measured."""
+    recorder = Recorder(output_dir=str(tmp_path))
+    recorder.start_recording((480, 640, 3))
+
+    with patch.object(recorder, "generate_thumbnail"), patch.object(
+        recorder, "save_data"
+    ) as save_data:
+        recorder.stop_recording(None)
+        recorder.wait_finalised()
+
+    save_data.assert_called_once_with(None, [])
+    assert recorder._last_finalise_duration is not None
+    assert recorder.state == "idle"
+
+
+class FakeProcess:
+    """Stands in for the FFmpeg process, failing writes once its pipe is closed, and
+    optionally blocking `wait` until released."""
+
+    def __init__(self, release: threading.Event | None = None):
+        self.stdin = MagicMock()
+        self.stdin.write.side_effect = self._write
+        self.stdin.close.side_effect = self._close
+        self.closed = 0
+        self.writes = 0
+        self._release = release
+
+    def _write(self, data):
+        assert not self.closed, "write after the pipe was closed"
+        self.writes += 1
+
+    def _close(self):
+        self.closed += 1
+
+    def wait(self):
+        if self._release is not None:
+            self._release.wait(timeout=5)
+
+
+@pytest.fixture
+def processes(mock_ffmpeg):
+    """Fixture for the FFmpeg processes started, each a new FakeProcess."""
+    processes = []
+
+    def run_async(**kwargs):
+        processes.append(FakeProcess())
+        return processes[-1]
+
+    mock_ffmpeg.input.return_value.output.return_value.overwrite_output.return_value.run_async.side_effect = run_async
+    yield processes
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    """Fixture for a recorder that doesn't make thumbnails or save to the db."""
+    recorder = Recorder(output_dir=str(tmp_path))
+    with patch.object(recorder, "generate_thumbnail"), patch.object(recorder, "save_data"):
+        yield recorder
+
+
+def test_only_one_recording_starts(processes, recorder):
+    """Test that when many threads start recording at once, only one recording starts."""
+    barrier = threading.Barrier(8)
+    started = []
+
+    def start():
+        barrier.wait()
+        started.append(recorder.start_recording((480, 640, 3)))
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert started.count(True) == 1
+    assert len(processes) == 1
+    assert recorder.is_recording
+
+
+def test_finalising_refuses_frames_and_recordings(mock_ffmpeg, recorder):
+    """Test that stopping returns while the recording is finalised in the background, that
+    meanwhile frames are dropped and no new recording starts, and it's idle again once
+    finalised."""
+    release = threading.Event()
+    process = FakeProcess(release)
+    mock_ffmpeg.input.return_value.output.return_value.overwrite_output.return_value.run_async.return_value = process
+    recorder.start_recording((480, 640, 3))
+
+    recorder.stop_recording()
+    assert recorder.state == "finalising"
+    assert not recorder.wait_finalised(timeout=0.01)
+
+    recorder.write_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+    assert not recorder.start_recording((480, 640, 3))
+    assert process.writes == 0
+
+    release.set()
+    assert recorder.wait_finalised(timeout=5)
+    assert recorder.state == "idle"
+    assert recorder.start_recording((480, 640, 3))
+
+
+def test_max_duration_saves_tracked_objects(processes, recorder):
+    """Test that a recording stopped at its max duration is saved with the objects tracked
+    during it."""
+    tracked_objects = {}
+    recorder.start_recording((480, 640, 3), tracked_objects)
+    tracked_objects[1] = [
+        DetectedObject(label="person", bbox=np.array([0, 0, 10, 10]), height=480, width=640)
+    ]
+
+    recorder._start_time -= recorder._max_duration
+    recorder.write_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+    recorder.wait_finalised()
+
+    assert recorder.state == "idle"
+    assert processes[0].closed == 1
+    descriptions, labels = recorder.save_data.call_args.args
+    assert labels == ["person"]
+
+
+def test_broken_pipe_not_saved(processes, recorder):
+    """Test that a recording whose FFmpeg process died is stopped without saving it."""
+    recorder.start_recording((480, 640, 3))
+    processes[0].stdin.write.side_effect = BrokenPipeError()
+
+    recorder.write_frame(np.zeros((480, 640, 3), dtype=np.uint8))
+    recorder.wait_finalised()
+
+    assert recorder.state == "idle"
+    recorder.save_data.assert_not_called()
+
+
+def test_stress(processes, recorder):
+    """Test that hammering the recorder from many threads never writes to a closed pipe,
+    and closes each recording's pipe exactly once."""
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    stop = threading.Event()
+    errors = []
+
+    def hammer(action):
+        try:
+            while not stop.is_set():
+                action()
+        except Exception as e:
+            errors.append(e)
+
+    actions = [
+        lambda: recorder.start_recording(frame.shape),
+        lambda: recorder.write_frame(frame),
+        lambda: recorder.write_frame(frame),
+        lambda: recorder.write_frame(frame),
+        lambda: recorder.stop_recording(),
+        lambda: recorder.stop_recording(should_save=False),
+    ]
+    threads = [threading.Thread(target=hammer, args=(a,)) for a in actions]
+    for t in threads:
+        t.start()
+    time.sleep(1)
+    stop.set()
+    for t in threads:
+        t.join()
+    recorder.wait_finalised()
+    recorder.stop_recording()
+    recorder.wait_finalised()
+
+    assert errors == []
+    assert len(processes) > 1
+    assert recorder.state == "idle"
+    assert all(p.closed == 1 for p in processes)
+    assert sum(p.writes for p in processes) > 0
+
+
+def test_save_data_counts_detections(tmp_path):
+    """Test that a saved recording is counted in the hourly detection rollup with it."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine, autoflush=False))
+    writer = DbWriter(session_factory=session)
+
+    recorder = Recorder(output_dir=str(tmp_path))
+    recorder._recording_title = "clip"
+    recorder._recording_video_filename = str(tmp_path / "clip.mp4")
+    recorder._recording_thumbnail_filename = str(tmp_path / "clip.jpg")
+    recorder._start_time = datetime(2024, 1, 1, 9, 30).timestamp()
+
+    with patch("src.recorder.recorder.db_writer", writer), patch(
+        "src.recorder.recorder.config_cache"
+    ), patch("src.recorder.recorder.Notification"):
+        recorder.save_data("a person", ["person"])
+        writer.flush()
+
+    snippet = session.query(VideoSnippet).one()
+    rollup = session.query(DetectionRollup).one()
+    assert snippet.created == datetime(2024, 1, 1, 9, 30)
+    assert (rollup.label, rollup.hour, rollup.count) == ("person", datetime(2024, 1, 1, 9), 1)
+    session.remove()
+
+
+def test_generate_placeholder(tmp_path):
+    """Test that a thumbnail's placeholder is a tiny inline JPEG with the same aspect ratio."""
+    thumbnail = tmp_path / "clip.jpg"
+    cv2.imwrite(str(thumbnail), np.full((240, 320, 3), 128, dtype=np.uint8))
+
+    placeholder = Recorder.generate_placeholder(str(thumbnail))
+
+    assert placeholder.startswith("data:image/jpeg;base64,")
+    img = cv2.imdecode(
+        np.frombuffer(base64.b64decode(placeholder.split(",", 1)[1]), np.uint8),
+        cv2.IMREAD_COLOR,
+    )
+    assert img.shape == (12, 16, 3)
+    assert len(placeholder) < 1024
+    assert Recorder.generate_placeholder(str(tmp_path / "missing.jpg")) is None
+
+
+def test_previews_written_at_finalise(processes, tmp_path):
+    """Test that finalising writes a sprite of the frames kept every N seconds, and a WebVTT
+    track pointing at each tile in turn."""
+    recorder = Recorder(output_dir=str(tmp_path), fps=5, preview_interval=1)
+    recorder.start_recording((480, 640, 3))
+    title = recorder._recording_title
+    for i in range(12):
+        recorder.write_frame(np.full((480, 640, 3), i * 20, dtype=np.uint8))
+
+    with patch.object(recorder, "generate_thumbnail"), patch.object(recorder, "save_data"):
+        recorder.stop_recording()
+        recorder.wait_finalised()
+
+    # frames 0, 5 and 10 are kept, as 160x120 tiles
+    sprite = cv2.imread(str(tmp_path / f"{title}_previews.jpg"))
+    assert sprite.shape == (120, 480, 3)
+    assert abs(int(sprite[60, 400, 0]) - 200) < 5
+
+    assert (tmp_path / f"{title}.vtt").read_text().splitlines() == [
+        "WEBVTT",
+        "",
+        "00:00:00.000 --> 00:00:01.000",
+        f"{title}_previews.jpg#xywh=0,0,160,120",
+        "",
+        "00:00:01.000 --> 00:00:02.000",
+        f"{title}_previews.jpg#xywh=160,0,160,120",
+        "",
+        "00:00:02.000 --> 00:00:02.400",
+        f"{title}_previews.jpg#xywh=320,0,160,120",
+    ]
+    assert recorder._previews == []
+
+
+def test_format_vtt_time():
+    """Test that times are formatted as WebVTT timestamps."""
+    assert format_vtt_time(0) == "00:00:00.000"
+    assert format_vtt_time(3723.5) == "01:02:03.500"
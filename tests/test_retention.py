@@ -0,0 +1,152 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.database import Base
+from src.db.models import VideoSnippet
+from src.db.writer import DbWriter
+from src.retention.retention import RetentionManager
+
+
+@pytest.fixture
+def session():
+    """Fixture for a scoped session bound to an in-memory db, used by the retention module."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    writer = DbWriter(session_factory=session)
+
+    with patch("src.retention.retention.db_session", session), patch(
+        "src.retention.retention.db_writer", writer
+    ):
+        yield session
+
+    session.remove()
+
+
+def add_recording(session, tmp_path, title, age_days=0, labels=None, size=100):
+    """Helper to add a recording row and its files."""
+    (tmp_path / f"{title}.mp4").write_bytes(b"v" * (size - 10))
+    (tmp_path / f"{title}.jpg").write_bytes(b"t" * 10)
+    session.add(
+        VideoSnippet(
+            snippet_title=f"{title}.mp4",
+            thumbnail_title=f"{title}.jpg",
+            description=None,
+            created=datetime.now() - timedelta(days=age_days),
+            labels=labels or ["person"],
+            size_bytes=size,
+        )
+    )
+    session.commit()
+
+
+def remaining(session):
+    """Helper to get the titles of the recordings left in the db."""
+    session.remove()
+    return sorted(r.snippetTitle for r in session.query(VideoSnippet).all())
+
+
+def make_manager(tmp_path, **kwargs):
+    """Helper to create a manager with every limit off unless given."""
+    limits = dict(
+        max_age_days=None,
+        max_total_bytes=None,
+        max_count_per_label=None,
+        min_free_bytes=None,
+    )
+    limits.update(kwargs)
+    return RetentionManager(output_dir=str(tmp_path), **limits)
+
+
+def test_max_age(session, tmp_path):
+    """Test that recordings older than the max age are deleted, with their files."""
+    add_recording(session, tmp_path, "old", age_days=40)
+    add_recording(session, tmp_path, "new", age_days=1)
+    manager = make_manager(tmp_path, max_age_days=30)
+
+    assert manager.enforce() == 1
+
+    assert remaining(session) == ["new.mp4"]
+    assert not (tmp_path / "old.mp4").exists()
+    assert not (tmp_path / "old.jpg").exists()
+    assert manager.total_bytes == 100
+
+
+def test_delete_removes_previews(session, tmp_path):
+    """Test that deleting a recording removes its scrubbing previews too."""
+    add_recording(session, tmp_path, "clip")
+    (tmp_path / "clip.vtt").write_text("WEBVTT")
+    (tmp_path / "clip_previews.jpg").write_bytes(b"sprite")
+    manager = make_manager(tmp_path)
+
+    manager.delete_recordings([session.query(VideoSnippet).one().id], wait=True)
+
+    assert remaining(session) == []
+    assert not (tmp_path / "clip.vtt").exists()
+    assert not (tmp_path / "clip_previews.jpg").exists()
+
+
+def test_max_count_per_label(session, tmp_path):
+    """Test that only the newest recordings per label are kept."""
+    add_recording(session, tmp_path, "p1", age_days=3)
+    add_recording(session, tmp_path, "p2", age_days=2)
+    add_recording(session, tmp_path, "p3", age_days=1)
+    add_recording(session, tmp_path, "d1", age_days=3, labels=["dog"])
+    manager = make_manager(tmp_path, max_count_per_label=2)
+
+    manager.enforce()
+
+    assert remaining(session) == ["d1.mp4", "p2.mp4", "p3.mp4"]
+
+
+def test_max_total_bytes(session, tmp_path):
+    """Test that the oldest recordings are removed until under the size limit."""
+    for i in range(5):
+        add_recording(session, tmp_path, f"r{i}", age_days=5 - i)
+    manager = make_manager(tmp_path, max_total_bytes=250)
+
+    manager.enforce()
+
+    assert remaining(session) == ["r3.mp4", "r4.mp4"]
+    assert manager.total_bytes == 200
+
+
+def test_min_free_bytes(session, tmp_path):
+    """Test that the oldest recordings are removed until there's enough free space."""
+    for i in range(5):
+        add_recording(session, tmp_path, f"r{i}", age_days=5 - i)
+    manager = make_manager(tmp_path, min_free_bytes=250, min_keep=2)
+
+    with patch.object(manager, "_free_bytes", return_value=0):
+        assert manager.enforce() == 3
+
+    assert remaining(session) == ["r3.mp4", "r4.mp4"]
+
+
+def test_min_free_bytes_impossible(session, tmp_path):
+    """Test that nothing is deleted for free space when deleting every recording but the
+    newest wouldn't free enough, e.g. the disk is filled by something else."""
+    for i in range(5):
+        add_recording(session, tmp_path, f"r{i}", age_days=5 - i)
+    manager = make_manager(tmp_path, min_free_bytes=10**9, min_keep=2)
+
+    with patch.object(manager, "_free_bytes", return_value=0):
+        assert manager.enforce() == 0
+
+    assert len(remaining(session)) == 5
+
+
+def test_track_added(session, tmp_path):
+    """Test that disk usage is kept up to date incrementally."""
+    add_recording(session, tmp_path, "r0")
+    manager = make_manager(tmp_path)
+
+    assert manager.total_bytes == 100
+    manager.track_added(50)
+    assert manager.total_bytes == 150
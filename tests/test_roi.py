@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.detector.roi import RegionMask
+
+
+SHAPE = (480, 640, 3)
+
+
+def test_no_regions_is_whole_frame():
+    """Test that with no regions the whole frame is used and everything is inside."""
+    mask = RegionMask()
+
+    assert not mask
+    assert mask.crop_box(SHAPE) == (0, 0, 640, 480)
+    assert mask.contains(10, 10, SHAPE)
+
+
+def test_crop_to_regions():
+    """Test that frames are cropped to the padded box bounding every region."""
+    mask = RegionMask(
+        [
+            [(0.25, 0.25), (0.5, 0.25), (0.5, 0.5)],
+            [(0.6, 0.6), (0.75, 0.6), (0.75, 0.75)],
+        ],
+        pad=0,
+    )
+    img = np.zeros(SHAPE, dtype=np.uint8)
+
+    cropped = mask.crop(img)
+
+    assert mask.crop_box(SHAPE) == (160, 120, 481, 361)
+    assert cropped.shape == (241, 321, 3)
+    # a view, not a copy
+    assert np.shares_memory(cropped, img)
+
+
+def test_crop_padding_stays_in_frame():
+    """Test that the crop padding doesn't go past the frame edges."""
+    mask = RegionMask([[(0, 0), (1, 0), (1, 1)]], pad=8)
+
+    assert mask.crop_box(SHAPE) == (0, 0, 640, 480)
+
+
+def test_contains():
+    """Test that points are only inside if they're inside one of the regions."""
+    mask = RegionMask([[(0, 0), (0.5, 0), (0.5, 0.5), (0, 0.5)]])
+
+    assert mask.contains(100, 100, SHAPE)
+    assert not mask.contains(400, 100, SHAPE)
+    assert not mask.contains(100, 300, SHAPE)
+
+
+def test_ignores_invalid_polygons():
+    """Test that polygons with fewer than 3 points are ignored."""
+    mask = RegionMask([[(0, 0), (1, 1)]])
+
+    assert not mask
@@ -0,0 +1,154 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.blueprints.api import api_blueprint
+from src.db.database import Base
+from src.db.models import DetectionRollup, VideoSnippet
+from src.db.rollup import rebuild, record_detections, series, totals
+
+
+@pytest.fixture
+def session():
+    """Fixture for a scoped session bound to an in-memory db, used by the api."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine, autoflush=False))
+
+    with patch("src.blueprints.api.db_session", session):
+        yield session
+
+    session.remove()
+
+
+def at(day, hour, minute=0):
+    """Helper for a time in Jan 2024."""
+    return datetime(2024, 1, day, hour, minute)
+
+
+def rollup_rows(session):
+    """Helper to get (label, hour, count, total) of every rollup row."""
+    rows = session.query(DetectionRollup).order_by(DetectionRollup.label, DetectionRollup.hour)
+    return [(r.label, r.hour, r.count, r.total) for r in rows]
+
+
+def test_record_detections_counts_per_label_per_hour(session):
+    """Test that recordings are counted per label per hour, with running totals."""
+    record_detections(session, at(1, 9, 5), ["car", "person"])
+    record_detections(session, at(1, 9, 50), ["person"])
+    record_detections(session, at(1, 11, 0), ["person"])
+    session.commit()
+
+    assert rollup_rows(session) == [
+        ("car", at(1, 9), 1, 1),
+        ("person", at(1, 9), 2, 2),
+        ("person", at(1, 11), 1, 3),
+    ]
+
+
+def test_late_recording_updates_later_totals(session):
+    """Test that a recording saved after later ones is added to their running totals."""
+    record_detections(session, at(1, 9), ["person"])
+    record_detections(session, at(1, 12), ["person"])
+    record_detections(session, at(1, 10), ["person"])
+    session.commit()
+
+    assert rollup_rows(session) == [
+        ("person", at(1, 9), 1, 1),
+        ("person", at(1, 10), 1, 2),
+        ("person", at(1, 12), 1, 3),
+    ]
+
+
+def test_totals_over_a_range(session):
+    """Test that range totals only count the hours starting in the range."""
+    for when in [at(1, 8), at(1, 9), at(1, 9, 30), at(2, 9), at(3, 9)]:
+        record_detections(session, when, ["person"])
+    record_detections(session, at(2, 10), ["car"])
+    session.commit()
+
+    assert totals(session, at(1, 9), at(3, 9)) == {"car": 1, "person": 3}
+    assert totals(session, at(3, 9), at(4, 0)) == {"person": 1}
+    assert totals(session, at(5, 0), at(6, 0)) == {}
+
+
+def test_series_buckets_by_day(session):
+    """Test that the series sums the hourly counts into each day."""
+    for when in [at(1, 8), at(1, 20), at(3, 9)]:
+        record_detections(session, when, ["person"])
+    session.commit()
+
+    result = series(session, at(1, 0), at(4, 0), "day")
+
+    assert result["buckets"] == [at(d, 0).isoformat() for d in (1, 2, 3)]
+    assert result["counts"] == {"person": [2, 0, 1]}
+
+
+def test_rebuild_from_recordings(session):
+    """Test that the rollup can be rebuilt from the recordings in the db."""
+    for title, when, labels in [
+        ("a", at(1, 9), ["person"]),
+        ("b", at(1, 9, 40), ["car", "person"]),
+        ("c", at(2, 7), ["person"]),
+        ("d", at(2, 8), None),
+    ]:
+        session.add(VideoSnippet(f"{title}.mp4", f"{title}.jpg", None, when, labels))
+    session.add(DetectionRollup("dog", at(1, 1), count=5, total=5))
+    session.commit()
+
+    rebuild(session)
+    session.commit()
+
+    assert rollup_rows(session) == [
+        ("car", at(1, 9), 1, 1),
+        ("person", at(1, 9), 2, 2),
+        ("person", at(2, 7), 1, 3),
+    ]
+
+
+def test_stats_route(session):
+    """Test that the stats route returns the totals and series for a range."""
+    record_detections(session, at(1, 9), ["person"])
+    record_detections(session, at(1, 10), ["car", "person"])
+    session.commit()
+
+    app = Flask(__name__)
+    app.register_blueprint(api_blueprint)
+    client = app.test_client()
+
+    response = client.get("/api/stats?start=2024-01-01T09:00&end=2024-01-01T12:00")
+
+    assert response.status_code == 200
+    assert response.json["bucket"] == "hour"
+    assert response.json["totals"] == {"car": 1, "person": 2}
+    assert response.json["counts"] == {"car": [0, 1, 0], "person": [1, 1, 0]}
+
+    assert client.get("/api/stats?start=yesterday").status_code == 400
+    assert client.get("/api/stats?days=3650&bucket=hour").status_code == 400
+
+
+def test_stats_route_unaligned_range(session):
+    """Test that a range not on the hour covers the whole hours it's in, with the totals
+    matching the series."""
+    record_detections(session, at(1, 10, 5), ["person"])
+    record_detections(session, at(1, 11, 50), ["person"])
+    record_detections(session, at(1, 12, 10), ["person"])
+    session.commit()
+
+    app = Flask(__name__)
+    app.register_blueprint(api_blueprint)
+    client = app.test_client()
+
+    response = client.get("/api/stats?start=2024-01-01T10:30&end=2024-01-01T11:15")
+
+    assert response.json["start"] == "2024-01-01T10:00:00"
+    assert response.json["end"] == "2024-01-01T12:00:00"
+    assert response.json["totals"] == {"person": 2}
+    assert response.json["counts"] == {"person": [1, 1]}
+    assert totals(session, at(1, 10, 30), at(1, 12)) == {"person": 2}
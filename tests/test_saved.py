@@ -0,0 +1,117 @@
+import os
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.blueprints.home import home_blueprint
+from src.blueprints.media import media_blueprint
+from src.blueprints.saved import PAGE_SIZE, saved_blueprint
+from src.blueprints.settings import settings_blueprint
+from src.db.database import Base
+from src.db.models import VideoSnippet
+from src.engine.engine import Engine
+from src.metrics.metrics import metrics
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "templates")
+
+
+@pytest.fixture
+def session():
+    """Fixture for a scoped session bound to an in-memory db, used by the saved page."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine))
+
+    with patch("src.blueprints.saved.db_session", session):
+        yield session
+
+    session.remove()
+
+
+@pytest.fixture
+def client(session, tmp_path):
+    """Fixture for a test client of a minimal app with the saved page, and what it links to."""
+    app = Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.secret_key = "test"
+    app.config["RECORDINGS_DIR"] = str(tmp_path)
+    for blueprint in (home_blueprint, media_blueprint, saved_blueprint, settings_blueprint):
+        app.register_blueprint(blueprint)
+    yield app.test_client()
+
+
+def add_recordings(session, count):
+    """Helper to add recordings, a minute apart, the last being the newest."""
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        session.add(
+            VideoSnippet(
+                snippet_title=f"clip{i}.mp4",
+                thumbnail_title=f"clip{i}.jpg",
+                description=None,
+                created=start + timedelta(minutes=i),
+                placeholder="data:image/jpeg;base64,AAAA" if i == 0 else None,
+            )
+        )
+    session.commit()
+
+
+def test_saved_page_is_paginated_newest_first(session, client):
+    """Test that the saved page lists a page of recordings, newest first."""
+    add_recordings(session, PAGE_SIZE + 2)
+
+    first = client.get("/saved").get_data(as_text=True)
+    second = client.get("/saved?page=2").get_data(as_text=True)
+
+    assert first.count('loading="lazy"') == PAGE_SIZE
+    assert first.index(f"clip{PAGE_SIZE + 1}.mp4") < first.index(f"clip{PAGE_SIZE}.mp4")
+    assert "clip1.mp4" not in first
+    assert "page=2" in first and "Newer" not in first
+
+    assert second.count('loading="lazy"') == 2
+    assert "Older" not in second and "Newer" in second
+
+
+def test_saved_page_inlines_placeholders(session, client):
+    """Test that stored placeholders are inlined, so the grid needs no request for them."""
+    add_recordings(session, 2)
+
+    page = client.get("/saved").get_data(as_text=True)
+
+    assert page.count("background-image: url(data:image/jpeg;base64,AAAA)") == 1
+
+
+def test_player_has_previews_track(session, client, tmp_path):
+    """Test that the player links the scrubbing previews track, when the recording has one."""
+    add_recordings(session, 2)
+    (tmp_path / "clip1.vtt").write_text("WEBVTT")
+    with_previews, without_previews = (
+        session.query(VideoSnippet).order_by(VideoSnippet.id.desc()).all()
+    )
+
+    page = client.get(f"/saved/player/{with_previews.id}").get_data(as_text=True)
+    assert '<track id="previews" kind="metadata" src="/media/recordings/clip1.vtt">' in page
+
+    page = client.get(f"/saved/player/{without_previews.id}").get_data(as_text=True)
+    assert "<track" not in page
+
+
+def test_player_ttff_recorded(client):
+    """Test that a reported time-to-first-frame is recorded in the engine's metrics, and
+    anything but a number of ms, 0 or more, is rejected."""
+    client.application.config["ENGINE"] = Engine([])
+    before = metrics.histogram("player_ttff")
+    count = before.count if before else 0
+
+    response = client.post("/saved/player/1/ttff", json={"ttffMs": 250})
+
+    assert response.status_code == 200
+    assert metrics.histogram("player_ttff").count == count + 1
+    for bad in ["250", -1, True, None]:
+        assert client.post("/saved/player/1/ttff", json={"ttffMs": bad}).status_code == 400
+    assert metrics.histogram("player_ttff").count == count + 1
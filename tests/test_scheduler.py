@@ -0,0 +1,185 @@
+import time
+from unittest.mock import MagicMock
+
+from src.inference.scheduler import InferenceScheduler
+
+
+def make_camera(name: str, batch_key=None) -> MagicMock:
+    """Helper to make a mock camera whose detector returns the frames it's given."""
+    camera = MagicMock()
+    camera.name = name
+    camera.detector.batch_key = batch_key or name
+    camera.detector.should_predict.return_value = True
+    camera.detector.prepare.side_effect = lambda img: img
+    camera.detector.predict.side_effect = lambda imgs: list(imgs)
+    camera.detector.handle_result.side_effect = lambda img, result: result
+    return camera
+
+
+def test_latest_frame_only():
+    """Test that with a batch size of 1 only the latest waiting frame is processed."""
+    scheduler = InferenceScheduler(workers=1, max_batch=1)
+    camera = make_camera("main")
+    scheduler.register(camera)
+
+    # queue frames before the workers start
+    for i in range(3):
+        scheduler.submit(camera, i)
+    scheduler.start()
+    time.sleep(0.1)
+    scheduler.stop()
+
+    camera.publish.assert_called_once_with(2, 2)
+    assert scheduler.stats()["main"] == {"processed": 1, "dropped": 2, "pending": 0}
+
+
+def test_round_robin():
+    """Test that cameras with waiting frames take turns."""
+    scheduler = InferenceScheduler(workers=1, max_batch=1)
+    cameras = [make_camera(f"cam{i}") for i in range(3)]
+    order = []
+    for camera in cameras:
+        camera.publish.side_effect = lambda img, detections, name=camera.name: order.append(name)
+        scheduler.register(camera)
+        scheduler.submit(camera, 0)
+
+    scheduler.start()
+    time.sleep(0.1)
+    scheduler.stop()
+
+    assert order == ["cam0", "cam1", "cam2"]
+
+
+def test_batches_across_cameras():
+    """Test that frames from cameras sharing a model go through one forward pass,
+    and each result goes back to the right camera."""
+    scheduler = InferenceScheduler(workers=1, max_batch=4, max_wait=0.05)
+    cameras = [make_camera(f"cam{i}", batch_key="model") for i in range(2)]
+    for i, camera in enumerate(cameras):
+        scheduler.register(camera)
+        scheduler.submit(camera, i)
+
+    scheduler.start()
+    time.sleep(0.2)
+    scheduler.stop()
+
+    # the first camera's detector runs the shared forward pass
+    cameras[0].detector.predict.assert_called_once_with([0, 1])
+    cameras[1].detector.predict.assert_not_called()
+    cameras[0].publish.assert_called_once_with(0, 0)
+    cameras[1].publish.assert_called_once_with(1, 1)
+
+
+def test_batches_consecutive_frames():
+    """Test that a camera falling behind has its waiting frames batched, in order."""
+    scheduler = InferenceScheduler(workers=1, max_batch=3, max_wait=0.05)
+    camera = make_camera("main")
+    scheduler.register(camera)
+
+    # 4 frames arrive before the worker is free, the oldest is dropped
+    for i in range(4):
+        scheduler.submit(camera, i)
+    scheduler.start()
+    time.sleep(0.2)
+    scheduler.stop()
+
+    camera.detector.predict.assert_called_once_with([1, 2, 3])
+    assert [c.args[0] for c in camera.detector.handle_result.call_args_list] == [1, 2, 3]
+    assert scheduler.stats()["main"] == {"processed": 3, "dropped": 1, "pending": 0}
+
+
+def test_max_wait():
+    """Test that a partial batch is processed once the max wait has passed."""
+    scheduler = InferenceScheduler(workers=1, max_batch=8, max_wait=0.05)
+    camera = make_camera("main")
+    scheduler.register(camera)
+    scheduler.start()
+
+    scheduler.submit(camera, 0)
+    time.sleep(0.2)
+    scheduler.stop()
+
+    camera.publish.assert_called_once_with(0, 0)
+
+
+def test_rate_limit():
+    """Test that a camera isn't processed faster than its max fps."""
+    scheduler = InferenceScheduler(workers=1, max_batch=1)
+    camera = make_camera("main")
+    scheduler.register(camera, max_fps=5)
+    scheduler.start()
+
+    # submit frames much faster than the limit for half a second
+    end = time.monotonic() + 0.5
+    while time.monotonic() < end:
+        scheduler.submit(camera, 0)
+        time.sleep(0.01)
+    scheduler.stop()
+
+    # 5 fps over 0.5s, allowing for the first frame
+    assert scheduler.stats()["main"]["processed"] <= 4
+    assert scheduler.stats()["main"]["dropped"] > 0
+
+
+def test_detector_error_does_not_stop_worker():
+    """Test that a failing detector doesn't kill the worker thread."""
+    scheduler = InferenceScheduler(workers=1, max_batch=1)
+    camera = make_camera("main")
+    camera.detector.predict.side_effect = [ValueError("boom"), [1]]
+    scheduler.register(camera)
+    scheduler.start()
+
+    scheduler.submit(camera, 0)
+    time.sleep(0.05)
+    scheduler.submit(camera, 1)
+    time.sleep(0.05)
+    scheduler.stop()
+
+    camera.publish.assert_called_once_with(1, 1)
+
+
+def test_skipped_frames_still_published():
+    """Test that frames the detector skips inference on are still handled in order."""
+    scheduler = InferenceScheduler(workers=1, max_batch=4)
+    camera = make_camera("main")
+    camera.detector.should_predict.side_effect = [True, False, True, False]
+    scheduler.register(camera)
+
+    for i in range(4):
+        scheduler.submit(camera, i)
+    scheduler.start()
+    time.sleep(0.1)
+    scheduler.stop()
+
+    camera.detector.predict.assert_called_once_with([0, 2])
+    assert [c.args for c in camera.detector.handle_result.call_args_list] == [
+        (0, 0),
+        (1, None),
+        (2, 2),
+        (3, None),
+    ]
+    assert camera.publish.call_count == 4
+
+
+def test_detector_swapped_mid_batch():
+    """Test that a detector swapped while a batch is processed is only used from the next
+    batch, so one batch never mixes detectors."""
+    scheduler = InferenceScheduler(workers=1, max_batch=1)
+    camera = make_camera("main")
+    old_detector = camera.detector
+    new_detector = make_camera("main").detector
+
+    def swap():
+        camera.detector = new_detector
+        return True
+
+    old_detector.should_predict.side_effect = swap
+    scheduler.register(camera)
+    scheduler.submit(camera, 0)
+    scheduler.start()
+    time.sleep(0.1)
+    scheduler.stop()
+
+    old_detector.handle_result.assert_called_once_with(0, 0)
+    new_detector.handle_result.assert_not_called()
+    camera.publish.assert_called_once_with(0, 0)
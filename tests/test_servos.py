@@ -220,3 +220,26 @@ def test_cleanup(mock_hardware_pwms, mock_logger):
 
     mock_pan_servo.stop.assert_any_call()
     mock_tilt_servo.stop.assert_any_call()
+
+
+def test_servo_routes_create_servos_on_first_use(mock_hardware_pwms):
+    """Test that the servo routes only set up the servos when first used, and reuse them."""
+    from flask import Flask
+    from src.blueprints import servo_controls
+
+    app = Flask(__name__)
+    app.register_blueprint(servo_controls.servo_controls_blueprint)
+
+    with patch.object(servo_controls, "_servos", None), patch(
+        "src.logger.systemd_logger.SystemdLogger"
+    ) as MockLogger, patch("src.servos.servos.atexit"):
+        assert servo_controls._servos is None
+
+        client = app.test_client()
+        assert client.get("/left").get_json() == {"moved": "left"}
+        assert client.get("/right").get_json() == {"moved": "right"}
+
+        # only set up once
+        MockLogger.assert_called_once()
+        mock_pan_servo, _ = mock_hardware_pwms
+        assert mock_pan_servo.change_duty_cycle.call_count == 2
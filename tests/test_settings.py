@@ -0,0 +1,78 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.blueprints.settings import settings_blueprint
+from src.db.cache import ConfigCache
+from src.db.database import Base
+from src.db.models import Labels
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "templates")
+
+
+@pytest.fixture
+def session():
+    """Fixture for a scoped session bound to an in-memory db, with the starting labels set."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    session.add(Labels(labels_dict={"person": True, "dog": False}))
+    session.commit()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def cache(session):
+    """Fixture for this web worker's config cache."""
+    cache = ConfigCache(session=session)
+    with patch("src.blueprints.settings.config_cache", cache):
+        yield cache
+
+
+@pytest.fixture
+def engine():
+    """Fixture for a mock engine, the settings are applied through it."""
+    engine = MagicMock()
+    engine.get_model.return_value = "v8world"
+    engine.camera_names.return_value = ["main"]
+    yield engine
+
+
+@pytest.fixture
+def client(cache, engine):
+    """Fixture for a test client of a minimal app with the settings page."""
+    app = Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.secret_key = "test"
+    app.config["MODEL"] = "v8world"
+    app.config["ENGINE"] = engine
+    app.register_blueprint(settings_blueprint)
+    yield app.test_client()
+
+
+def test_model_change_uses_labels_set_through_another_worker(session, cache, engine, client):
+    """Test that changing the model sends the labels last set, even if they were set
+    through another web worker after this one cached them."""
+    assert cache.get_enabled_labels() == ["person"]
+    ConfigCache(session=session).set_labels({"person": False, "dog": True})
+
+    response = client.post("/settings", data={"models_form": "", "ml_selector": "v8nano"})
+
+    assert response.status_code == 302
+    engine.set_detectors.assert_called_once_with("v8nano", ["dog"])
+
+
+def test_settings_page_shows_labels_set_through_another_worker(session, cache, client):
+    """Test that the settings page shows labels set through another web worker."""
+    cache.get_labels()
+    ConfigCache(session=session).set_labels({"person": False, "dog": True})
+
+    client.get("/settings")
+
+    assert cache.get_enabled_labels() == ["dog"]
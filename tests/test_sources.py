@@ -0,0 +1,60 @@
+import pytest
+import cv2
+import numpy as np
+
+from src.camera.sources import PicameraSource, SyntheticSource, VideoFileSource, create_source
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    """Fixture for a short video file, 3 frames of increasing brightness."""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for value in (0, 100, 200):
+        writer.write(np.full((48, 64, 3), value, dtype=np.uint8))
+    writer.release()
+    yield path
+
+
+def test_video_file_source_loops(video_file):
+    """Test that a file source reads frames, resized, and loops back to the start."""
+    with VideoFileSource(video_file, fps=1000, size=(32, 24)) as source:
+        frames = [source.read() for _ in range(4)]
+
+    assert frames[0].shape == (24, 32, 3)
+    means = [round(f.mean(), -2) for f in frames]
+    assert means == [0, 100, 200, 0]
+
+
+def test_video_file_source_no_loop(video_file):
+    """Test that a file source without looping stops at the end."""
+    with VideoFileSource(video_file, loop=False, fps=1000) as source:
+        for _ in range(3):
+            source.read()
+        with pytest.raises(EOFError):
+            source.read()
+
+
+def test_create_source(video_file):
+    """Test that sources are created from their config."""
+    assert isinstance(create_source({"type": "picamera"}), PicameraSource)
+    assert isinstance(create_source({"type": "file", "uri": video_file}), VideoFileSource)
+    with pytest.raises(ValueError):
+        create_source({"type": "nope"})
+
+
+def test_synthetic_source_replayable():
+    """Test that synthetic frames move, and are the same every time for the same seed."""
+    with SyntheticSource(size=(64, 48), seed=1) as source:
+        first = [source.read() for _ in range(3)]
+    with SyntheticSource(size=(64, 48), seed=1) as source:
+        second = [source.read() for _ in range(3)]
+
+    assert first[0].shape == (48, 64, 3)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[0], first[2])
+
+
+def test_create_synthetic_source():
+    """Test that a synthetic source can be created from config."""
+    assert isinstance(create_source({"type": "synthetic"}), SyntheticSource)